@@ -0,0 +1,29 @@
+"""
+Runtime settings, read from environment variables or a settings.ini / .env file
+(python-decouple). Every store derives its paths from these roots, so parallel
+jobs can run on isolated data roots and the hot caches can live on faster storage
+(e.g. INSIDERBOT_CACHE_ROOT=/mnt/nvme/insiderbot-cache or a tmpfs).
+"""
+import os
+from decouple import config
+
+# === Storage roots ===
+DATA_ROOT = config("INSIDERBOT_DATA_ROOT", default="data")
+MODELS_ROOT = config("INSIDERBOT_MODELS_ROOT", default="models")
+# Snapshot / OHLC / indicator / corporate actions caches (the hot read path)
+CACHE_ROOT = config("INSIDERBOT_CACHE_ROOT", default=os.path.join(DATA_ROOT, "finviz", "cache"))
+# Feature sets (train_case1/2.npz, predict.npz, manifest, row ids)
+FEATURES_ROOT = config("INSIDERBOT_FEATURES_ROOT", default=os.path.join(DATA_ROOT, "features"))
+
+# np.savez_compressed for feature sets; off trades disk for faster loads
+COMPRESS_FEATURES = config("INSIDERBOT_COMPRESS_FEATURES", default=True, cast=bool)
+
+# === Concurrency and rate limits ===
+WORKERS = config("INSIDERBOT_WORKERS", default=0, cast=int)  # process pools (sweep, walk-forward); 0 = one per CPU
+YAHOO_MAX_WORKERS = config("INSIDERBOT_YAHOO_WORKERS", default=4, cast=int)
+YAHOO_REQUESTS_PER_SECOND = config("INSIDERBOT_YAHOO_RPS", default=2.0, cast=float)
+SEC_REQUEST_DELAY = config("INSIDERBOT_SEC_DELAY", default=1.0, cast=float)  # seconds between SEC requests
+
+# === Instrumentation ===
+# Prometheus textfile (node_exporter textfile collector) written after each pipeline run; empty = off
+PROMETHEUS_TEXTFILE = config("INSIDERBOT_PROMETHEUS_FILE", default="")
@@ -1,45 +1,62 @@
 import os
-import time
-import random
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from yahooquery import Ticker
-
-from core.engine.classifier import tag_trade, add_cluster_buy_tag, add_multiple_buys_tag, add_smart_insider_tag
-from core.io.file_manager import FINVIZ_DATA_DIR, ensure_finviz_dir
-from core.io.cache import load_snapshot_cache, save_snapshot_cache, load_ohlc_cache
-from core.utils.utils import calculate_ownership_pct
+from datetime import date
+
+from core.engine.classifier import add_cluster_buy_tag, add_multiple_buys_tag, add_smart_insider_tag
+from core.io.file_manager import (
+    FINVIZ_DATA_DIR, TRADE_KEY, trade_keys, ensure_finviz_dir, load_latest_tagged_trades,
+    load_dropped_trades, save_dropped_trades, save_tagged_trades,
+)
+from core.io.atomic import file_lock
+from core.utils.metrics import incr, timer
+from core.io.cache import load_snapshot_cache, find_stale_snapshots, refresh_snapshots
+from core.io.indicator_store import lookup_trade_indicators
+from core.io.corporate_actions import adjust_trade_prices
+from core.io.shares_outstanding import refresh_shares, tickers_without_shares, trade_market_cap
+from core.io.pending_outcomes import (
+    OUTCOME_HORIZON, pending_outcomes, get_pending_outcomes, save_pending_outcomes,
+    due_trade_keys, advance_pending_outcomes,
+)
+from core.engine.tag_engine import tag_trades
+from core.engine.grouping import group_same_day_insider_trades
+from core.yahoo_client import get_bulk_snapshots
 from core.engine.ohlc import enrich_trades_with_price_deltas, update_ohlc
 from config.problematic_tickers import NO_MARKET_CAP_TICKERS, IPO_TICKERS
 
 TAGGED_FILE = "finviz_tagged.csv"
+MIN_MARKET_CAP = 150_000_000
 
-def analyze_finviz_trade() -> None:
-    """Main entrypoint for analyzing Finviz insider trades and tagging them."""    
-    df = load_finviz_data()
-    tickers = df["ticker"].unique()
-
-    # --- Build snapshots first ---
-    snapshot_cache = load_snapshot_cache()
-    snapshot_cache = fetch_missing_snapshots(tickers, snapshot_cache)
-    snapshots = {t: snapshot_cache.get(t, {}) for t in tickers}
-
-    # --- Prefilter tickers before any heavy work ---
-    valid_tickers = prefilter_tickers(tickers, snapshots, min_market_cap=150_000_000)
-    df = df[df["ticker"].isin(valid_tickers)].copy()
-
-    # --- Now update OHLC only for valid tickers ---
-    update_ohlc(df)
-
-    # --- Tag and annotate only valid ones ---
-    df = tag_and_annotate(df, snapshots)
-
-    # --- Drop Edge cases ---
-    df = drop_split_merger_anomalies(df, threshold=1.70)
-    df = drop_low_atr_trades(df, min_atr_pct=0.02)
+# Tags computed across rows: (tag, tagger, columns whose rows it looks at together)
+CROSS_ROW_TAGGERS = [
+    ("🔁 CLUSTER BUY", add_cluster_buy_tag, ["ticker"]),
+    ("🧩 MULTIPLE BUYS", add_multiple_buys_tag, ["ticker", "insider_name"]),
+    ("🧠 SMART INSIDER", lambda df: add_smart_insider_tag(df, outcome_col="case_2_outcome", min_trades=5, min_winrate=0.7), ["insider_name"]),
+]
 
+def analyze_finviz_trade(incremental: bool = False) -> None:
+    """
+    Main entrypoint for analyzing Finviz insider trades and tagging them.
+    With incremental=True only new, revised and due-outcome trades are
+    re-tagged (see tag_incremental); the first run is always a full one.
+    """
     tagged_path = os.path.join(FINVIZ_DATA_DIR, TAGGED_FILE)
-    df.to_csv(tagged_path, index=False)
+
+    # One writer of the tagged file at a time (daily pipeline vs weekly job)
+    with file_lock(tagged_path):
+        df = load_finviz_data()
+
+        if incremental and os.path.exists(tagged_path):
+            df = tag_incremental(df, load_latest_tagged_trades(TAGGED_FILE))
+        else:
+            df = clean_dataframe(group_same_day_insider_trades(df))
+            df, snapshots = prepare_market_data(df)
+            df = tag_and_annotate(df, snapshots)
+            df = drop_edge_cases(df)
+            df = add_cross_row_tags(df)
+            save_pending_outcomes(pending_outcomes(df))
+
+        save_tagged_trades(df, tagged_path)
     print(f"✅ Tagged trades saved to {tagged_path}")
 
 def load_finviz_data() -> pd.DataFrame:
@@ -50,163 +67,201 @@ def load_finviz_data() -> pd.DataFrame:
     print(f"\n📊 Analyzing {len(df)} insider trades...\n")
     return df
 
+def prepare_market_data(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """
+    Refreshes snapshots and share counts for the trades' tickers, drops tickers
+    that fail the prefilter and updates their OHLC. Returns (trades kept, snapshots).
+    """
+    tickers = df["ticker"].unique()
+
+    # --- Build snapshots first ---
+    snapshot_cache = load_snapshot_cache()
+    snapshot_cache = fetch_missing_snapshots(tickers, snapshot_cache)
+    snapshots = {t: snapshot_cache.get(t, {}) for t in tickers}
+
+    # --- Share counts for point-in-time market caps (Yahoo only for unseen tickers) ---
+    refresh_shares(tickers_without_shares(tickers), snapshots)
+
+    # --- Prefilter tickers before any heavy work ---
+    valid_tickers = prefilter_tickers(tickers, snapshots, min_market_cap=MIN_MARKET_CAP)
+    valid = df["ticker"].isin(valid_tickers)
+
+    # Remembered like the edge cases, so incremental runs skip them; only drops on a
+    # fetched snapshot are final (tickers whose fetch failed are retried next run)
+    fetched = df["ticker"].map(lambda t: bool(snapshots.get(t))).astype(bool)
+    record_dropped_trades(df[~valid & fetched], checked=df)
+    df = df[valid].copy()
+
+    # --- Now update OHLC only for valid tickers (far enough ahead for every outcome window) ---
+    update_ohlc(df, forward_days=OUTCOME_HORIZON)
+    return df, snapshots
+
 def fetch_missing_snapshots(tickers: list[str], cache: dict) -> dict:
     """
-    Checks which tickers are missing from the snapshot cache,
-    fetches their data using YahooQuery, and updates the cache.
+    Refreshes the snapshots that are missing or past their field TTLs
+    (see SNAPSHOT_TTLS) with one batched YahooQuery fetch; fresh ones are reused.
     """
     tickers = [t for t in tickers if t not in NO_MARKET_CAP_TICKERS]
 
-    missing = [t for t in tickers if t not in cache]
-    print(f"🔍 Found {len(missing)} missing tickers.")
+    stale = find_stale_snapshots(cache, tickers)
+    missing = [t for t in stale if t not in cache]
+    print(f"🔍 Found {len(missing)} missing and {len(stale) - len(missing)} stale tickers.")
 
-    if not missing:
+    if not stale:
         return cache
 
-    print("🌐 Fetching missing snapshots from Yahoo Finance...")
-    new_data = get_bulk_snapshots(missing)
-    cache.update(new_data)
-    save_snapshot_cache(cache)
-    return cache
+    print("🌐 Fetching stale snapshots from Yahoo Finance...")
+    return refresh_snapshots(tickers, get_bulk_snapshots, cache)
 
 def tag_and_annotate(df: pd.DataFrame, snapshots: dict) -> pd.DataFrame:
     """
-    Applies trade tags and ownership percentage to each row in the DataFrame
-    using the snapshot data for each ticker.
+    Applies the per-trade tags and ownership percentage to grouped trades
+    using the snapshot data for each ticker. Cross-row tags come later
+    (add_cross_row_tags), once the edge cases are dropped.
     """
-    # Clean up the dataframe
-    df = group_same_day_insider_trades(df)
-    df = clean_dataframe(df)
-
-    # Add additional info to dataframe
-    df = enrich_trades_with_price_deltas(df)
-    df = add_atr_to_trades(df, window=14)
-    df["ownership_pct"] = df.apply(lambda row: calculate_ownership_pct(row, snapshots.get(row["ticker"], {})), axis=1)
-
-    # Apply simple tags
-    df["tags"] = df.apply(lambda row: tag_trade(row, snapshots.get(row["ticker"], {})), axis=1)
-
-    # Post-processing multi-trade tags
-    df = add_cluster_buy_tag(df)
-    df = add_multiple_buys_tag(df)
-    df = add_smart_insider_tag(df, outcome_col="case_2_outcome", min_trades=5, min_winrate=0.7)
-    
+    with timer("enrich"):
+        # Insider prices on the same split basis as the adjusted OHLC
+        df = adjust_trade_prices(df)
+
+        # Add additional info to dataframe
+        df = enrich_trades_with_price_deltas(df)
+        df = add_atr_to_trades(df, window=14)
+
+    # Apply simple tags (columnar engine, also sets ownership_pct) with the market cap on the trade date
+    with timer("tag"):
+        df, _ = tag_trades(df, snapshots, market_cap=trade_market_cap(df, snapshots))
+    incr("tag.trades", len(df))
+
+    # Day the market data was read: windows due after it are still pending
+    df["tagged_on"] = date.today()
     return df
 
-def get_bulk_snapshots(tickers: list[str]) -> dict:
+def drop_edge_cases(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Fetches metadata for a list of tickers in batches, with sleep to avoid Yahoo rate limits.
-    Includes market cap, sector, industry, short name, and earnings date.
+    Drops split/merger anomalies and low-ATR trades. Trades dropped on real
+    market data are remembered (finviz_dropped.csv) so incremental runs skip them,
+    like the ones the market cap prefilter drops (prepare_market_data).
     """
-    batch_size = 50
-    snapshots = {}
-
-    for i in range(0, len(tickers), batch_size):
-        batch = tickers[i:i + batch_size]
-        print(f"📦 Fetching batch {i // batch_size + 1} of {len(tickers) // batch_size + 1}")
-
-        try:
-            t = Ticker(batch)
-            summary_data = t.summary_detail
-            calendar_data = t.calendar_events
-            profile_data = t.asset_profile
-
-            for ticker in batch:
-                try:
-                    summary = summary_data.get(ticker, {})
-                    calendar = calendar_data.get(ticker, {})
-                    profile = profile_data.get(ticker, {})
-
-                    # Extract earnings date
-                    earnings_date = None
-                    earnings_info = calendar.get("earnings", {})
-                    earnings_date_raw = earnings_info.get("earningsDate", [])
-
-                    if isinstance(earnings_date_raw, list) and earnings_date_raw:
-                        first_entry = earnings_date_raw[0]
-
-                        if isinstance(first_entry, dict) and "raw" in first_entry:
-                            raw_val = first_entry["raw"]
-                            earnings_date = datetime.fromtimestamp(raw_val).date()
-
-                        elif isinstance(first_entry, str):
-                            try:
-                                clean_str = first_entry.replace(":S", "")
-                                earnings_date = pd.to_datetime(clean_str).date()
-                            except Exception:
-                                print(f"⚠️ Could not parse string earnings date for {ticker}: {first_entry}")
-
-                    snapshots[ticker] = {
-                        "market_cap": summary.get("marketCap"),
-                        "sector": profile.get("sector"),
-                        "industry": profile.get("industry"),
-                        "earnings_date": earnings_date
-                    }
-
-                except Exception as e:
-                    print(f"⚠️ Error parsing ticker {ticker}: {e}")
-
-        except Exception as e:
-            print(f"❌ Error fetching batch: {e}")
-
-        time.sleep(random.uniform(0.8, 2.5))  # Sleep between batches
-
-    return snapshots
-
-def group_same_day_insider_trades(df: pd.DataFrame) -> pd.DataFrame:
+    kept = drop_split_merger_anomalies(df, threshold=1.70)
+    kept = drop_low_atr_trades(kept, min_atr_pct=0.02)
+
+    # Without OHLC on the trade date the drop is not final: those trades are retried
+    dropped = df[~df.index.isin(kept.index) & df["atr_14_pct"].notna()]
+    record_dropped_trades(dropped, checked=df)
+    return kept
+
+def record_dropped_trades(dropped: pd.DataFrame, checked: pd.DataFrame):
+    """Replaces the ledger entries of the `checked` trades with the ones `dropped` now."""
+    previous = load_dropped_trades()
+    previous = previous[~trade_keys(previous).isin(set(trade_keys(checked)))]
+    save_dropped_trades(pd.concat([previous, dropped[TRADE_KEY + ["value"]]], ignore_index=True))
+
+def add_cross_row_tags(df: pd.DataFrame, touched: pd.DataFrame | None = None) -> pd.DataFrame:
     """
-    Groups trades made by the same insider on the same day for the same ticker and action.
-    - Cleans numeric-like strings (e.g., "64,500", "$1,234.50", "(1,000)") to numbers
-    - Uses weighted-average price by shares
-    - Sums shares and value
-    - Keeps first relationship and sec_form4 as representatives
+    Adds the cluster buy, multiple buys and smart insider tags.
+    With `touched` (trades added, re-tagged or removed since the last run) only the
+    rows sharing a ticker / (ticker, insider) / insider with them are recomputed.
     """
-    df = df.copy()
-
-    # Normalize date & transaction_type formatting
-    df["transaction_date"] = pd.to_datetime(df["transaction_date"]).dt.date
-    df["transaction_type"] = df["transaction_type"].astype(str).str.strip().str.title()
-
-    # Helper to coerce strings-with-commas/currency/parentheses to numeric
-    def _to_number(s: pd.Series) -> pd.Series:
-        s = s.astype(str)
-        # negatives like "(1,000)" -> "-1000"
-        s = s.str.replace(r"\((.*)\)", r"-\1", regex=True)
-        # drop anything that's not digit, dot or minus (commas, $ spaces, etc.)
-        s = s.str.replace(r"[^0-9.\-]", "", regex=True)
-        return pd.to_numeric(s, errors="coerce")
-
-    # Clean numeric columns
-    for col in ["price", "shares", "value"]:
-        if col in df.columns:
-            df[col] = _to_number(df[col])
-
-    # If value is missing, compute it
-    df["value"] = df["value"].where(df["value"].notna(), df["price"] * df["shares"])
-
-    # Drop rows that can't be aggregated safely
-    df = df.dropna(subset=["price", "shares"])
-
-    # Group & aggregate
-    grouped = (
-    df.groupby(
-        ["ticker", "insider_name", "transaction_date", "transaction_type"],
-        as_index=False,
-    )
-    .apply(lambda g: pd.Series({
-        "price": (g["price"] * g["shares"]).sum() / g["shares"].sum(),
-        "shares": g["shares"].sum(),
-        "value": g["value"].sum(min_count=1),
-        "relationship": g["relationship"].iloc[0],
-        "sec_form4": g["sec_form4"].iloc[0],
-    }), include_groups=False)
-    .reset_index(drop=True)
-    )
+    df = df.reset_index(drop=True)
+    for tag, tagger, scope in CROSS_ROW_TAGGERS:
+        if touched is None:
+            with timer("tag.cross_row"):
+                df = tagger(df)
+            continue
+
+        scope_keys = trade_keys(df, scope)
+        rows = scope_keys.isin(set(trade_keys(touched, scope)))
+        if not rows.any():
+            continue
+        subset = df[rows].copy()
+        subset["tags"] = subset["tags"].apply(lambda tags: [t for t in tags if t != tag])
+        with timer("tag.cross_row"):
+            retagged = tagger(subset)["tags"]
+        df["tags"] = [retagged[i] if i in retagged.index else tags for i, tags in zip(df.index, df["tags"])]
+        print(f"🔗 {tag}: recomputed {int(rows.sum())} rows")
+    return df
+
+def trades_to_tag(trades: pd.DataFrame, tagged: pd.DataFrame, dropped: pd.DataFrame, due: set) -> pd.Series:
+    """
+    Grouped trades that need (re-)tagging:
+    - new: not in the tagged file nor dropped before
+    - revised: their summed value changed since they were tagged / dropped
+    - due: an outcome window in the pending queue reached its due date
+    """
+    known = pd.concat([tagged[TRADE_KEY + ["value"]], dropped[TRADE_KEY + ["value"]]], ignore_index=True)
+    known_value = pd.Series(pd.to_numeric(known["value"], errors="coerce").to_numpy(), index=trade_keys(known))
+    known_value = known_value[~known_value.index.duplicated(keep="first")]
 
-    # Optional: enforce integer shares if you prefer
-    grouped["shares"] = grouped["shares"].round().astype("Int64")
+    keys = trade_keys(trades)
+    previous = keys.map(known_value)
+    value = pd.to_numeric(trades["value"], errors="coerce")
+    new = ~keys.isin(known_value.index)
+    revised = ~new & ~np.isclose(value.fillna(0), previous.fillna(0), rtol=1e-9)
+    due = keys.isin(due)
 
-    return grouped
+    print(f"🧮 To tag: {int(new.sum())} new, {int(revised.sum())} revised, {int((due & ~new & ~revised).sum())} with outcomes due")
+    return new | revised | due
+
+def retag_trades(tagged: pd.DataFrame, todo: pd.DataFrame, removed: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Tags `todo` (snapshots and OHLC refreshed for their tickers only), replaces
+    them in `tagged`, recomputes the cross-row tags they touch and advances
+    the pending outcomes queue.
+    """
+    removed = tagged.iloc[0:0] if removed is None else removed
+    queue = get_pending_outcomes(tagged)
+
+    fresh = todo.iloc[0:0]
+    if not todo.empty:
+        fresh, snapshots = prepare_market_data(todo)
+        fresh = drop_edge_cases(tag_and_annotate(fresh, snapshots))
+
+    kept = tagged[~trade_keys(tagged).isin(set(trade_keys(todo)))]
+    touched = pd.concat([todo[TRADE_KEY], removed[TRADE_KEY]], ignore_index=True)
+    df = add_cross_row_tags(pd.concat([kept, fresh], ignore_index=True), touched=touched)
+    save_pending_outcomes(advance_pending_outcomes(queue, fresh, touched))
+
+    print(f"🔄 Re-tagged {len(fresh)} trades, kept {len(kept)} unchanged, removed {len(removed)}")
+    return df.sort_values(TRADE_KEY).reset_index(drop=True)
+
+def tag_incremental(trades: pd.DataFrame, tagged: pd.DataFrame) -> pd.DataFrame:
+    """Re-tags only the trades picked by trades_to_tag and merges them into the tagged trades."""
+    trades = clean_dataframe(group_same_day_insider_trades(trades))
+    tagged = tagged.copy()
+    tagged["transaction_date"] = pd.to_datetime(tagged["transaction_date"])
+
+    # Trades gone from the raw file (or now excluded) leave the tagged set too
+    present = trade_keys(tagged).isin(set(trade_keys(trades)))
+    removed = tagged[~present]
+    tagged = tagged[present]
+
+    due = due_trade_keys(get_pending_outcomes(tagged))
+    todo = trades[trades_to_tag(trades, tagged, load_dropped_trades(), due)]
+    if todo.empty and removed.empty:
+        print("✅ No trades to re-tag.")
+        return tagged
+    return retag_trades(tagged, todo, removed)
+
+def resolve_due_outcomes(today: date | None = None) -> pd.DataFrame:
+    """
+    Weekly job: re-computes exactly the tagged trades whose outcome windows are due
+    (OHLC fetched only for their tickers), saves them and advances the queue.
+    """
+    tagged_path = os.path.join(FINVIZ_DATA_DIR, TAGGED_FILE)
+    with file_lock(tagged_path):
+        tagged = load_latest_tagged_trades(TAGGED_FILE)
+        tagged["transaction_date"] = pd.to_datetime(tagged["transaction_date"])
+
+        due = due_trade_keys(get_pending_outcomes(tagged), today)
+        todo = tagged[trade_keys(tagged).isin(due)]
+        print(f"⏳ {len(todo)} trades with outcomes due")
+        if todo.empty:
+            return tagged
+
+        df = retag_trades(tagged, todo)
+        save_tagged_trades(df, tagged_path)
+        print(f"✅ Tagged trades saved to {tagged_path}")
+    return df
 
 def clean_dataframe(df):
     """
@@ -222,7 +277,7 @@ def clean_dataframe(df):
     print(f"🧹 Cleaned DataFrame: removed {before - after} rows, kept {after}")
     return df_cleaned
 
-def prefilter_tickers(tickers, snapshots, min_market_cap=150_000_000):
+def prefilter_tickers(tickers, snapshots, min_market_cap=MIN_MARKET_CAP):
     """
     Filters tickers before tagging:
     - Excludes IPO_TICKERS and NO_MARKET_CAP_TICKERS
@@ -260,6 +315,8 @@ def drop_split_merger_anomalies(df: pd.DataFrame, threshold: float = 1.70) -> pd
     """
     Drops trades where insider buy price differs significantly
     from the market open price on the trade date (possible split/merger).
+    Known splits are already adjusted away (adjust_trade_prices), so what is
+    left here are mergers or splits missing from the corporate actions table.
     
     Parameters
     ----------
@@ -300,58 +357,14 @@ def drop_split_merger_anomalies(df: pd.DataFrame, threshold: float = 1.70) -> pd
 
 def add_atr_to_trades(df: pd.DataFrame, window: int = 14) -> pd.DataFrame:
     """
-    Adds ATR and ATR% columns per ticker using the OHLC cache.
-    Requires at least `window` days of lookback.
+    Adds ATR and ATR% columns per ticker from the indicator store.
+    Requires at least `window` days of lookback (`atr_<window>` must be a declared indicator).
     """
 
-    atr_values = []
-    atr_pct_values = []
-
-    for _, row in df.iterrows():
-        ticker = row["ticker"]
-        trade_date = row["transaction_date"].date()
-
-        ohlc = load_ohlc_cache(ticker)
-        if ohlc.empty:
-            atr_values.append(None)
-            atr_pct_values.append(None)
-            continue
-
-        # Ensure datetime index
-        ohlc["date"] = pd.to_datetime(ohlc["date"]).dt.date
-        ohlc = ohlc.sort_values("date")
-        ohlc.set_index("date", inplace=True)
-
-        if trade_date not in ohlc.index:
-            atr_values.append(None)
-            atr_pct_values.append(None)
-            continue
-
-        # Slice the window: (trade_date - window) → trade_date
-        start_idx = ohlc.index.get_loc(trade_date) - window
-        end_idx = ohlc.index.get_loc(trade_date)
-        if start_idx < 0:
-            atr_values.append(None)
-            atr_pct_values.append(None)
-            continue
-
-        window_data = ohlc.iloc[start_idx:end_idx+1].copy()
-
-        # Compute True Range
-        window_data["prev_close"] = window_data["close"].shift(1)
-        window_data["tr1"] = window_data["high"] - window_data["low"]
-        window_data["tr2"] = (window_data["high"] - window_data["prev_close"]).abs()
-        window_data["tr3"] = (window_data["low"] - window_data["prev_close"]).abs()
-        window_data["true_range"] = window_data[["tr1", "tr2", "tr3"]].max(axis=1)
-
-        atr = window_data["true_range"].rolling(window, min_periods=1).mean().iloc[-1]
-        atr_pct = atr / window_data["close"].iloc[-1]
-
-        atr_values.append(atr)
-        atr_pct_values.append(atr_pct)
-
-    df["atr_14"] = atr_values
-    df["atr_14_pct"] = atr_pct_values
+    # ATR over the `window` true ranges up to the trade date (indicator store, NaN without lookback)
+    atr = lookup_trade_indicators(df, [f"atr_{window}", f"atr_{window}_pct"])
+    df["atr_14"] = atr[f"atr_{window}"]
+    df["atr_14_pct"] = atr[f"atr_{window}_pct"]
 
     return df
 
@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
-import ast
 
-from core.io.file_manager import load_latest_tagged_trades, save_scores
+from core.engine.tag_registry import read_tag_bits, bits_to_indicator, has_tag, has_any, has_all
+from core.io.file_manager import load_latest_tagged_trades, save_scores, save_tagged_trades
+from core.utils.metrics import timed
 
 # --- Settings ---
 OUTCOME_TAGS_C1 = {
@@ -53,12 +55,21 @@ COMBO_BOOSTS = {
     ("📈 CIO", "🏦 Financial"): 2,
 }
 
+CASE_2_OUTCOME_MAP = {
+    "🟢 SPIKE BEFORE DROP - SUCCESSFUL TRADE": "🟢 SUCCESSFUL TRADE",
+    "⚪ NEUTRAL TRADE": "⚪ NEUTRAL TRADE",
+    "🔴 DROP BEFORE SPIKE - BAD TRADE": "🔴 UNSUCCESSFUL TRADE",
+    "🔴 FINAL GAIN TOO LOW - BAD TRADE": "🔴 UNSUCCESSFUL TRADE",
+}
+
+def map_case_2_outcome(outcomes: pd.Series) -> pd.Series:
+    """Maps raw case_2_outcome strings to win/neutral/loss labels (NaN when missing or unknown)."""
+    return outcomes.astype("string").str.strip().map(CASE_2_OUTCOME_MAP).astype(object)
+
 # --- Step 2: Filter rows with outcome tags ---
 def filter_outcome_trades(df: pd.DataFrame) -> pd.DataFrame:
-    return df[
-        df["tags"].apply(lambda tags: any(tag.strip() in OUTCOME_TAGS_C1 for tag in tags))
-        | df["case_2_outcome"].isin(OUTCOME_TAGS_C2)
-    ]
+    has_c1 = has_any(read_tag_bits(df), OUTCOME_TAGS_C1)
+    return df[has_c1 | df["case_2_outcome"].isin(OUTCOME_TAGS_C2).to_numpy()]
 
 # --- Step 3: Score each row based on tags ---
 def score_trade(tags: list[str]) -> int:
@@ -86,6 +97,49 @@ def assign_bucket(score: int) -> str:
             return bucket_name
     return "Uncategorized"
 
+# --- Vectorized scoring (same rules as score_trade / assign_bucket) ---
+def build_weight_vector(tag_weights: dict = TAG_WEIGHTS) -> tuple[list[str], np.ndarray]:
+    """Returns (tags, weights) with the weighted tags and their weights as a vector."""
+    tags = list(tag_weights)
+    return tags, np.array([tag_weights[t] for t in tags], dtype=np.float64)
+
+def score_tag_bits(
+    bits: np.ndarray,
+    tag_weights: dict = TAG_WEIGHTS,
+    combo_boosts: dict = COMBO_BOOSTS,
+) -> np.ndarray:
+    """
+    Scores every trade at once from its (n, N_WORDS) tag bitmask:
+    indicator matrix @ weight vector, plus combo boosts as AND-masks.
+    """
+    tags, weights = build_weight_vector(tag_weights)
+    scores = bits_to_indicator(bits, tags) @ weights
+
+    for combo, bonus in combo_boosts.items():
+        scores += has_all(bits, combo) * bonus
+
+    return scores.astype(int)
+
+def assign_buckets(scores: np.ndarray, buckets: dict = BUCKETS) -> np.ndarray:
+    """
+    Vectorized assign_bucket(): np.digitize over the bucket lower bounds,
+    scores outside every (low, high) range become "Uncategorized".
+    """
+    ordered = sorted(buckets.items(), key=lambda item: item[1][0])
+    names = np.array([name for name, _ in ordered] + ["Uncategorized"], dtype=object)
+    lows = np.array([low for _, (low, _) in ordered], dtype=np.float64)
+    highs = np.array([high for _, (_, high) in ordered], dtype=np.float64)
+
+    idx = np.digitize(scores, lows) - 1
+    inside = (idx >= 0) & (scores <= highs[np.clip(idx, 0, None)])
+    return names[np.where(inside, idx, len(ordered))]
+
+def outcome_case_1_from_bits(bits: np.ndarray) -> np.ndarray:
+    """Returns the Case 1 outcome tag of each trade (None when unlabeled)."""
+    tags = sorted(OUTCOME_TAGS_C1)
+    conditions = [has_tag(bits, tag) for tag in tags]
+    return np.select(conditions, tags, default=None)
+
 def filter_ultra_and_highest(df: pd.DataFrame, output_file: str) -> pd.DataFrame:
     """
     Filters only Ultra Conviction and Highest Conviction trades
@@ -100,7 +154,7 @@ def filter_ultra_and_highest(df: pd.DataFrame, output_file: str) -> pd.DataFrame
     """
     keep_buckets = {"Ultra Conviction (12 - 14)", "Highest Conviction (15+)"}
     filtered = df[df["bucket"].isin(keep_buckets)].copy()
-    filtered.to_csv(output_file, index=False)
+    save_tagged_trades(filtered, output_file)
     return filtered
 
 # --- Step 5: Run full test pipeline ---
@@ -192,38 +246,24 @@ def filter_ultra_and_highest(df: pd.DataFrame, output_file: str) -> pd.DataFrame
 #    save_scores(df_unlabeled_sorted, "unlabeled_scores.csv") 
 #    print(f"🆕 Scored {len(df_unlabeled_sorted)} trades without outcome tags")
 
-def run_backtest_pipeline() -> None:
-    # --- Load everything
-    df_all = load_latest_tagged_trades()
-    df_all["tags"] = df_all["tags"].apply(ast.literal_eval)
+@timed("score")
+def score_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds outcome_case_1/2, score and bucket to tagged trades (row by row independent)."""
+    df = df.copy()
+    bits = read_tag_bits(df)
 
     # --- Map outcome tags
-    def get_outcome_case_1(tags):
-        for tag in tags:
-            tag_clean = tag.strip()
-            if tag_clean in OUTCOME_TAGS_C1:
-                return tag_clean
-        return None
-
-    df_all["outcome_case_1"] = df_all["tags"].apply(get_outcome_case_1)
-
-    def normalize_case_2_outcome(text: str) -> str | None:
-        if pd.isna(text):
-            return None
-        text = text.strip()
-        if text == "🟢 SPIKE BEFORE DROP - SUCCESSFUL TRADE":
-            return "🟢 SUCCESSFUL TRADE"
-        elif text == "⚪ NEUTRAL TRADE":
-            return "⚪ NEUTRAL TRADE"
-        elif text in {"🔴 DROP BEFORE SPIKE - BAD TRADE", "🔴 FINAL GAIN TOO LOW - BAD TRADE"}:
-            return "🔴 UNSUCCESSFUL TRADE"
-        return None
-
-    df_all["outcome_case_2"] = df_all["case_2_outcome"].apply(normalize_case_2_outcome)
+    df["outcome_case_1"] = outcome_case_1_from_bits(bits)
+    df["outcome_case_2"] = map_case_2_outcome(df["case_2_outcome"])
 
     # --- Score and bucket ALL trades (including unlabeled)
-    df_all["score"] = df_all["tags"].apply(score_trade)
-    df_all["bucket"] = df_all["score"].apply(assign_bucket)
+    df["score"] = score_tag_bits(bits)
+    df["bucket"] = assign_buckets(df["score"].to_numpy())
+    return df
+
+def run_backtest_pipeline() -> None:
+    # --- Load and score everything
+    df_all = score_trades(load_latest_tagged_trades())
 
     # --- Save all scored trades
     save_scores(df_all, "scores.csv")
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+from scipy import sparse
+from xgboost import XGBClassifier
+from sklearn.ensemble import RandomForestClassifier
+
+from core.io.atomic import write_npz
+from core.engine.features import load_feature_set
+from core.engine.model_registry import current_version
+from core.engine.predict import MODELS_DIR, load_model, align_features
+
+COMPILED_DIR = os.path.join(MODELS_DIR, "compiled")
+
+# Tree models that get compiled
+COMPILED_MODELS = ["rf_case1", "rf_case2", "xgb_case1", "xgb_case2"]
+
+# Loaded compiled models: path -> (mtime, compiled)
+_COMPILED_CACHE = {}
+
+# ----------------------------------------------------------------------------
+# Node arrays
+# ----------------------------------------------------------------------------
+# Every tree of an ensemble is flattened into shared arrays indexed by a global
+# node id: feature (-1 for leaves), threshold, left / right / missing children
+# and the leaf value. Since tag features are 0/1, these are reduced to a
+# next[node, x] table and traversal advances all (row, tree) pairs one level
+# at a time, so a prediction is `max_depth` vectorized NumPy gathers.
+
+def compile_random_forest(model: RandomForestClassifier, feature_names: list[str]) -> dict:
+    """
+    Flattens a fitted RandomForestClassifier. Goes left when x <= threshold;
+    leaf value is the positive class fraction (what predict_proba averages).
+    """
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        leaf = tree.children_left == -1
+        counts = tree.value[:, 0, :]
+        roots.append(offset)
+        feature.append(np.where(leaf, -1, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(leaf, -1, tree.children_left + offset))
+        right.append(np.where(leaf, -1, tree.children_right + offset))
+        value.append(counts[:, 1] / counts.sum(axis=1))
+        max_depth = max(max_depth, tree.max_depth)
+        offset += tree.node_count
+
+    left = np.concatenate(left)
+    return {
+        "kind": "rf",
+        "feature": np.concatenate(feature).astype(np.int32),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": left.astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "missing": left.astype(np.int32),  # no missing values in sklearn trees
+        "value": np.concatenate(value).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "max_depth": max_depth,
+        "base_margin": 0.0,
+        "zero_is_missing": False,
+        "feature_names": list(feature_names),
+    }
+
+def _xgb_base_margin(booster) -> float:
+    """Logit of the booster's base_score (stored in probability space for binary:logistic)."""
+    params = json.loads(booster.save_config())["learner"]["learner_model_param"]
+    base_score = float(str(params["base_score"]).strip("[]"))
+    return float(np.log(base_score / (1 - base_score)))
+
+def compile_xgboost(model: XGBClassifier, feature_names: list[str], zero_is_missing: bool) -> dict:
+    """
+    Flattens a fitted binary:logistic XGBClassifier. Goes "Yes" when x < split and
+    follows the "Missing" branch for missing values; leaf values are margins
+    summed on top of the base margin.
+
+    `zero_is_missing` must match how the model is fed: sparse CSR input (models
+    trained on the sparse feature sets) stores no zeros, so XGBoost sees them as missing.
+    """
+    booster = model.get_booster()
+    trees = booster.trees_to_dataframe()
+    names = booster.feature_names or [f"f{i}" for i in range(len(feature_names))]
+    column = {name: i for i, name in enumerate(names)}
+
+    node_id = {id_: i for i, id_ in enumerate(trees["ID"])}
+    leaf = (trees["Feature"] == "Leaf").to_numpy()
+
+    def children(col):
+        return np.array([-1 if is_leaf else node_id[c] for c, is_leaf in zip(trees[col], leaf)], dtype=np.int32)
+
+    depth = np.zeros(len(trees), dtype=np.int32)
+    yes, no = children("Yes"), children("No")
+    for i in range(len(trees)):  # parents always come before children in the dump
+        if not leaf[i]:
+            depth[yes[i]] = depth[no[i]] = depth[i] + 1
+
+    return {
+        "kind": "xgb",
+        "feature": np.array([-1 if is_leaf else column[f] for f, is_leaf in zip(trees["Feature"], leaf)], dtype=np.int32),
+        "threshold": np.where(leaf, 0.0, trees["Split"].fillna(0).to_numpy(dtype=np.float64)),
+        "left": yes,
+        "right": no,
+        "missing": children("Missing"),
+        "value": np.where(leaf, trees["Gain"].to_numpy(dtype=np.float64), 0.0),
+        "roots": np.flatnonzero(trees["Node"].to_numpy() == 0).astype(np.int32),
+        "max_depth": int(depth.max()),
+        "base_margin": _xgb_base_margin(booster),
+        "zero_is_missing": bool(zero_is_missing),
+        "feature_names": list(feature_names),
+    }
+
+def add_binary_table(compiled: dict) -> dict:
+    """
+    Tag features are 0/1, so each node has just two possible successors.
+    Precomputes next[node, x] (leaves point to themselves) so traversal is a
+    single gather per level instead of comparisons against thresholds.
+    """
+    feature, threshold = compiled["feature"], compiled["threshold"]
+    leaf = feature < 0
+    nodes = np.arange(len(feature), dtype=np.int32)
+    strict = compiled["kind"] == "xgb"
+
+    nxt = np.empty((len(feature), 2), dtype=np.int32)
+    for x in (0, 1):
+        go_left = (x < threshold) if strict else (x <= threshold)
+        child = np.where(go_left, compiled["left"], compiled["right"])
+        if x == 0 and compiled["zero_is_missing"]:
+            child = compiled["missing"]
+        nxt[:, x] = np.where(leaf, nodes, child)
+
+    compiled["next"] = nxt.ravel()
+    compiled["split_feature"] = np.where(leaf, 0, feature).astype(np.int32)
+    return compiled
+
+def compile_model(model, manifest: dict) -> dict:
+    """
+    Compiles a fitted RF or XGB model. The compiled model takes the dense
+    indicator matrix in its own feature order (see prepare_input()).
+    """
+    if isinstance(model, RandomForestClassifier):
+        names = list(getattr(model, "feature_names_in_", manifest["feature_names"]))
+        return add_binary_table(compile_random_forest(model, names))
+    if isinstance(model, XGBClassifier):
+        named = model.get_booster().feature_names
+        # Legacy models were trained on dense DataFrames (zeros are values)
+        return add_binary_table(compile_xgboost(model, named or manifest["feature_names"], zero_is_missing=not named))
+    raise TypeError(f"❌ Cannot compile {type(model).__name__}")
+
+def prepare_input(X, manifest: dict, compiled: dict) -> np.ndarray:
+    """Dense 0/1 uint8 matrix in the compiled model's feature order (unknown features = 0)."""
+    X = X.toarray() if sparse.issparse(X) else np.asarray(X)
+    position = {name: i for i, name in enumerate(manifest["feature_names"])}
+    out = np.zeros((X.shape[0], len(compiled["feature_names"])), dtype=np.uint8)
+    for j, name in enumerate(compiled["feature_names"]):
+        if name in position:
+            out[:, j] = X[:, position[name]]
+    return out
+
+def leaf_values(compiled: dict, X: np.ndarray) -> np.ndarray:
+    """
+    Vectorized traversal of all trees for 0/1 inputs: returns the
+    (n_rows, n_trees) leaf values.
+    """
+    X = np.ascontiguousarray(X, dtype=np.uint8)
+    n_rows, n_features = X.shape
+    nxt, split_feature = compiled["next"], compiled["split_feature"]
+
+    node = np.broadcast_to(compiled["roots"], (n_rows, len(compiled["roots"]))).copy()
+    row_offset = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+    flat_X = X.ravel()
+
+    for _ in range(compiled["max_depth"]):
+        x = flat_X[row_offset + split_feature[node]]
+        node = nxt[2 * node + x]
+
+    return compiled["value"][node]
+
+def predict_proba(compiled: dict, X: np.ndarray) -> np.ndarray:
+    """Positive class probability, same as model.predict_proba(X)[:, 1]."""
+    values = leaf_values(compiled, X)
+    if compiled["kind"] == "rf":
+        return values.mean(axis=1)
+    margin = compiled["base_margin"] + values.sum(axis=1)
+    return 1 / (1 + np.exp(-margin))
+
+def row_keys(X: np.ndarray) -> np.ndarray:
+    """Packs each 0/1 row (up to 64 features) into a uint64 tag bitmask key."""
+    if X.shape[1] > 64:
+        raise ValueError(f"❌ Lookup keys support up to 64 features, got {X.shape[1]}")
+    packed = np.packbits(np.ascontiguousarray(X, dtype=np.uint8), axis=1, bitorder="little")
+    padded = np.zeros((X.shape[0], 8), dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return padded.view(np.uint64).ravel()
+
+def predict_proba_lookup(compiled: dict, X: np.ndarray) -> np.ndarray:
+    """
+    Same as predict_proba() through a lookup table over tag bitmasks: each
+    distinct tag combination is traversed once, then memoized on the compiled
+    model, so rescoring the backlog is a searchsorted over known combinations.
+    """
+    keys = row_keys(X)
+    table_keys, table_proba = compiled.get("_lookup", (np.empty(0, np.uint64), np.empty(0)))
+
+    pos = np.minimum(np.searchsorted(table_keys, keys), max(len(table_keys) - 1, 0))
+    known = (table_keys[pos] == keys) if len(table_keys) else np.zeros(len(keys), dtype=bool)
+
+    if not known.all():
+        new_keys, first = np.unique(keys[~known], return_index=True)
+        new_proba = predict_proba(compiled, X[~known][first])
+        table_keys = np.concatenate([table_keys, new_keys])
+        table_proba = np.concatenate([table_proba, new_proba])
+        order = np.argsort(table_keys)
+        table_keys, table_proba = table_keys[order], table_proba[order]
+        compiled["_lookup"] = (table_keys, table_proba)
+        pos = np.searchsorted(table_keys, keys)
+
+    return table_proba[pos]
+
+def save_compiled(compiled: dict, path: str):
+    arrays = {k: v for k, v in compiled.items() if isinstance(v, np.ndarray)}
+    meta = {k: v for k, v in compiled.items() if not isinstance(v, np.ndarray) and not k.startswith("_")}
+    write_npz(path, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+
+def load_compiled(path: str) -> dict:
+    with np.load(path) as npz:
+        compiled = {k: npz[k] for k in npz.files if k != "meta"}
+        compiled.update(json.loads(str(npz["meta"])))
+    return compiled
+
+def compiled_path(name: str, version: str | None = None) -> str:
+    version = version or current_version() or "legacy"
+    return os.path.join(COMPILED_DIR, version, f"{name}.npz")
+
+def load_compiled_model(name: str, version: str | None = None) -> dict | None:
+    """
+    Loads the exported compiled model of a version (memoized by file mtime).
+    None when it was not exported, or when the legacy pickle is newer than its export.
+    """
+    path = compiled_path(name, version)
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    legacy = os.path.join(MODELS_DIR, f"{name}.pkl")
+    if version is None and current_version() is None and os.path.exists(legacy) and os.path.getmtime(legacy) > mtime:
+        print(f"⚠️ {path} is older than {name}.pkl, scoring with the model")
+        return None
+    cached = _COMPILED_CACHE.get(path)
+    if cached is None or cached[0] != mtime:
+        _COMPILED_CACHE[path] = (mtime, load_compiled(path))
+    return _COMPILED_CACHE[path][1]
+
+def compiled_proba(compiled: dict, X, manifest: dict) -> np.ndarray:
+    """
+    Positive class probability for a feature matrix in manifest order: through
+    the lookup table when a row fits a bitmask key, else by traversal.
+    """
+    dense = prepare_input(X, manifest, compiled)
+    if dense.shape[1] <= 64:
+        return predict_proba_lookup(compiled, dense)
+    return predict_proba(compiled, dense)
+
+def check_parity(model, compiled: dict, X, manifest: dict, atol: float = 1e-5) -> float:
+    """
+    Compares compiled probabilities with model.predict_proba on the same rows.
+    Returns the max absolute difference; raises if it exceeds `atol`.
+    """
+    expected = model.predict_proba(align_features(X, manifest, model))[:, 1]
+    got = predict_proba(compiled, prepare_input(X, manifest, compiled))
+    diff = float(np.abs(expected - got).max())
+    if diff > atol:
+        raise AssertionError(f"❌ Compiled model differs from predict_proba by {diff:.2e}")
+    return diff
+
+def export_compiled_models(feature_set: str = "predict", names: list[str] = COMPILED_MODELS, version: str | None = None) -> dict:
+    """
+    Compiles the tree models of a model version, checks parity against
+    predict_proba on `feature_set`, and saves them under models/compiled/<version>/.
+    Returns {name: max abs diff}.
+    """
+    data = load_feature_set(feature_set)
+    results = {}
+    for name in names:
+        model = load_model(name, version)
+        compiled = compile_model(model, data["manifest"])
+        results[name] = check_parity(model, compiled, data["X"], data["manifest"])
+        dense = prepare_input(data["X"], data["manifest"], compiled)
+        if not np.allclose(predict_proba_lookup(compiled, dense), predict_proba(compiled, dense)):
+            raise AssertionError(f"❌ Lookup table differs from traversal for {name}")
+
+        path = compiled_path(name, version)
+        save_compiled(compiled, path)
+        print(f"🧱 Compiled {name}: {len(compiled['roots'])} trees, {len(compiled['feature'])} nodes "
+              f"(max diff {results[name]:.1e}) → {path}")
+    return results
+
+def benchmark(feature_set: str = "predict", names: list[str] = COMPILED_MODELS, version: str | None = None, repeat: int = 20):
+    """Times model.predict_proba vs compiled scoring on the whole feature set and on a single row."""
+    data = load_feature_set(feature_set)
+    X, manifest = data["X"], data["manifest"]
+
+    for name in names:
+        model = load_model(name, version)
+        compiled = load_compiled(compiled_path(name, version))
+        dense = prepare_input(X, manifest, compiled)
+        model_input = align_features(X, manifest, model)
+
+        timings = {}
+        for label, fn in [
+            ("model_all", lambda: model.predict_proba(model_input)),
+            ("compiled_all", lambda: predict_proba(compiled, dense)),
+            ("compiled_lookup_all", lambda: predict_proba_lookup(compiled, dense)),
+            ("model_one", lambda: model.predict_proba(model_input[:1])),
+            ("compiled_one", lambda: predict_proba(compiled, dense[:1])),
+        ]:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            timings[label] = round((time.perf_counter() - start) / repeat * 1000, 3)
+        print(f"⏱️ {name} ({X.shape[0]} rows, ms): {timings}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile RF / XGB tag models to NumPy node arrays")
+    parser.add_argument("command", choices=["export", "benchmark"])
+    parser.add_argument("--feature-set", default="predict")
+    parser.add_argument("--version", default=None)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_compiled_models(args.feature_set, version=args.version)
+    else:
+        benchmark(args.feature_set, version=args.version)
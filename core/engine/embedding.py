@@ -4,7 +4,8 @@ from bs4 import BeautifulSoup
 import re
 import os
 
-from core.io.file_manager import FINVIZ_DATA_DIR, load_scored_with_tags_trades
+from core.io.file_manager import FINVIZ_DATA_DIR, load_scored_with_tags_trades, save_tagged_trades
+from core.utils.metrics import incr, timed
 # from transformers import pipeline
 from tqdm import tqdm
 
@@ -124,6 +125,7 @@ def classify_footnotes(footnotes: list[str], classifier=None) -> tuple[list[str]
 
     return tags, notes
 
+@timed("footnotes")
 def update_motive_tags(df: pd.DataFrame) -> pd.DataFrame:
     """
     Iterate through trades in dataframe, fetch filings, extract footnotes,
@@ -141,12 +143,14 @@ def update_motive_tags(df: pd.DataFrame) -> pd.DataFrame:
             tags, notes = classify_footnotes(footnotes, ) # classifier
         except Exception as e:
             tags, notes = ["❌ Error"], [str(e)]
+            incr("footnotes.errors")
 
         all_tags.append(tags)
         all_notes.append(notes)
 
     df["footnote_tags"] = all_tags
     df["footnote_notes"] = all_notes
+    incr("footnotes.filings", len(df))
     return df
 
 def incremental_update(df_new: pd.DataFrame, tagged_filename="scores_with_tags.csv") -> pd.DataFrame:
@@ -193,7 +197,7 @@ def incremental_update(df_new: pd.DataFrame, tagged_filename="scores_with_tags.c
 
     # Save back using same directory logic
     save_path = os.path.join(FINVIZ_DATA_DIR, tagged_filename)
-    df_final.to_csv(save_path, index=False)
+    save_tagged_trades(df_final, save_path)
 
     print(f"💾 Saved updated dataset with {len(df_final)} rows → {save_path}")
     return df_final
\ No newline at end of file
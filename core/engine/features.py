@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from config.settings import FEATURES_ROOT, COMPRESS_FEATURES
+from core.io.atomic import write_csv, write_json, write_npz
+from core.engine.tag_registry import read_tag_bits, bits_to_indicator, N_WORDS
+
+# === Master feature list: single source of truth for tag order ===
+# (WITHOUT DIP/SPIKE or insufficient data tags)
+FEATURE_TAGS = [
+    "👑 CEO", "💼 CFO", "⚙️ COO", "💰 CRO", "📈 CIO", "🧠 CBO", "🪑 Chairman",
+    "🎖️ President", "🧍 EVP", "📊 Portfolio Manager", "🔟 10% Owner", "📋 Director",
+    "🔥 VERY LARGE TRADE", "💰 LARGE TRADE", "🟢 SMALL TRADE", "❓ UNKNOWN SIZE",
+    "🐣 MICRO CAP", "🌱 SMALL CAP", "🌿 MID CAP", "🌳 LARGE CAP", "🏔️ MEGA CAP",
+    "📡 Tech", "🏥 Healthcare", "🛍️ Consumer Cyclical", "⚡ Energy",
+    "🏗️ Industrial", "🔌 Utilities", "🏘️ Real Estate", "⚙️ Materials",
+    "📞 Communication", "🧰 Other",
+    "📉 DIP BUY",
+    "🧨 CAUGHT THE KNIFE [7d]", "🧨 CAUGHT THE KNIFE [14d]",
+    "🚀 BUYING INTO STRENGTH",
+    # "📈 ABOVE CLOSE", "📉 BELOW CLOSE",
+    # "📈 ABOVE SMA20", "📉 BELOW SMA20", "⚡️ SMA SUPPORT RECLAIMED",
+    # "🔻 SMA LOST", "🔻 OVERSOLD (RSI < 30)", "🚀 OVERBOUGHT (RSI > 70)",
+    # "🟡 NEUTRAL (RSI)", "💪 STRONG TREND", "📉 DIP SETUP",
+    "🔁 CLUSTER BUY", "🧠 SMART INSIDER", "🧩 MULTIPLE BUYS", "📅 NEAR EARNINGS",
+    "Automatic/Scheduled", "Compensation/Accounting", "Ownership Disclaimer/Indirect", "Conviction Buy"
+]
+
+ROW_ID_COLS = ["ticker", "insider_name", "transaction_date", "price"]
+
+MANIFEST_FILE = "features_manifest.json"
+FEATURES_DIR = FEATURES_ROOT
+
+def sanitize_feature_name(tag: str) -> str:
+    """Replaces characters XGBoost rejects in feature names with underscores."""
+    return re.sub(r'[\[\]<>]', '_', tag)
+
+def build_manifest(tags: list[str] = FEATURE_TAGS) -> dict:
+    """
+    Describes the feature matrix columns: raw tags, sanitized feature names
+    and a hash so train and predict can check they agree on column order.
+    """
+    feature_names = [sanitize_feature_name(t) for t in tags]
+    digest = hashlib.sha1("\n".join(tags).encode("utf-8")).hexdigest()[:12]
+    return {"tags": list(tags), "feature_names": feature_names, "hash": digest}
+
+def all_tag_bits(df: pd.DataFrame) -> np.ndarray:
+    """Union (bitwise OR) of the `tags` and `footnote_tags` bitmasks of each row."""
+    bits = np.zeros((len(df), N_WORDS), dtype=np.uint64)
+    for column in ("tags", "footnote_tags"):
+        col_bits = read_tag_bits(df, column)
+        if col_bits is not None:
+            bits |= col_bits
+    return bits
+
+def build_feature_matrix(df: pd.DataFrame, tags: list[str] = FEATURE_TAGS) -> sparse.csr_matrix:
+    """
+    One-hot encodes the merged tags + footnote_tags of every row into a
+    (n_rows, n_tags) CSR matrix in a single pass over the tag bitmasks.
+    """
+    indicator = bits_to_indicator(all_tag_bits(df), tags)
+    rows, cols = np.nonzero(indicator)
+    data = np.ones(len(rows), dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=indicator.shape)
+
+def save_feature_set(
+    name: str,
+    X: sparse.csr_matrix,
+    manifest: dict,
+    y: np.ndarray | None = None,
+    dates: pd.Series | None = None,
+    rows: pd.DataFrame | None = None,
+    directory: str = FEATURES_DIR,
+) -> str:
+    """
+    Saves a feature set as `<name>.npz` (CSR parts + labels + dates),
+    the shared feature manifest, and optional row identifiers as `<name>_rows.csv`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    X = sparse.csr_matrix(X)
+
+    arrays = {
+        "data": X.data, "indices": X.indices, "indptr": X.indptr,
+        "shape": np.array(X.shape), "manifest_hash": np.array(manifest["hash"]),
+    }
+    if y is not None:
+        arrays["y"] = np.asarray(y, dtype=np.float32)
+    if dates is not None:
+        arrays["dates"] = pd.to_datetime(dates).to_numpy(dtype="datetime64[D]")
+
+    path = os.path.join(directory, f"{name}.npz")
+    write_npz(path, compressed=COMPRESS_FEATURES, **arrays)
+    write_json(manifest, os.path.join(directory, MANIFEST_FILE), ensure_ascii=False, indent=2)
+
+    if rows is not None:
+        write_csv(rows, os.path.join(directory, f"{name}_rows.csv"), index=False)
+
+    return path
+
+def load_manifest(directory: str = FEATURES_DIR) -> dict:
+    """Loads the shared feature manifest written by save_feature_set()."""
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_feature_set(name: str, directory: str = FEATURES_DIR) -> dict:
+    """
+    Loads a feature set saved by save_feature_set().
+    Returns a dict with X (CSR), y, dates, rows (or None) and the manifest.
+    """
+    path = os.path.join(directory, f"{name}.npz")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ Feature set not found: {path}")
+
+    with np.load(path) as npz:
+        X = sparse.csr_matrix((npz["data"], npz["indices"], npz["indptr"]), shape=tuple(npz["shape"]))
+        y = npz["y"] if "y" in npz else None
+        dates = pd.to_datetime(npz["dates"]) if "dates" in npz else None
+        manifest_hash = str(npz["manifest_hash"])
+
+    manifest = load_manifest(directory)
+    if manifest["hash"] != manifest_hash:
+        raise ValueError(f"❌ {path} was built with feature manifest {manifest_hash}, found {manifest['hash']}")
+
+    rows_path = os.path.join(directory, f"{name}_rows.csv")
+    rows = pd.read_csv(rows_path) if os.path.exists(rows_path) else None
+
+    print(f"📥 Loaded feature set {name}: {X.shape[0]} rows × {X.shape[1]} features")
+    return {"X": X, "y": y, "dates": dates, "rows": rows, "manifest": manifest}
@@ -0,0 +1,158 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+GROUP_KEYS = ["ticker", "insider_name", "transaction_date", "transaction_type"]
+REPRESENTATIVE_COLUMNS = ["relationship", "sec_form4"]
+GROUPED_COLUMNS = GROUP_KEYS + ["price", "shares", "value"] + REPRESENTATIVE_COLUMNS
+# Kept like the representatives when the input has them (Finviz scans do)
+OPTIONAL_COLUMNS = ["shares_total"]
+
+def _representatives(df: pd.DataFrame) -> list[str]:
+    return REPRESENTATIVE_COLUMNS + [col for col in OPTIONAL_COLUMNS if col in df.columns]
+
+def _grouped_columns(df: pd.DataFrame) -> list[str]:
+    return GROUPED_COLUMNS + [col for col in OPTIONAL_COLUMNS if col in df.columns]
+
+def to_number(s: pd.Series) -> pd.Series:
+    """Coerces strings-with-commas/currency/parentheses ("64,500", "$1,234.50", "(1,000)") to numbers."""
+    s = s.astype(str)
+    # negatives like "(1,000)" -> "-1000"
+    s = s.str.replace(r"\((.*)\)", r"-\1", regex=True)
+    # drop anything that's not digit, dot or minus (commas, $ spaces, etc.)
+    s = s.str.replace(r"[^0-9.\-]", "", regex=True)
+    return pd.to_numeric(s, errors="coerce")
+
+def _normalize_trades(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+
+    # Normalize date & transaction_type formatting
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"]).dt.date
+    df["transaction_type"] = df["transaction_type"].astype(str).str.strip().str.title()
+
+    # Clean numeric columns
+    for col in ["price", "shares", "value"]:
+        if col in df.columns:
+            df[col] = to_number(df[col])
+
+    # If value is missing, compute it
+    df["value"] = df["value"].where(df["value"].notna(), df["price"] * df["shares"])
+
+    # Drop rows that can't be aggregated safely
+    return df.dropna(subset=["price", "shares"])
+
+def group_same_day_insider_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Groups trades made by the same insider on the same day for the same ticker and action.
+    - Cleans numeric-like strings (e.g., "64,500", "$1,234.50", "(1,000)") to numbers
+    - Uses weighted-average price by shares
+    - Sums shares and value
+    - Keeps first relationship, sec_form4 (and shares_total) as representatives
+    """
+    df = _normalize_trades(df)
+    df["price_x_shares"] = df["price"] * df["shares"]
+
+    # Named aggregations on pre-multiplied columns: no per-group Python call
+    groups = df.groupby(GROUP_KEYS, sort=True)
+    sums = groups.agg(
+        price_x_shares=("price_x_shares", "sum"),
+        shares=("shares", "sum"),
+        value=("value", "sum"),  # never NaN here (filled above), so sum == sum(min_count=1)
+    )
+    # first row's values as-is (NaN included), like g[col].iloc[0]
+    firsts = groups[_representatives(df)].first(skipna=False)
+
+    grouped = sums.join(firsts)
+    grouped["price"] = grouped["price_x_shares"] / grouped["shares"]
+    grouped = grouped.reset_index()[_grouped_columns(df)]
+
+    # Optional: enforce integer shares if you prefer
+    grouped["shares"] = grouped["shares"].round().astype("Int64")
+
+    return grouped
+
+def group_same_day_insider_trades_reference(df: pd.DataFrame) -> pd.DataFrame:
+    """Original groupby.apply implementation, kept to check the vectorized one against."""
+    df = _normalize_trades(df)
+    representatives = _representatives(df)
+
+    grouped = (
+    df.groupby(
+        GROUP_KEYS,
+        as_index=False,
+    )
+    .apply(lambda g: pd.Series({
+        "price": (g["price"] * g["shares"]).sum() / g["shares"].sum(),
+        "shares": g["shares"].sum(),
+        "value": g["value"].sum(min_count=1),
+        **{col: g[col].iloc[0] for col in representatives},
+    }), include_groups=False)
+    .reset_index(drop=True)
+    )
+
+    grouped["shares"] = grouped["shares"].round().astype("Int64")
+
+    return grouped
+
+def verify_grouping(df: pd.DataFrame, rtol: float = 1e-12) -> dict:
+    """
+    Compares the vectorized grouping with the reference implementation.
+    Returns {column: number of mismatching rows} (empty when equivalent).
+    """
+    fast = group_same_day_insider_trades(df)
+    ref = group_same_day_insider_trades_reference(df)
+    if len(fast) != len(ref):
+        return {"rows": abs(len(fast) - len(ref))}
+
+    diffs = {}
+    for col in _grouped_columns(df):
+        a, b = fast[col], ref[col]
+        if col in ("price", "shares", "value"):
+            same = np.isclose(a.astype(float), b.astype(float), rtol=rtol, atol=0, equal_nan=True)
+        else:
+            same = (a == b).fillna(False).to_numpy() | (a.isna() & b.isna()).to_numpy()
+        if not same.all():
+            diffs[col] = int((~same).sum())
+    return diffs
+
+def benchmark_grouping(df: pd.DataFrame, repeat: int = 3, scale: int = 1) -> dict:
+    """
+    Times both implementations (best of `repeat`) on `df`, optionally replicated
+    `scale` times under distinct insider names to mimic a longer history.
+    """
+    if scale > 1:
+        df = pd.concat(
+            [df.assign(insider_name=df["insider_name"].astype(str) + f" #{i}") for i in range(scale)],
+            ignore_index=True,
+        )
+
+    def _best(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(df)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    vectorized = _best(group_same_day_insider_trades)
+    reference = _best(group_same_day_insider_trades_reference)
+    return {
+        "rows": len(df),
+        "vectorized_sec": round(vectorized, 4),
+        "reference_sec": round(reference, 4),
+        "speedup": round(reference / vectorized, 1),
+    }
+
+if __name__ == "__main__":
+    from core.io.file_manager import load_finviz_all_trades
+
+    parser = argparse.ArgumentParser(description="Same-day insider trade grouping: equivalence check and benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=1, help="Replicate the history N times")
+    args = parser.parse_args()
+
+    trades = load_finviz_all_trades()
+    diffs = verify_grouping(trades)
+    print("✅ Vectorized grouping matches the reference" if not diffs else f"⚠️ Mismatches: {diffs}")
+    print(benchmark_grouping(trades, repeat=args.repeat, scale=args.scale))
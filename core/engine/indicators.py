@@ -0,0 +1,226 @@
+import numpy as np
+import pandas as pd
+
+def sma(close: np.ndarray, window: int) -> np.ndarray:
+    """
+    Simple moving average, same as ta.trend.SMAIndicator: NaN until `window` values
+    are available and while a missing close is inside the window.
+    """
+    return pd.Series(close, dtype="float64").rolling(window, min_periods=window).mean().to_numpy()
+
+def ema(close: np.ndarray, window: int) -> np.ndarray:
+    """Exponential moving average (span = window, NaN until `window` values)."""
+    return pd.Series(close, dtype="float64").ewm(span=window, min_periods=window, adjust=False).mean().to_numpy()
+
+def rsi(close: np.ndarray, window: int) -> np.ndarray:
+    """
+    Wilder RSI, same definition as ta.momentum.RSIIndicator:
+    smoothed gains / losses with alpha = 1 / window, 100 when there are no losses.
+    """
+    diff = np.diff(np.asarray(close, dtype=np.float64), prepend=np.nan)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    ema_up = pd.Series(up).ewm(alpha=1 / window, min_periods=window, adjust=False).mean().to_numpy()
+    ema_down = pd.Series(down).ewm(alpha=1 / window, min_periods=window, adjust=False).mean().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(ema_down == 0, 100.0, 100 - 100 / (1 + ema_up / ema_down))
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """max(high - low, |high - prev close|, |low - prev close|), ignoring missing terms."""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int) -> np.ndarray:
+    """
+    Average True Range as used by add_atr_to_trades(): mean of the last `window`
+    true ranges, NaN for the first `window` rows (not enough lookback).
+    """
+    tr = pd.Series(true_range(high, low, close))
+    out = tr.rolling(window, min_periods=1).mean().to_numpy().copy()
+    out[:window] = np.nan
+    return out
+
+def volume_sma(volume: np.ndarray, window: int) -> np.ndarray:
+    return sma(np.asarray(volume, dtype=np.float64), window)
+
+# === Declared indicator set ===
+# name -> (function, params). Every indicator is computed for the whole OHLC
+# series of a ticker at once and stored in the indicator table.
+INDICATORS = {
+    "sma_20": (sma, {"window": 20}),
+    "ema_20": (ema, {"window": 20}),
+    "rsi_14": (rsi, {"window": 14}),
+    "atr_14": (atr, {"window": 14}),
+    "volume_sma_20": (volume_sma, {"window": 20}),
+}
+
+# Stored tables / states built with another version are recomputed (bump when a definition changes)
+INDICATOR_VERSION = 3
+
+# Input columns of each indicator function
+INDICATOR_INPUTS = {
+    sma: ["close"],
+    ema: ["close"],
+    rsi: ["close"],
+    atr: ["high", "low", "close"],
+    volume_sma: ["volume"],
+}
+
+# Columns derived from other indicators / the previous row
+DERIVED_COLUMNS = ["atr_14_pct", "price_prev", "sma_20_prev"]
+
+INDICATOR_COLUMNS = list(INDICATORS) + DERIVED_COLUMNS
+
+def compute_indicators(ohlc: pd.DataFrame, indicators: dict = INDICATORS) -> pd.DataFrame:
+    """
+    Computes the declared indicators for a whole OHLC series (sorted by date).
+    Returns a table with date, close and one column per indicator.
+    """
+    ohlc = ohlc.sort_values("date").reset_index(drop=True)
+    table = pd.DataFrame({
+        "date": pd.to_datetime(ohlc["date"]).to_numpy(dtype="datetime64[D]"),
+        "close": ohlc["close"].to_numpy(dtype=np.float64),
+    })
+
+    for name, (func, params) in indicators.items():
+        inputs = [ohlc[col].to_numpy(dtype=np.float64) for col in INDICATOR_INPUTS[func]]
+        table[name] = func(*inputs, **params)
+
+    table["atr_14_pct"] = table["atr_14"] / table["close"]
+    table["price_prev"] = table["close"].shift(1)
+    table["sma_20_prev"] = table["sma_20"].shift(1)
+    return table
+
+# === Rolling state (incremental updates) ===
+# Each indicator has a state builder (from the full input series) and a step
+# function that consumes one new bar in O(1) and returns the indicator value.
+
+def sma_state(values: np.ndarray, window: int) -> dict:
+    # Running sum of the non-missing values in the tail plus the number of missing ones
+    tail = np.asarray(values, dtype=np.float64)[-window:]
+    return {"tail": tail.tolist(), "sum": float(np.nansum(tail)), "missing": int(np.isnan(tail).sum())}
+
+def sma_step(state: dict, value: float, window: int) -> float:
+    value = float(value)
+    state["tail"].append(value)
+    if np.isnan(value):
+        state["missing"] += 1
+    else:
+        state["sum"] += value
+    if len(state["tail"]) > window:
+        dropped = state["tail"].pop(0)
+        if np.isnan(dropped):
+            state["missing"] -= 1
+        else:
+            state["sum"] -= dropped
+    complete = len(state["tail"]) == window and not state["missing"]
+    return state["sum"] / window if complete else np.nan
+
+def _ewm_step(previous: float | None, value: float, alpha: float) -> float:
+    return value if previous is None else (1 - alpha) * previous + alpha * value
+
+def ema_state(close: np.ndarray, window: int) -> dict:
+    # Same recursion as pandas ewm(adjust=False): a missing close keeps the value
+    # and decays the weight of the old value against the next observation
+    close = np.asarray(close, dtype=np.float64)
+    observed = np.flatnonzero(~np.isnan(close))
+    if not len(observed):
+        return {"value": None, "weight": 1.0, "count": 0}
+    last = pd.Series(close).ewm(span=window, adjust=False).mean().iloc[-1]
+    trailing_missing = len(close) - 1 - observed[-1]
+    return {"value": float(last), "weight": (1 - 2 / (window + 1)) ** trailing_missing, "count": len(observed)}
+
+def ema_step(state: dict, close: float, window: int) -> float:
+    alpha = 2 / (window + 1)
+    close = float(close)
+    if state["value"] is None:
+        state["value"] = None if np.isnan(close) else close
+    else:
+        state["weight"] *= 1 - alpha
+        if not np.isnan(close):
+            state["value"] = (state["weight"] * state["value"] + alpha * close) / (state["weight"] + alpha)
+            state["weight"] = 1.0
+    state["count"] += not np.isnan(close)
+    return state["value"] if state["count"] >= window else np.nan
+
+def _rsi_value(avg_up: float, avg_down: float) -> float:
+    return 100.0 if avg_down == 0 else 100 - 100 / (1 + avg_up / avg_down)
+
+def rsi_state(close: np.ndarray, window: int) -> dict:
+    close = np.asarray(close, dtype=np.float64)
+    if len(close) == 0:
+        return {"prev_close": None, "avg_up": None, "avg_down": None, "count": 0}
+    diff = np.diff(close, prepend=np.nan)
+    up = pd.Series(np.where(diff > 0, diff, 0.0)).ewm(alpha=1 / window, adjust=False).mean().iloc[-1]
+    down = pd.Series(np.where(diff < 0, -diff, 0.0)).ewm(alpha=1 / window, adjust=False).mean().iloc[-1]
+    return {"prev_close": float(close[-1]), "avg_up": float(up), "avg_down": float(down), "count": len(close)}
+
+def rsi_step(state: dict, close: float, window: int) -> float:
+    diff = np.nan if state["prev_close"] is None else close - state["prev_close"]
+    state["avg_up"] = _ewm_step(state["avg_up"], diff if diff > 0 else 0.0, 1 / window)
+    state["avg_down"] = _ewm_step(state["avg_down"], -diff if diff < 0 else 0.0, 1 / window)
+    state["prev_close"] = float(close)
+    state["count"] += 1
+    return _rsi_value(state["avg_up"], state["avg_down"]) if state["count"] >= window else np.nan
+
+def atr_state(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int) -> dict:
+    tr = true_range(high, low, close)
+    return {
+        "tail": tr[-window:].tolist(),
+        "prev_close": float(close[-1]) if len(close) else None,
+        "count": len(tr),
+    }
+
+def atr_step(state: dict, high: float, low: float, close: float, window: int) -> float:
+    prev_close = np.nan if state["prev_close"] is None else state["prev_close"]
+    tr = np.fmax(high - low, np.fmax(abs(high - prev_close), abs(low - prev_close)))
+    state["tail"].append(float(tr))
+    if len(state["tail"]) > window:
+        state["tail"].pop(0)
+    state["prev_close"] = float(close)
+    state["count"] += 1
+    return float(np.nanmean(state["tail"])) if state["count"] > window else np.nan
+
+# function -> (state builder, step)
+INDICATOR_UPDATERS = {
+    sma: (sma_state, sma_step),
+    ema: (ema_state, ema_step),
+    rsi: (rsi_state, rsi_step),
+    atr: (atr_state, atr_step),
+    volume_sma: (sma_state, sma_step),
+}
+
+def indicator_state(ohlc: pd.DataFrame, indicators: dict = INDICATORS) -> dict:
+    """Rolling state of every indicator after the last bar of `ohlc`."""
+    ohlc = ohlc.sort_values("date")
+    state = {}
+    for name, (func, params) in indicators.items():
+        inputs = [ohlc[col].to_numpy(dtype=np.float64) for col in INDICATOR_INPUTS[func]]
+        state[name] = INDICATOR_UPDATERS[func][0](*inputs, **params)
+    return state
+
+def append_bars(table: pd.DataFrame, state: dict, bars: pd.DataFrame, indicators: dict = INDICATORS) -> pd.DataFrame:
+    """
+    Extends an indicator table with new bars (all later than the table's last date),
+    updating `state` in place. O(1) per bar and indicator.
+    """
+    bars = bars.sort_values("date")
+    last = table.iloc[-1] if not table.empty else None
+    rows = []
+    for bar in bars.itertuples(index=False):
+        row = {"date": np.datetime64(pd.Timestamp(bar.date).date(), "D"), "close": float(bar.close)}
+        for name, (func, params) in indicators.items():
+            values = [float(getattr(bar, col)) for col in INDICATOR_INPUTS[func]]
+            row[name] = INDICATOR_UPDATERS[func][1](state[name], *values, **params)
+        row["atr_14_pct"] = row["atr_14"] / row["close"]
+        row["price_prev"] = np.nan if last is None else last["close"]
+        row["sma_20_prev"] = np.nan if last is None else last["sma_20"]
+        rows.append(row)
+        last = row
+
+    new_rows = pd.DataFrame(rows, columns=table.columns)
+    new_rows["date"] = new_rows["date"].to_numpy(dtype="datetime64[D]")
+    if table.empty:
+        return new_rows.reset_index(drop=True)
+    return pd.concat([table, new_rows], ignore_index=True)
@@ -0,0 +1,221 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import joblib
+from datetime import datetime
+from xgboost import XGBClassifier
+
+from config.settings import MODELS_ROOT
+from core.engine.features import MANIFEST_FILE, build_manifest
+from core.io.atomic import atomic_path, write_json, file_lock
+
+MODELS_DIR = MODELS_ROOT
+REGISTRY_DIR = os.path.join(MODELS_DIR, "registry")
+REGISTRY_FILE = os.path.join(REGISTRY_DIR, "registry.json")
+
+# Loaded models by (version, name): each artifact is read at most once per process
+_MODEL_CACHE = {}
+
+def _empty_registry() -> dict:
+    return {"current": None, "history": [], "versions": {}}
+
+def load_registry(registry_file: str = REGISTRY_FILE) -> dict:
+    """Loads registry.json (an empty registry if none exists yet)."""
+    if not os.path.exists(registry_file):
+        return _empty_registry()
+    with open(registry_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_registry(registry: dict, registry_file: str = REGISTRY_FILE):
+    write_json(registry, registry_file, ensure_ascii=False, indent=2)
+
+def file_hash(path: str) -> str:
+    """sha1 of a file's bytes (e.g. a training feature set .npz)."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+def _next_version(registry: dict) -> str:
+    last = max((int(v[1:]) for v in registry["versions"]), default=0)
+    return f"v{last + 1:04d}"
+
+def _save_artifact(model, version_dir: str, name: str) -> dict:
+    """XGBoost models in the native JSON format, everything else with joblib."""
+    if isinstance(model, XGBClassifier):
+        filename = f"{name}.json"
+        with atomic_path(os.path.join(version_dir, filename)) as tmp_path:
+            model.save_model(tmp_path)
+        return {"file": filename, "format": "xgboost"}
+    filename = f"{name}.pkl"
+    with atomic_path(os.path.join(version_dir, filename)) as tmp_path:
+        joblib.dump(model, tmp_path)
+    return {"file": filename, "format": "joblib"}
+
+def register_models(
+    models: dict,
+    manifest: dict,
+    data_hashes: dict | None = None,
+    metrics: dict | None = None,
+    promote: bool = True,
+    note: str = "",
+    registry_file: str = REGISTRY_FILE,
+) -> str:
+    """
+    Registers a new model version: saves every artifact plus the feature manifest
+    and metadata (training data hashes, metrics) under models/registry/<version>/.
+
+    Parameters:
+        models: {name: fitted model}, e.g. {"xgb_case1": ..., "rf_case2": ...}
+        manifest: feature manifest the models were trained with
+        data_hashes: {dataset: hash} of the training data
+        metrics: {name: metrics dict} (e.g. from train.train_model)
+        promote: make it the current version right away
+
+    Returns:
+        The new version id (e.g. "v0003").
+    """
+    # Registry updates are read-modify-write: one writer at a time
+    with file_lock(registry_file):
+        registry = load_registry(registry_file)
+        version = _next_version(registry)
+        version_dir = os.path.join(os.path.dirname(registry_file), version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        artifacts = {name: _save_artifact(model, version_dir, name) for name, model in models.items()}
+
+        write_json(manifest, os.path.join(version_dir, MANIFEST_FILE), ensure_ascii=False, indent=2)
+
+        entry = {
+            "version": version,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "manifest_hash": manifest["hash"],
+            "data_hashes": data_hashes or {},
+            "models": artifacts,
+            "metrics": metrics or {},
+            "note": note,
+        }
+        write_json(entry, os.path.join(version_dir, "metadata.json"), ensure_ascii=False, indent=2)
+
+        registry["versions"][version] = {k: entry[k] for k in ("created_at", "manifest_hash", "data_hashes", "models", "note")}
+        save_registry(registry, registry_file)
+        print(f"📦 Registered model version {version} ({len(artifacts)} models)")
+
+        if promote:
+            promote_version(version, registry_file)
+    return version
+
+def promote_version(version: str, registry_file: str = REGISTRY_FILE):
+    """Points `current` at `version`, remembering the previous one for rollback."""
+    with file_lock(registry_file):
+        registry = load_registry(registry_file)
+        if version not in registry["versions"]:
+            raise KeyError(f"❌ Unknown model version: {version}")
+        if registry["current"] and registry["current"] != version:
+            registry["history"].append(registry["current"])
+        registry["current"] = version
+        save_registry(registry, registry_file)
+        print(f"🚀 Current model version: {version}")
+
+def rollback(registry_file: str = REGISTRY_FILE) -> str:
+    """Restores the previously current version. Returns it."""
+    with file_lock(registry_file):
+        registry = load_registry(registry_file)
+        if not registry["history"]:
+            raise RuntimeError("❌ No previous model version to roll back to")
+        registry["current"] = registry["history"].pop()
+        save_registry(registry, registry_file)
+        print(f"⏪ Rolled back to model version {registry['current']}")
+    return registry["current"]
+
+def current_version(registry_file: str = REGISTRY_FILE) -> str | None:
+    return load_registry(registry_file)["current"]
+
+def get_version_info(version: str | None = None, registry_file: str = REGISTRY_FILE) -> dict:
+    """Registry entry of a version (defaults to current)."""
+    registry = load_registry(registry_file)
+    version = version or registry["current"]
+    if version is None:
+        raise LookupError("❌ Model registry is empty")
+    return {"version": version, **registry["versions"][version]}
+
+def load_version_manifest(version: str | None = None, registry_file: str = REGISTRY_FILE) -> dict:
+    """Feature manifest stored with a model version."""
+    info = get_version_info(version, registry_file)
+    path = os.path.join(os.path.dirname(registry_file), info["version"], MANIFEST_FILE)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def get_model(name: str, version: str | None = None, registry_file: str = REGISTRY_FILE):
+    """
+    Lazily loads a single model of a version (defaults to current).
+    Only the requested artifact is read, and it is cached for the process.
+    """
+    info = get_version_info(version, registry_file)
+    key = (registry_file, info["version"], name)
+    if key in _MODEL_CACHE:
+        return _MODEL_CACHE[key]
+
+    if name not in info["models"]:
+        raise KeyError(f"❌ Model {name} not in version {info['version']}")
+    artifact = info["models"][name]
+    path = os.path.join(os.path.dirname(registry_file), info["version"], artifact["file"])
+
+    if artifact["format"] == "xgboost":
+        model = XGBClassifier()
+        model.load_model(path)
+    else:
+        model = joblib.load(path)
+
+    _MODEL_CACHE[key] = model
+    return model
+
+def clear_model_cache():
+    _MODEL_CACHE.clear()
+
+def register_legacy_models(models_dir: str = MODELS_DIR, registry_file: str = REGISTRY_FILE) -> str:
+    """Imports the flat models/*_case*.pkl files as a registry version (rollback baseline)."""
+    models = {}
+    for filename in sorted(os.listdir(models_dir)):
+        if filename.endswith(".pkl") and "_case" in filename:
+            models[filename[:-4]] = joblib.load(os.path.join(models_dir, filename))
+    if not models:
+        raise FileNotFoundError(f"❌ No legacy models found in {models_dir}")
+    return register_models(models, build_manifest(), note="imported legacy pickles", registry_file=registry_file)
+
+def remove_version(version: str, registry_file: str = REGISTRY_FILE):
+    """Deletes a non-current version and its artifacts."""
+    with file_lock(registry_file):
+        registry = load_registry(registry_file)
+        if version == registry["current"]:
+            raise ValueError("❌ Cannot remove the current model version")
+        registry["versions"].pop(version)
+        registry["history"] = [v for v in registry["history"] if v != version]
+        save_registry(registry, registry_file)
+        shutil.rmtree(os.path.join(os.path.dirname(registry_file), version), ignore_errors=True)
+        print(f"🗑️ Removed model version {version}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    sub.add_parser("rollback")
+    sub.add_parser("import-legacy")
+    promote_parser = sub.add_parser("promote")
+    promote_parser.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        registry = load_registry()
+        for version, info in registry["versions"].items():
+            marker = "👉" if version == registry["current"] else "  "
+            print(f"{marker} {version}  {info['created_at']}  {', '.join(info['models'])}  {info['note']}")
+    elif args.command == "promote":
+        promote_version(args.version)
+    elif args.command == "rollback":
+        rollback()
+    elif args.command == "import-legacy":
+        register_legacy_models()
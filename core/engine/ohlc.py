@@ -1,12 +1,17 @@
 import time
 import random
+import numpy as np
 import pandas as pd
 from yahooquery import Ticker
 from datetime import timedelta, datetime
 from pandas.tseries.holiday import USFederalHolidayCalendar
 from pandas.tseries.offsets import CustomBusinessDay
 
-from core.io.cache import load_ohlc_cache, save_ohlc_cache
+from core.io.atomic import file_lock
+from core.utils.metrics import incr, timer
+from core.io.cache import get_ohlc_cache_path, load_ohlc_cache, save_ohlc_cache
+from core.io.indicator_store import lookup_trade_indicators, update_indicator_table
+from core.io.corporate_actions import actions_from_history, record_corporate_actions, load_adjusted_ohlc
 from config.problematic_tickers import IPO_TICKERS
 
 us_bd = CustomBusinessDay(calendar=USFederalHolidayCalendar())
@@ -20,10 +25,11 @@ def missing_day_tolerance(date, cached_dates):
     after = (pd.Timestamp(date) + 1 * us_bd).date()
     return before in cached_dates and after in cached_dates
 
-def determine_fetch_range(trades_df: pd.DataFrame):
+def determine_fetch_range(trades_df: pd.DataFrame, forward_days: int = 20):
     """
     Determines the minimal start and end date needed for OHLC data fetch
     across all transactions, using business days and US holiday calendar.
+    Each trade needs [T - 10BD, T + forward_days BD].
     Also returns the ticker associated with the earliest and latest date.
     """
     today = pd.Timestamp.today().normalize().date() - timedelta(days=1)
@@ -41,9 +47,9 @@ def determine_fetch_range(trades_df: pd.DataFrame):
 
         T = row["transaction_date"]
 
-        # Smart window: [T - 10BD (15 days), T + 20BD (~1 month)]
+        # Smart window: [T - 10BD (15 days), T + forward_days BD (~1 month)]
         win_start = (pd.Timestamp(T) - 10 * us_bd).date()
-        win_end = (pd.Timestamp(T) + 20 * us_bd).date()
+        win_end = (pd.Timestamp(T) + forward_days * us_bd).date()
 
         cached = load_ohlc_cache(ticker)
         cached_dates = set(cached["date"]) if not cached.empty else set()
@@ -75,7 +81,7 @@ def determine_fetch_range(trades_df: pd.DataFrame):
 
     return fetch_start, fetch_end, ticker_start, ticker_end
 
-def update_ohlc(trades_df: pd.DataFrame):
+def update_ohlc(trades_df: pd.DataFrame, forward_days: int = 20):
     """
     Reads tagged trades, determines minimal OHLC fetch range across all tickers,
     and updates the local OHLC cache using one batch call.
@@ -84,7 +90,8 @@ def update_ohlc(trades_df: pd.DataFrame):
     trades_df["transaction_date"] = pd.to_datetime(trades_df["transaction_date"]).dt.date
 
     # Get global fetch window using smart per-transaction windows
-    fetch_start, fetch_end, ticker_start, ticker_end = determine_fetch_range(trades_df)
+    with timer("ohlc.fetch_range"):
+        fetch_start, fetch_end, ticker_start, ticker_end = determine_fetch_range(trades_df, forward_days)
 
     if fetch_start is None or fetch_end is None:
         print("✅ No OHLC update needed.")
@@ -94,15 +101,26 @@ def update_ohlc(trades_df: pd.DataFrame):
     print(f"📅 Fetching OHLC for {len(tickers)} tickers: {fetch_start} ({ticker_start}) → {fetch_end} ({ticker_end})")
 
     # Batch fetch OHLC
-    ohlc_data = fetch_bulk_ohlc(tickers, fetch_start, fetch_end)
+    with timer("ohlc.fetch"):
+        ohlc_data = fetch_bulk_ohlc(tickers, fetch_start, fetch_end)
+
+    # Splits / dividends come with the history
+    actions = [actions_from_history(ticker, df) for ticker, df in ohlc_data.items()]
+    actions = [a for a in actions if not a.empty]
+    if actions:
+        record_corporate_actions(pd.concat(actions, ignore_index=True))
 
     # Save to cache
+    fetched_on = datetime.today().date()
     for ticker, df in ohlc_data.items():
         if not df.empty:
-            cached = load_ohlc_cache(ticker)
-            frames = [df for df in [cached, df] if not df.empty and not df.isna().all().all()]
-            combined = pd.concat(frames, ignore_index=True).drop_duplicates(subset="date")
-            save_ohlc_cache(ticker, combined)
+            df = df.assign(fetched_on=fetched_on)
+            with file_lock(get_ohlc_cache_path(ticker)):
+                cached = load_ohlc_cache(ticker)
+                frames = [df for df in [cached, df] if not df.empty and not df.isna().all().all()]
+                combined = pd.concat(frames, ignore_index=True).drop_duplicates(subset="date")
+                save_ohlc_cache(ticker, combined)
+                update_indicator_table(ticker)
 
 
 def fetch_bulk_ohlc(tickers: list[str], start_date, end_date) -> dict[str, pd.DataFrame]:
@@ -121,11 +139,12 @@ def fetch_bulk_ohlc(tickers: list[str], start_date, end_date) -> dict[str, pd.Da
 
         try:
             tq = Ticker(batch)
-            hist = tq.history(
-                start=str(start_date),
-                end=str(end_date + timedelta(days=1)),
-                interval="1d"
-            )
+            with timer("ohlc.fetch_batch"):
+                hist = tq.history(
+                    start=str(start_date),
+                    end=str(end_date + timedelta(days=1)),
+                    interval="1d"
+                )
 
             if isinstance(hist, pd.DataFrame) and not hist.empty:
                 hist = hist.reset_index()
@@ -135,7 +154,8 @@ def fetch_bulk_ohlc(tickers: list[str], start_date, end_date) -> dict[str, pd.Da
                     if df.empty:
                         continue
 
-                    df = df[["date", "open", "high", "low", "close", "volume"]]
+                    events = [col for col in ("dividends", "splits") if col in df.columns]
+                    df = df[["date", "open", "high", "low", "close", "volume"] + events]
 
                     df["date"] = pd.to_datetime(df["date"], utc=True, errors="coerce")  # safely force uniform dtype
                     df["date"] = df["date"].dt.tz_localize(None)  # remove tz
@@ -148,6 +168,7 @@ def fetch_bulk_ohlc(tickers: list[str], start_date, end_date) -> dict[str, pd.Da
 
         time.sleep(random.uniform(0.8, 2.5))
 
+    incr("ohlc.tickers_fetched", len(result))
     return result
 
 def get_window_stats(ohlc: pd.DataFrame, trade_date: pd.Timestamp, insider_price: float, days_forward: int):
@@ -253,10 +274,11 @@ def enrich_trades_with_price_deltas(df: pd.DataFrame) -> pd.DataFrame:
     low_at_trade = []
     high_at_trade = []
 
-    sma_20_at_trade = []
-    rsi_14_at_trade = []
-    sma_20_prev = []
-    price_prev = []
+    # Indicators on the trade day and on the previous business day (indicator store)
+    at_trade = lookup_trade_indicators(df, ["sma_20", "rsi_14", "close"])
+    prev_dates = df["transaction_date"].dt.normalize() - us_bd
+    at_prev = lookup_trade_indicators(df, ["sma_20", "close"], dates=prev_dates)
+    at_prev[at_trade["close"].isna()] = np.nan  # no trade-day bar → no previous-day context
 
     high_plus_7d = []
     low_plus_7d = []
@@ -286,11 +308,10 @@ def enrich_trades_with_price_deltas(df: pd.DataFrame) -> pd.DataFrame:
         ticker = row["ticker"]
         trade_date = row["transaction_date"].date()
 
-        ohlc = load_ohlc_cache(ticker)
+        ohlc = load_adjusted_ohlc(ticker).copy()
         if ohlc.empty:
             # Append all None if no data
             market_close_at_trade.append(None); market_open_at_trade.append(None); low_at_trade.append(None); high_at_trade.append(None)
-            sma_20_at_trade.append(None); rsi_14_at_trade.append(None); sma_20_prev.append(None); price_prev.append(None)
             high_plus_7d.append(None);  low_plus_7d.append(None);  max_gain_7d.append(None);  max_drawdown_7d.append(None)
             high_plus_14d.append(None); low_plus_14d.append(None); max_gain_14d.append(None); max_drawdown_14d.append(None)
             high_plus_30d.append(None); low_plus_30d.append(None); max_gain_30d.append(None); max_drawdown_30d.append(None)
@@ -311,30 +332,12 @@ def enrich_trades_with_price_deltas(df: pd.DataFrame) -> pd.DataFrame:
             market_close_at_trade.append(row_ohlc.get("close"))
             high_at_trade.append(row_ohlc.get("high"))
             low_at_trade.append(row_ohlc.get("low"))
-
-            # Indicators on trade day
-            sma_20_at_trade.append(row_ohlc.get("sma_20"))
-            rsi_14_at_trade.append(row_ohlc.get("rsi_14"))
-
-            # Previous business day
-            prev_date = (trade_date - us_bd).date()
-            if prev_date in ohlc_map.index:
-                row_prev = ohlc_map.loc[prev_date]
-                sma_20_prev.append(row_prev.get("sma_20"))
-                price_prev.append(row_prev.get("close"))
-            else:
-                sma_20_prev.append(None)
-                price_prev.append(None)
         else:
             # If trade_date not found — fill with None for all columns
             market_open_at_trade.append(None)
             market_close_at_trade.append(None)
             high_at_trade.append(None)
             low_at_trade.append(None)
-            sma_20_at_trade.append(None)
-            rsi_14_at_trade.append(None)
-            sma_20_prev.append(None)
-            price_prev.append(None)
 
         # Final gain after ~30 calendar days (~21 business days)
         final_close_price = None
@@ -379,10 +382,10 @@ def enrich_trades_with_price_deltas(df: pd.DataFrame) -> pd.DataFrame:
     df["high_at_trade"] = high_at_trade
     df["low_at_trade"] = low_at_trade
 
-    df["sma_20_at_trade"] = sma_20_at_trade
-    df["rsi_14_at_trade"] = rsi_14_at_trade
-    df["sma_20_prev"] = sma_20_prev
-    df["price_prev"] = price_prev
+    df["sma_20_at_trade"] = at_trade["sma_20"]
+    df["rsi_14_at_trade"] = at_trade["rsi_14"]
+    df["sma_20_prev"] = at_prev["sma_20"]
+    df["price_prev"] = at_prev["close"]
 
     df["high_plus_7d"] = high_plus_7d
     df["low_plus_7d"] = low_plus_7d
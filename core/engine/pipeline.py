@@ -0,0 +1,375 @@
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from core.io.file_manager import (
+    FINVIZ_DATA_DIR, TRADE_KEY, trade_keys, load_finviz_all_trades, load_latest_tagged_trades,
+    load_scored_trades, load_scored_with_tags_trades, save_scores, save_tagged_trades,
+)
+from core.io.atomic import LOCK_SUFFIX, write_csv, write_json, write_npz, file_lock
+from core.utils.metrics import incr, observe, timer, reset_metrics, write_run_report
+from config.settings import PROMETHEUS_TEXTFILE
+from core.io.cache import OHLC_CACHE_DIR, SNAPSHOT_FILE, SNAPSHOT_JOURNAL, load_snapshot_cache
+from core.engine.model_registry import REGISTRY_FILE, file_hash
+from core.engine.features import FEATURES_DIR
+
+PIPELINE_DIR = os.path.join(FINVIZ_DATA_DIR, "pipeline")
+STATE_FILE = os.path.join(PIPELINE_DIR, "state.json")
+
+ALL_TRADES_FILE = os.path.join(FINVIZ_DATA_DIR, "finviz_all_trades.csv")
+TAGGED_FILE = os.path.join(FINVIZ_DATA_DIR, "finviz_tagged.csv")
+SCORES_FILE = os.path.join(FINVIZ_DATA_DIR, "scores.csv")
+SCORES_WITH_TAGS_FILE = os.path.join(FINVIZ_DATA_DIR, "scores_with_tags.csv")
+PREDICT_FILE = os.path.join(FEATURES_DIR, "predict.npz")
+PREDICTIONS_FILE = os.path.join(FINVIZ_DATA_DIR, "predicted_trades.csv")
+
+# === Hashing ===
+
+def input_hash(path: str) -> str | None:
+    """Content hash of a file, or of every file in a directory (None if missing)."""
+    if os.path.isdir(path):
+        h = hashlib.sha1()
+        for name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, name)
+            # lock files and in-flight temp files (core.io.atomic) are not content
+            if name.startswith(".") or name.endswith(LOCK_SUFFIX):
+                continue
+            if os.path.isfile(file_path):
+                h.update(f"{name}:{file_hash(file_path)};".encode())
+        return h.hexdigest()[:12]
+    if os.path.exists(path):
+        return file_hash(path)
+    return None
+
+def _is_table(path: str) -> bool:
+    return path.endswith(".csv") and os.path.isfile(path)
+
+def read_fingerprint_table(path: str) -> pd.DataFrame:
+    """A table exactly as stored (strings), for hashing rows."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.columns = df.columns.str.strip()
+    return df.apply(lambda col: col.str.strip())
+
+def row_fingerprint(path: str, key: list[str] = TRADE_KEY) -> tuple[np.ndarray, np.ndarray]:
+    """(row keys, row content hashes) of a CSV table."""
+    df = read_fingerprint_table(path)
+    keys = trade_keys(df, key).to_numpy(dtype=str)
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return keys, hashes
+
+def _fingerprint_path(stage_name: str, path: str) -> str:
+    return os.path.join(PIPELINE_DIR, f"{stage_name}.{os.path.basename(path)}.npz")
+
+def row_delta(old: tuple | None, new: tuple) -> tuple[set, set]:
+    """
+    Keys whose rows are new or changed, and keys that disappeared, between two fingerprints.
+    A key with several rows (e.g. duplicate raw filings) counts as changed if any of them did.
+    """
+    new_keys, new_hashes = new
+    if old is None:
+        return set(new_keys), set()
+    old_keys, old_hashes = old
+    seen = set(zip(old_keys, old_hashes.tolist()))
+    changed = {k for k, h in zip(new_keys, new_hashes.tolist()) if (k, h) not in seen}
+    # a row dropped under a key that still exists changes that key too
+    current = set(zip(new_keys, new_hashes.tolist()))
+    changed |= {k for k, h in seen if (k, h) not in current}
+    removed = set(old_keys) - set(new_keys)
+    return changed - removed, removed
+
+# === State ===
+
+def load_state(path: str = STATE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {"stages": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(state: dict, path: str = STATE_FILE):
+    write_json(state, path, ensure_ascii=False, indent=2)
+
+def _load_fingerprint(stage_name: str, path: str) -> tuple | None:
+    fp_path = _fingerprint_path(stage_name, path)
+    if not os.path.exists(fp_path):
+        return None
+    data = np.load(fp_path)
+    return data["keys"], data["hashes"]
+
+def _save_fingerprint(stage_name: str, path: str, fingerprint: tuple):
+    write_npz(_fingerprint_path(stage_name, path), keys=fingerprint[0], hashes=fingerprint[1])
+
+# === Stages ===
+
+def stage(name: str, run, inputs: list[str], outputs: list[str], key: list[str] = TRADE_KEY, always: bool = False) -> dict:
+    """
+    A pipeline stage.
+    - inputs / outputs: files or directories it reads / writes
+    - run(ctx): does the work; ctx["full"] is False when only rows of CSV inputs changed,
+      then ctx["changed"] / ctx["removed"] hold the affected row keys (see trade_keys);
+      ctx["force"] is set on --force runs
+    - always: run even if the inputs are unchanged (network sources, TTL-based refreshes)
+    """
+    return {"name": name, "run": run, "inputs": inputs, "outputs": outputs, "key": key, "always": always}
+
+def merge_by_key(existing: pd.DataFrame, updates: pd.DataFrame, removed=(), key: list[str] = TRADE_KEY) -> pd.DataFrame:
+    """Replaces the rows of `existing` that `updates` re-computed (and drops removed keys)."""
+    if existing.empty:
+        return updates.reset_index(drop=True)
+    drop = set(trade_keys(updates, key)) | set(removed)
+    kept = existing[~trade_keys(existing, key).isin(drop)]
+    return pd.concat([kept, updates], ignore_index=True)
+
+def _delta_rows(df: pd.DataFrame, ctx: dict) -> pd.DataFrame:
+    return df[trade_keys(df, ctx["key"]).isin(ctx["changed"])]
+
+def _run_scan(ctx: dict):
+    from core.scanner import scan_from_finviz
+    scan_from_finviz()
+
+def _run_snapshots(ctx: dict):
+    from core.engine.analyzer import fetch_missing_snapshots
+    from core.io.shares_outstanding import refresh_shares, tickers_without_shares
+
+    tickers = load_finviz_all_trades()["ticker"].unique()
+    cache = fetch_missing_snapshots(tickers, load_snapshot_cache())
+    refresh_shares(tickers_without_shares(tickers), {t: cache.get(t, {}) for t in tickers})
+
+def _run_ohlc(ctx: dict):
+    from core.engine.analyzer import MIN_MARKET_CAP, prefilter_tickers
+    from core.engine.ohlc import update_ohlc
+    from core.io.pending_outcomes import OUTCOME_HORIZON
+
+    df = load_finviz_all_trades()
+    tickers = df["ticker"].unique()
+    cache = load_snapshot_cache()
+    valid = prefilter_tickers(tickers, {t: cache.get(t, {}) for t in tickers}, min_market_cap=MIN_MARKET_CAP)
+    update_ohlc(df[df["ticker"].isin(valid)].copy(), forward_days=OUTCOME_HORIZON)
+
+def _run_tag(ctx: dict):
+    from core.engine.analyzer import analyze_finviz_trade
+    # The analyzer finds new and maturing trades itself (OHLC changes make this stage "full" daily)
+    analyze_finviz_trade(incremental=not ctx["force"])
+
+def _run_score(ctx: dict):
+    from core.engine.backtest import run_backtest_pipeline, score_trades
+
+    if ctx["full"]:
+        run_backtest_pipeline()
+        return
+    scored = score_trades(_delta_rows(load_latest_tagged_trades(), ctx))
+    save_scores(merge_by_key(load_scored_trades(), scored, ctx["removed"]), "scores.csv")
+    print(f"🧮 Scored {len(scored)} new/changed trades")
+
+def _attach_footnotes(rows: pd.DataFrame, old: pd.DataFrame) -> tuple[pd.DataFrame, int, int]:
+    """
+    Footnotes belong to the filing: copies them from `old` for known trades and
+    fetches them only for unseen keys. Returns (rows with footnotes, reused, fetched).
+    """
+    from core.engine.embedding import update_motive_tags
+
+    rows = rows.copy()
+    known = old.assign(_key=trade_keys(old)).drop_duplicates("_key").set_index("_key")
+    keys = trade_keys(rows)
+    reuse = keys.isin(known.index)
+    for col in ("footnote_tags", "footnote_notes"):
+        if col in known.columns:
+            rows.loc[reuse, col] = known.loc[keys[reuse], col].to_numpy()
+    fresh = update_motive_tags(rows[~reuse].copy()) if (~reuse).any() else rows[~reuse]
+    return pd.concat([rows[reuse], fresh], ignore_index=True), int(reuse.sum()), len(fresh)
+
+def _run_footnotes(ctx: dict):
+    scores = load_scored_trades()
+    exists = os.path.exists(SCORES_WITH_TAGS_FILE)
+    old = load_scored_with_tags_trades() if exists else pd.DataFrame(columns=TRADE_KEY)
+
+    if ctx["full"] or not exists:
+        # Rebuilt from every scored row: current scores and outcomes, removed trades gone
+        updated, reused, fetched = _attach_footnotes(scores, old)
+        save_tagged_trades(updated.sort_values(TRADE_KEY).reset_index(drop=True), SCORES_WITH_TAGS_FILE)
+    else:
+        updated, reused, fetched = _attach_footnotes(_delta_rows(scores, ctx), old)
+        save_tagged_trades(merge_by_key(old, updated, ctx["removed"]), SCORES_WITH_TAGS_FILE)
+    print(f"🗒️ Footnotes: {reused} reused, {fetched} fetched")
+
+def _run_prepare(ctx: dict):
+    from core.engine.prepare_predict import prepare_predict_data
+    prepare_predict_data(load_scored_with_tags_trades())
+
+def _run_predict(ctx: dict):
+    from core.engine.features import FEATURE_TAGS, ROW_ID_COLS, build_feature_matrix, build_manifest
+    from core.engine.predict import PREDICT_MODELS, check_manifest, load_scorers, predict_scores
+
+    df = load_scored_with_tags_trades()
+    unlabeled = df[df["outcome_case_1"].isna() & df["outcome_case_2"].isna()]
+
+    existing = pd.DataFrame()
+    if not ctx["full"] and os.path.exists(PREDICTIONS_FILE):
+        existing = pd.read_csv(PREDICTIONS_FILE)
+        # trades that got an outcome (or disappeared) leave the prediction file
+        existing = existing[trade_keys(existing).isin(set(trade_keys(unlabeled)))]
+        unlabeled = _delta_rows(unlabeled, ctx)
+
+    out = unlabeled[ROW_ID_COLS + ["transaction_type"]].reset_index(drop=True)
+    if not unlabeled.empty:
+        manifest = build_manifest(FEATURE_TAGS)
+        check_manifest(manifest)
+        models = load_scorers(PREDICT_MODELS)
+        X = build_feature_matrix(unlabeled, FEATURE_TAGS)
+        out["case1_pred_XGB"] = predict_scores(models["xgb_case1"], X, manifest).astype(float)
+        out["case2_pred_XGB"] = predict_scores(models["xgb_case2"], X, manifest).astype(float)
+
+    predictions = merge_by_key(existing, out)
+    predictions = predictions.sort_values("transaction_date", ascending=False)
+    write_csv(predictions, PREDICTIONS_FILE, index=False)
+    print(f"🔮 Predicted {len(out)} trades ({len(predictions)} in {PREDICTIONS_FILE})")
+
+SNAPSHOT_FILES = [SNAPSHOT_FILE, SNAPSHOT_JOURNAL]
+
+DAILY_PIPELINE = [
+    stage("scan", _run_scan, inputs=[], outputs=[ALL_TRADES_FILE], always=True),
+    stage("snapshots", _run_snapshots, inputs=[ALL_TRADES_FILE], outputs=SNAPSHOT_FILES, always=True),
+    stage("ohlc", _run_ohlc, inputs=[ALL_TRADES_FILE] + SNAPSHOT_FILES, outputs=[OHLC_CACHE_DIR], always=True),
+    stage("tag", _run_tag, inputs=[ALL_TRADES_FILE, OHLC_CACHE_DIR] + SNAPSHOT_FILES, outputs=[TAGGED_FILE]),
+    stage("score", _run_score, inputs=[TAGGED_FILE], outputs=[SCORES_FILE]),
+    stage("footnotes", _run_footnotes, inputs=[SCORES_FILE], outputs=[SCORES_WITH_TAGS_FILE]),
+    stage("prepare", _run_prepare, inputs=[SCORES_WITH_TAGS_FILE], outputs=[PREDICT_FILE]),
+    stage("predict", _run_predict, inputs=[SCORES_WITH_TAGS_FILE, REGISTRY_FILE], outputs=[PREDICTIONS_FILE]),
+]
+
+def topological_order(stages: list[dict]) -> list[dict]:
+    """Orders stages so every stage runs after the stages producing its inputs (stable otherwise)."""
+    producers = {out: s["name"] for s in stages for out in s["outputs"]}
+    deps = {s["name"]: {producers[i] for i in s["inputs"] if i in producers} - {s["name"]} for s in stages}
+    ordered, done = [], set()
+    while len(ordered) < len(stages):
+        ready = [s for s in stages if s["name"] not in done and deps[s["name"]] <= done]
+        if not ready:
+            raise ValueError(f"❌ Pipeline has a cycle between: {sorted(set(deps) - done)}")
+        ordered.append(ready[0])
+        done.add(ready[0]["name"])
+    return ordered
+
+# === Runner ===
+
+def plan_stage(s: dict, state: dict, force: bool = False) -> dict:
+    """
+    Decides how a stage runs from its current input hashes:
+    "skip" (inputs and outputs as recorded), "delta" (only rows of CSV inputs changed) or "full".
+    """
+    hashes = {path: input_hash(path) for path in s["inputs"]}
+    previous = state["stages"].get(s["name"])
+    outputs_intact = bool(previous) and all(input_hash(p) == previous["outputs"].get(p) for p in s["outputs"])
+    ctx = {"full": True, "force": force, "changed": set(), "removed": set(), "key": s["key"]}
+    plan = {"mode": "full", "hashes": hashes, "ctx": ctx, "fingerprints": {}}
+
+    if force or not previous or not outputs_intact:
+        return plan
+    changed_inputs = [p for p in s["inputs"] if hashes[p] != previous["inputs"].get(p)]
+    if not changed_inputs and not s["always"]:
+        plan["mode"] = "skip"
+        return plan
+    if not changed_inputs or not all(_is_table(p) for p in changed_inputs):
+        return plan
+
+    for path in changed_inputs:
+        old = _load_fingerprint(s["name"], path)
+        if old is None:
+            return plan
+        new = row_fingerprint(path, s["key"])
+        changed, removed = row_delta(old, new)
+        plan["ctx"]["changed"] |= changed
+        plan["ctx"]["removed"] |= removed
+        plan["fingerprints"][path] = new
+    plan["mode"] = "delta"
+    plan["ctx"]["full"] = False
+    return plan
+
+def run_stage(s: dict, state: dict, force: bool = False) -> str:
+    plan = plan_stage(s, state, force)
+    incr(f"stage.{s['name']}.{plan['mode']}")
+    if plan["mode"] == "skip":
+        print(f"⏭️ {s['name']}: inputs unchanged, skipped")
+        return "skip"
+
+    ctx = plan["ctx"]
+    detail = f" ({len(ctx['changed'])} changed, {len(ctx['removed'])} removed rows)" if plan["mode"] == "delta" else ""
+    print(f"\n▶️ {s['name']}: {plan['mode']}{detail}")
+    if plan["mode"] == "delta":
+        observe(f"stage.{s['name']}.changed_rows", len(ctx["changed"]))
+    if plan["mode"] == "delta" and not ctx["changed"] and not ctx["removed"]:
+        print(f"✅ {s['name']}: no row changes")
+    else:
+        with timer(f"stage.{s['name']}"):
+            s["run"](ctx)
+
+    # Record what this run consumed and produced
+    for path in s["inputs"]:
+        if _is_table(path):
+            _save_fingerprint(s["name"], path, plan["fingerprints"].get(path) or row_fingerprint(path, s["key"]))
+    state["stages"][s["name"]] = {
+        "inputs": {p: input_hash(p) for p in s["inputs"]},
+        "outputs": {p: input_hash(p) for p in s["outputs"]},
+        "mode": plan["mode"],
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    save_state(state)
+    return plan["mode"]
+
+def run_pipeline(
+    stages: list[dict] = DAILY_PIPELINE,
+    only=None,
+    skip=(),
+    force: bool = False,
+    dry_run: bool = False,
+    prometheus_path: str | None = PROMETHEUS_TEXTFILE or None,
+) -> dict:
+    """
+    Runs the daily pipeline incrementally: stages whose inputs did not change are skipped,
+    stages whose CSV inputs only gained/changed rows get just those rows.
+
+    Parameters:
+        only: stage names to run (default: all)
+        skip: stage names to leave out (e.g. ["scan"] to work on the trades on disk)
+        force: full recompute of every selected stage
+        dry_run: only print what each stage would do with the current inputs
+        prometheus_path: also export the run metrics there (Prometheus text format)
+
+    Returns:
+        {stage name: "skip" | "delta" | "full"}
+    """
+    reset_metrics()
+    # Single-writer lease: overlapping runs on the same data root wait for each other
+    with file_lock(STATE_FILE):
+        state = load_state()
+        selected = [s for s in topological_order(stages) if (only is None or s["name"] in only) and s["name"] not in skip]
+        results = {}
+        for s in selected:
+            if dry_run:
+                plan = plan_stage(s, state, force)
+                results[s["name"]] = plan["mode"]
+                print(f"🔎 {s['name']}: {plan['mode']} (upstream stages may change this)")
+            else:
+                results[s["name"]] = run_stage(s, state, force)
+
+    print(f"\n✅ Pipeline done: {results}")
+    if not dry_run:
+        write_run_report("pipeline", prometheus_path=prometheus_path, stages=results, force=force)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental daily pipeline: scan → snapshots → OHLC → tag → score → footnotes → prepare → predict")
+    parser.add_argument("--force", action="store_true", help="Recompute every stage from scratch")
+    parser.add_argument("--stages", nargs="*", help="Only run these stages")
+    parser.add_argument("--skip-scan", action="store_true", help="Use the trades already on disk")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without running anything")
+    parser.add_argument("--prometheus", default=PROMETHEUS_TEXTFILE or None, help="Write the run metrics to this Prometheus textfile")
+    args = parser.parse_args()
+
+    run_pipeline(
+        only=args.stages, skip=["scan"] if args.skip_scan else (), force=args.force,
+        dry_run=args.dry_run, prometheus_path=args.prometheus,
+    )
@@ -0,0 +1,291 @@
+import os
+import heapq
+import argparse
+import numpy as np
+import pandas as pd
+
+from core.engine.backtest import score_tag_bits, assign_buckets
+from core.engine.tag_registry import read_tag_bits
+from core.io.atomic import write_csv
+from core.io.corporate_actions import load_adjusted_ohlc
+from core.io.file_manager import FINVIZ_DATA_DIR, ensure_finviz_dir, load_latest_tagged_trades
+
+# --- Default simulation settings ---
+PORTFOLIO_SETTINGS = {
+    "initial_capital": 100_000.0,
+    "min_score": 12,             # Ultra Conviction and above
+    "entry_mode": "next_open",   # "next_open" (after entry_delay bars) or "insider" (insider price on trade date)
+    "entry_delay": 1,            # bars after the trade date (next_open only)
+    "target_pct": 0.10,          # same +10% spike used by the Case 2 outcome
+    "stop_pct": 0.10,            # same -10% drop used by the Case 2 outcome
+    "max_hold": 21,              # ~30 calendar days, same as final_gain_30d
+    "position_pct": 0.10,        # fraction of equity per position
+    "max_positions": 10,
+    "cost_bps": 10.0,            # commission + slippage per side
+}
+
+def load_candidate_trades(filename: str = "finviz_tagged.csv") -> pd.DataFrame:
+    """Loads tagged trades and scores them with the vectorized conviction score."""
+    df = load_latest_tagged_trades(filename)
+    bits = read_tag_bits(df)
+    df["score"] = score_tag_bits(bits)
+    df["bucket"] = assign_buckets(df["score"].to_numpy())
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"])
+    return df
+
+def _ohlc_arrays(ticker: str) -> dict | None:
+    ohlc = load_adjusted_ohlc(ticker)
+    if ohlc.empty:
+        return None
+    ohlc = ohlc.dropna(subset=["open", "high", "low", "close"]).sort_values("date")
+    return {
+        "date": pd.to_datetime(ohlc["date"]).to_numpy(dtype="datetime64[D]"),
+        "open": ohlc["open"].to_numpy(dtype=np.float64),
+        "high": ohlc["high"].to_numpy(dtype=np.float64),
+        "low": ohlc["low"].to_numpy(dtype=np.float64),
+        "close": ohlc["close"].to_numpy(dtype=np.float64),
+    }
+
+def simulate_exits(trades: pd.DataFrame, settings: dict = PORTFOLIO_SETTINGS) -> tuple[pd.DataFrame, dict]:
+    """
+    Resolves entry and exit of every candidate trade against the OHLC cache,
+    with one 2D (trades × max_hold) window per ticker instead of per-row loops.
+    - Target / stop hit on the same bar counts as a stop (conservative)
+    - Gaps through a level fill at the open
+    - Otherwise the position is closed at the last close of the holding window
+
+    Returns the trades with entry/exit columns and the per-trade close paths
+    (keyed by index label, used to mark open positions to market).
+    """
+    n = len(trades)
+    out = {
+        "entry_date": np.full(n, np.datetime64("NaT"), dtype="datetime64[D]"),
+        "exit_date": np.full(n, np.datetime64("NaT"), dtype="datetime64[D]"),
+        "entry_price": np.full(n, np.nan), "exit_price": np.full(n, np.nan),
+        "exit_reason": np.full(n, None, dtype=object),
+    }
+    paths = {}
+
+    hold = settings["max_hold"]
+    positions = np.arange(n)
+    labels = trades.index.to_numpy()
+    trade_dates = trades["transaction_date"].to_numpy(dtype="datetime64[D]")
+    insider_prices = trades["price"].to_numpy(dtype=np.float64)
+
+    for ticker, rows in trades.groupby("ticker").indices.items():
+        ohlc = _ohlc_arrays(ticker)
+        if ohlc is None:
+            continue
+        n_bars = len(ohlc["date"])
+
+        if settings["entry_mode"] == "insider":
+            entry_idx = np.searchsorted(ohlc["date"], trade_dates[rows], side="left")
+            on_date = (entry_idx < n_bars) & (ohlc["date"][np.clip(entry_idx, 0, n_bars - 1)] == trade_dates[rows])
+            entry_idx = np.where(on_date, entry_idx, n_bars)
+            entry_price = insider_prices[rows]
+            first_bar = entry_idx + 1
+        else:
+            entry_idx = np.searchsorted(ohlc["date"], trade_dates[rows], side="right") + settings["entry_delay"] - 1
+            entry_price = ohlc["open"][np.clip(entry_idx, 0, n_bars - 1)]
+            first_bar = entry_idx
+
+        valid = (entry_idx < n_bars) & (entry_price > 0) & (first_bar < n_bars)
+        if not valid.any():
+            continue
+        rows, entry_idx, entry_price, first_bar = rows[valid], entry_idx[valid], entry_price[valid], first_bar[valid]
+
+        window = first_bar[:, None] + np.arange(hold)[None, :]
+        in_data = window < n_bars
+        window = np.clip(window, 0, n_bars - 1)
+
+        target = entry_price * (1 + settings["target_pct"])
+        stop = entry_price * (1 - settings["stop_pct"])
+        hit_stop = in_data & (ohlc["low"][window] <= stop[:, None])
+        hit_target = in_data & (ohlc["high"][window] >= target[:, None])
+
+        first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), hold)
+        first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), hold)
+        last_bar = in_data.sum(axis=1) - 1
+
+        stopped = (first_stop < hold) & (first_stop <= first_target)
+        targeted = ~stopped & (first_target < hold)
+        exit_offset = np.select([stopped, targeted], [first_stop, first_target], default=last_bar)
+        exit_bar = window[np.arange(len(rows)), exit_offset]
+
+        open_at_exit = ohlc["open"][exit_bar]
+        exit_price = np.select(
+            [stopped, targeted],
+            [np.minimum(open_at_exit, stop), np.maximum(open_at_exit, target)],
+            default=ohlc["close"][exit_bar],
+        )
+        full_window = in_data.all(axis=1)
+        reason = np.select([stopped, targeted, full_window], ["stop", "target", "time"], default="open")
+
+        idx = positions[rows]
+        out["entry_date"][idx] = ohlc["date"][entry_idx]
+        out["exit_date"][idx] = ohlc["date"][exit_bar]
+        out["entry_price"][idx] = entry_price
+        out["exit_price"][idx] = exit_price
+        out["exit_reason"][idx] = reason
+
+        for i, row in enumerate(idx):
+            label = labels[row]
+            bars = window[i, :exit_offset[i] + 1]
+            closes = ohlc["close"][bars].copy()
+            closes[-1] = exit_price[i]
+            paths[label] = (ohlc["date"][bars], closes)
+
+    trades = trades.copy()
+    for col, values in out.items():
+        trades[col] = values
+    return trades, paths
+
+def run_portfolio(trades: pd.DataFrame, settings: dict = PORTFOLIO_SETTINGS) -> dict:
+    """
+    Replays candidate trades chronologically with capital, position sizing
+    and a max number of concurrent positions.
+
+    Returns a dict with:
+    - trades: accepted trades with shares, pnl and return
+    - equity: daily equity curve (mark-to-market) with drawdown
+    - stats: summary metrics (return, max drawdown, turnover, win rate, ...)
+    """
+    settings = {**PORTFOLIO_SETTINGS, **settings}
+    candidates = trades[trades["score"] >= settings["min_score"]]
+    candidates, paths = simulate_exits(candidates, settings)
+    candidates = candidates[candidates["entry_date"].notna()]
+    candidates = candidates.sort_values(["entry_date", "score"], ascending=[True, False])
+
+    cost = settings["cost_bps"] / 10_000
+    cash = settings["initial_capital"]
+    open_positions = []  # heap of (exit_date, row, proceeds)
+    invested = 0.0
+    accepted, shares_by_row = [], {}
+    skipped_full = skipped_cash = 0
+
+    entry_dates = candidates["entry_date"].to_numpy(dtype="datetime64[D]")
+    exit_dates = candidates["exit_date"].to_numpy(dtype="datetime64[D]")
+    entry_prices = candidates["entry_price"].to_numpy()
+    exit_prices = candidates["exit_price"].to_numpy()
+
+    for i, row in enumerate(candidates.index):
+        # Release positions that closed before today's open
+        while open_positions and open_positions[0][0] < entry_dates[i]:
+            _, _, proceeds, basis = heapq.heappop(open_positions)
+            cash += proceeds
+            invested -= basis
+
+        if len(open_positions) >= settings["max_positions"]:
+            skipped_full += 1
+            continue
+
+        budget = min((cash + invested) * settings["position_pct"], cash)
+        shares = np.floor(budget / (entry_prices[i] * (1 + cost)))
+        if shares <= 0:
+            skipped_cash += 1
+            continue
+
+        basis = shares * entry_prices[i] * (1 + cost)
+        proceeds = shares * exit_prices[i] * (1 - cost)
+        cash -= basis
+        invested += basis
+        heapq.heappush(open_positions, (exit_dates[i], row, proceeds, basis))
+        accepted.append(row)
+        shares_by_row[row] = shares
+
+    book = candidates.loc[accepted].copy()
+    book["shares"] = book.index.map(shares_by_row)
+    book["cost_basis"] = book["shares"] * book["entry_price"] * (1 + cost)
+    book["proceeds"] = book["shares"] * book["exit_price"] * (1 - cost)
+    book["pnl"] = book["proceeds"] - book["cost_basis"]
+    book["return_pct"] = book["pnl"] / book["cost_basis"] * 100
+
+    equity = _equity_curve(book, paths, settings["initial_capital"], cost)
+    stats = _portfolio_stats(book, equity, settings["initial_capital"])
+    stats.update({"candidates": len(candidates), "skipped_max_positions": skipped_full, "skipped_no_cash": skipped_cash})
+    return {"trades": book, "equity": equity, "stats": stats}
+
+def _equity_curve(book: pd.DataFrame, paths: dict, initial_capital: float, cost: float) -> pd.DataFrame:
+    """
+    Daily mark-to-market equity: initial capital + realized PnL + unrealized
+    PnL of open positions, accumulated with np.add.at on a shared calendar.
+    """
+    if book.empty:
+        return pd.DataFrame(columns=["date", "equity", "drawdown_pct"])
+
+    all_dates = np.unique(np.concatenate([paths[row][0] for row in book.index]))
+    pnl = np.zeros(len(all_dates))
+
+    for row, shares, basis in zip(book.index, book["shares"], book["cost_basis"]):
+        dates, closes = paths[row]
+        idx = np.searchsorted(all_dates, dates)
+        value = shares * closes
+        value[-1] *= (1 - cost)
+        daily = value - basis
+        # Unrealized PnL on each held day, realized PnL carried after exit
+        np.add.at(pnl, idx, daily)
+        if idx[-1] + 1 < len(all_dates):
+            pnl[idx[-1] + 1:] += daily[-1]
+
+    equity = initial_capital + pnl
+    peak = np.maximum.accumulate(equity)
+    return pd.DataFrame({
+        "date": pd.to_datetime(all_dates),
+        "equity": equity,
+        "drawdown_pct": (equity - peak) / peak * 100,
+    })
+
+def _portfolio_stats(book: pd.DataFrame, equity: pd.DataFrame, initial_capital: float) -> dict:
+    if book.empty:
+        return {"trades": 0}
+
+    final_equity = float(equity["equity"].iloc[-1])
+    mean_equity = float(equity["equity"].mean())
+    traded_notional = float(book["cost_basis"].sum() + book["proceeds"].sum())
+    days = max((equity["date"].iloc[-1] - equity["date"].iloc[0]).days, 1)
+
+    return {
+        "trades": len(book),
+        "final_equity": round(final_equity, 2),
+        "total_return_pct": round((final_equity / initial_capital - 1) * 100, 2),
+        "max_drawdown_pct": round(float(equity["drawdown_pct"].min()), 2),
+        "win_rate": round(float((book["pnl"] > 0).mean()), 3),
+        "avg_return_pct": round(float(book["return_pct"].mean()), 2),
+        "turnover": round(traded_notional / mean_equity, 2),
+        "annualized_turnover": round(traded_notional / mean_equity * 365 / days, 2),
+        "exit_reasons": book["exit_reason"].value_counts().to_dict(),
+    }
+
+def save_portfolio_results(result: dict, prefix: str = "portfolio") -> None:
+    """Saves the accepted trades and equity curve to FINVIZ_DATA_DIR."""
+    ensure_finviz_dir()
+    trades_path = os.path.join(FINVIZ_DATA_DIR, f"{prefix}_trades.csv")
+    equity_path = os.path.join(FINVIZ_DATA_DIR, f"{prefix}_equity.csv")
+    write_csv(result["trades"].drop(columns=["tags", "footnote_tags"], errors="ignore"), trades_path, index=False)
+    write_csv(result["equity"], equity_path, index=False)
+    print(f"✅ Portfolio results saved to {trades_path} and {equity_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Portfolio backtest on tagged insider trades")
+    parser.add_argument("--min-score", type=int, default=PORTFOLIO_SETTINGS["min_score"])
+    parser.add_argument("--entry-mode", choices=["next_open", "insider"], default=PORTFOLIO_SETTINGS["entry_mode"])
+    parser.add_argument("--max-positions", type=int, default=PORTFOLIO_SETTINGS["max_positions"])
+    parser.add_argument("--position-pct", type=float, default=PORTFOLIO_SETTINGS["position_pct"])
+    parser.add_argument("--target-pct", type=float, default=PORTFOLIO_SETTINGS["target_pct"])
+    parser.add_argument("--stop-pct", type=float, default=PORTFOLIO_SETTINGS["stop_pct"])
+    args = parser.parse_args()
+
+    result = run_portfolio(load_candidate_trades(), {
+        "min_score": args.min_score,
+        "entry_mode": args.entry_mode,
+        "max_positions": args.max_positions,
+        "position_pct": args.position_pct,
+        "target_pct": args.target_pct,
+        "stop_pct": args.stop_pct,
+    })
+
+    print("\n💼 Portfolio Backtest")
+    for key, value in result["stats"].items():
+        print(f"   {key}: {value}")
+
+    save_portfolio_results(result)
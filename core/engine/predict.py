@@ -1,45 +1,99 @@
 # core/engine/predict.py
+import numpy as np
 import pandas as pd
 import joblib
 import os
 
-MODELS_DIR = "models"
-
-def load_models():
-    return {
-        "logreg_case1": joblib.load(os.path.join(MODELS_DIR, "logreg_case1.pkl")),
-        "logreg_case2": joblib.load(os.path.join(MODELS_DIR, "logreg_case2.pkl")),
-        "rf_case1": joblib.load(os.path.join(MODELS_DIR, "rf_case1.pkl")),
-        "rf_case2": joblib.load(os.path.join(MODELS_DIR, "rf_case2.pkl")),
-        "xgb_case1": joblib.load(os.path.join(MODELS_DIR, "xgb_case1.pkl")),
-        "xgb_case2": joblib.load(os.path.join(MODELS_DIR, "xgb_case2.pkl")),
-    }
-
-def sanitize_column(col: str) -> str:
-    return col.replace("[", "_").replace("]", "_")
-
-def predict_unlabeled(file_path: str, models: dict):
-    df = pd.read_csv(file_path)
-
-    # Drop non-feature columns
-    non_feature_cols = ["ticker", "insider_name", "transaction_date", "price"]
-
-    # --- Sanitize feature names ---
-    df = df.rename(columns=sanitize_column)
-
-    feature_cols = [c for c in df.columns if c not in non_feature_cols]
-    X = df[feature_cols].astype(float)  # force numeric
+from core.engine.features import load_feature_set
+from core.engine.model_registry import MODELS_DIR, current_version, get_model, get_version_info
+from core.io.atomic import write_csv
+from core.io.file_manager import FINVIZ_DATA_DIR
+from core.utils.metrics import timed
+
+# Models used for predictions
+PREDICT_MODELS = ["xgb_case1", "xgb_case2"]
+
+# Legacy flat pickles, loaded on demand when the registry is empty
+_LEGACY_CACHE = {}
+
+def load_model(name: str, version: str | None = None):
+    """
+    Loads one model lazily: from the model registry (current version unless
+    `version` is given), falling back to models/<name>.pkl if nothing is registered.
+    """
+    if version is None and current_version() is None:
+        if name not in _LEGACY_CACHE:
+            print(f"⚠️ Model registry is empty, loading legacy {name}.pkl")
+            _LEGACY_CACHE[name] = joblib.load(os.path.join(MODELS_DIR, f"{name}.pkl"))
+        return _LEGACY_CACHE[name]
+    return get_model(name, version)
+
+def load_models(names: list[str] = PREDICT_MODELS, version: str | None = None) -> dict:
+    return {name: load_model(name, version) for name in names}
+
+def load_scorers(names: list[str] = PREDICT_MODELS, version: str | None = None) -> dict:
+    """
+    Loads what scores each model: its compiled node arrays when they were exported
+    (models/compiled/<version>/<name>.npz, see compiled_trees), else the model itself.
+    """
+    from core.engine.compiled_trees import load_compiled_model
+
+    scorers = {}
+    for name in names:
+        compiled = load_compiled_model(name, version)
+        scorers[name] = compiled if compiled is not None else load_model(name, version)
+    return scorers
+
+def predict_scores(scorer, X, manifest: dict) -> np.ndarray:
+    """Positive class probability from a compiled model (dict) or a fitted model."""
+    if isinstance(scorer, dict):
+        from core.engine.compiled_trees import compiled_proba
+        return compiled_proba(scorer, X, manifest)
+    return scorer.predict_proba(align_features(X, manifest, scorer))[:, 1]
+
+def check_manifest(manifest: dict, version: str | None = None):
+    """Raises if the feature set was built with a different manifest than the model version."""
+    if version is None and current_version() is None:
+        return
+    info = get_version_info(version)
+    if info["manifest_hash"] != manifest["hash"]:
+        raise ValueError(
+            f"❌ Model version {info['version']} expects feature manifest {info['manifest_hash']}, "
+            f"got {manifest['hash']}"
+        )
+
+def align_features(X, manifest: dict, model):
+    """
+    Aligns a sparse feature matrix (manifest column order) with what the model expects.
+    Models trained on named DataFrame columns get a reindexed DataFrame,
+    models trained on the sparse feature sets take the matrix as-is.
+    """
+    if hasattr(model, "get_booster"):
+        expected_features = model.get_booster().feature_names
+    else:
+        expected_features = getattr(model, "feature_names_in_", None)
+    if expected_features is None or len(expected_features) == 0:
+        return X
 
     # 🔑 Force feature alignment with training set
-    expected_features = models["xgb_case1"].get_booster().feature_names
-    X = X.reindex(columns=expected_features, fill_value=0)
+    dense = pd.DataFrame(X.toarray(), columns=manifest["feature_names"])
+    return dense.reindex(columns=expected_features, fill_value=0)
+
+@timed("predict")
+def predict_unlabeled(name: str, models: dict | None = None, version: str | None = None):
+    data = load_feature_set(name)
+    X = data["X"]
+    if models is None:
+        check_manifest(data["manifest"], version)
+        models = load_scorers(PREDICT_MODELS, version)
+    df = data["rows"] if data["rows"] is not None else pd.DataFrame(index=range(X.shape[0]))
 
     # --- Case 1 XGB ---
-    preds1 = models["xgb_case1"].predict_proba(X)[:, 1]
+    preds1 = predict_scores(models["xgb_case1"], X, data["manifest"])
     df["case1_pred_XGB"] = preds1
 
     # --- Case 2 XGB ---
-    preds2 = models["xgb_case2"].predict_proba(X)[:, 1]
+    preds2 = predict_scores(models["xgb_case2"], X, data["manifest"])
     df["case2_pred_XGB"] = preds2
 
     # Re-attach identifiers if available
@@ -49,8 +103,7 @@ def predict_unlabeled(file_path: str, models: dict):
     return df
 
 if __name__ == "__main__":
-    models = load_models()
-    df_all = predict_unlabeled("predict.csv", models)
+    df_all = predict_unlabeled("predict")
 
     # --- Sort everything by transaction_date ---
     if "transaction_date" in df_all.columns:
@@ -65,6 +118,6 @@ if __name__ == "__main__":
     print(top_case2[["transaction_date", "ticker", "insider_name", "case1_pred_XGB", "case2_pred_XGB"]])
 
     # Save predictions
-    df_all.to_csv("predicted_trades_new1.csv", index=False)
+    write_csv(df_all, os.path.join(FINVIZ_DATA_DIR, "predicted_trades_new1.csv"), index=False)
     print("\n✅ Predictions saved to predicted_trades_new1.csv")
 
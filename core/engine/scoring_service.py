@@ -0,0 +1,289 @@
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.engine.tag_engine import tag_trades
+from core.engine.classifier import us_bd
+from core.engine.features import build_feature_matrix, build_manifest
+from core.engine.model_registry import current_version, load_version_manifest
+from core.engine.ohlc import enrich_trades_with_price_deltas
+from core.engine.predict import PREDICT_MODELS, load_scorers, predict_scores, align_features
+from core.io.cache import load_snapshot_cache
+from core.io.corporate_actions import adjust_trade_prices
+from core.io.shares_outstanding import trade_market_cap
+from core.io.file_manager import load_latest_tagged_trades
+
+# Same rules as add_cluster_buy_tag / add_multiple_buys_tag / add_smart_insider_tag
+BEHAVIOR_WINDOW = 5 * us_bd
+SIZED_TAGS = {"🟢 SMALL TRADE", "💰 LARGE TRADE", "🔥 VERY LARGE TRADE"}
+SMART_MIN_TRADES = 5
+SMART_MIN_WINRATE = 0.7
+
+# Warm state: models, boosters, manifest, snapshots and trade history lookups
+_STATE = {}
+
+def _is_win(outcome) -> bool:
+    # Same test as add_smart_insider_tag()
+    return "SUCCESSFUL" in str(outcome)
+
+def _filed_price(df: pd.DataFrame) -> pd.Series:
+    # Price as filed: unlike the split-adjusted price it does not move after a split
+    return df["price_raw"].fillna(df["price"]) if "price_raw" in df.columns else df["price"]
+
+def _index_history(history: pd.DataFrame) -> tuple[dict, dict]:
+    """
+    Pre-indexes past tagged trades for the behavioral tags:
+    - by ticker: arrays of keys (insider, date, filed price), dates, insiders and sized flags
+    - by insider: (total trades, wins)
+    """
+    by_ticker, by_insider = {}, {}
+    if history.empty:
+        return by_ticker, by_insider
+
+    history = history.assign(
+        transaction_date=pd.to_datetime(history["transaction_date"]),
+        _sized=history["tags"].apply(lambda tags: any(t in SIZED_TAGS for t in tags)),
+        _win=history.get("case_2_outcome", pd.Series(None, index=history.index)).apply(_is_win),
+    )
+    for ticker, rows in history.groupby("ticker"):
+        by_ticker[ticker] = {
+            "keys": list(zip(rows["insider_name"], rows["transaction_date"], _filed_price(rows))),
+            "dates": rows["transaction_date"].to_numpy(),
+            "insiders": rows["insider_name"].to_numpy(),
+            "sized": rows["_sized"].to_numpy(),
+        }
+    for insider, rows in history.groupby("insider_name"):
+        by_insider[insider] = (len(rows), int(rows["_win"].sum()))
+    return by_ticker, by_insider
+
+def warm_up(version: str | None = None, history_file: str | None = "finviz_tagged.csv", snapshots: dict | None = None):
+    """
+    Loads everything scoring needs into memory once:
+    - the prediction models (model registry, current version unless given): compiled
+      node arrays when exported, else the model and its booster
+    - the feature manifest of that model version
+    - the ticker snapshots and the indexed history of tagged trades
+    """
+    if version is None and current_version() is None:
+        manifest = build_manifest()
+    else:
+        manifest = load_version_manifest(version)
+
+    models = load_scorers(PREDICT_MODELS, version)
+
+    history = pd.DataFrame()
+    if history_file:
+        try:
+            history = load_latest_tagged_trades(history_file)
+        except FileNotFoundError:
+            print(f"⚠️ No trade history ({history_file}), behavioral tags use the request only")
+    by_ticker, by_insider = _index_history(history)
+
+    _STATE.clear()
+    _STATE.update({
+        "version": version or current_version() or "legacy",
+        "manifest": manifest,
+        "models": models,
+        "boosters": {name: model.get_booster() for name, model in models.items() if not isinstance(model, dict)},
+        "snapshots": load_snapshot_cache() if snapshots is None else snapshots,
+        "history_by_ticker": by_ticker,
+        "history_by_insider": by_insider,
+    })
+    print(f"🔥 Scoring service warm: {len(models)} models, {len(history)} history trades")
+
+def _behavioral_tags(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Applies the cluster / multiple buys / smart insider tags to the request rows
+    against the warm history plus the request itself. Request trades already in
+    the history (same insider, date and filed price) are not counted twice.
+    """
+    by_ticker, by_insider = _STATE["history_by_ticker"], _STATE["history_by_insider"]
+    dates = df["transaction_date"].to_numpy()
+    insiders = df["insider_name"].to_numpy()
+    tickers = df["ticker"].to_numpy()
+    sized = df["tags"].apply(lambda tags: any(t in SIZED_TAGS for t in tags)).to_numpy()
+    wins = df["case_2_outcome"].apply(_is_win).to_numpy()
+
+    history_keys = {t: set(by_ticker[t]["keys"]) for t in set(tickers) if t in by_ticker}
+    is_new = np.array([
+        (insider, date, price) not in history_keys.get(ticker, ())
+        for ticker, insider, date, price in zip(tickers, insiders, df["transaction_date"], _filed_price(df))
+    ], dtype=bool)
+
+    tags = []
+    for i in range(len(df)):
+        pool = is_new & (tickers == tickers[i])
+        pool_dates, pool_insiders, pool_sized = dates[pool], insiders[pool], sized[pool]
+        hist = by_ticker.get(tickers[i])
+        if hist:
+            pool_dates = np.concatenate([hist["dates"], pool_dates])
+            pool_insiders = np.concatenate([hist["insiders"], pool_insiders])
+            pool_sized = np.concatenate([hist["sized"], pool_sized])
+
+        txn_date = pd.Timestamp(dates[i])
+        in_window = (
+            (pool_dates >= np.datetime64(txn_date - BEHAVIOR_WINDOW)) &
+            (pool_dates <= np.datetime64(txn_date + BEHAVIOR_WINDOW))
+        )
+        row_tags = list(df["tags"].iloc[i])
+
+        if len(set(pool_insiders[in_window])) >= 3:
+            row_tags.append("🔁 CLUSTER BUY")
+        own = in_window & (pool_insiders == insiders[i])
+        if own.sum() >= 2 and pool_sized[own].any():
+            row_tags.append("🧩 MULTIPLE BUYS")
+
+        total, won = by_insider.get(insiders[i], (0, 0))
+        mine = is_new & (insiders == insiders[i])
+        total, won = total + int(mine.sum()), won + int(wins[mine].sum())
+        if total >= SMART_MIN_TRADES and won / total >= SMART_MIN_WINRATE:
+            row_tags.append("🧠 SMART INSIDER")
+        tags.append(row_tags)
+
+    df = df.copy()
+    df["tags"] = tags
+    return df
+
+def score_trades(trades: list[dict] | pd.DataFrame, enrich: bool = True) -> pd.DataFrame:
+    """
+    Scores new insider trades in memory: tagging → features → XGB probabilities.
+
+    Parameters:
+        trades: trade dicts (or a DataFrame) with at least ticker, insider_name,
+            relationship, transaction_date, price and value; optional footnote_tags list
+        enrich: add price context from the OHLC cache (timing / indicator tags)
+
+    Returns:
+        The tagged trades with case1_pred_XGB and case2_pred_XGB columns.
+    """
+    if not _STATE:
+        warm_up()
+
+    df = pd.DataFrame(trades).reset_index(drop=True)
+    df["transaction_date"] = pd.to_datetime(df["transaction_date"])
+    if "footnote_tags" not in df.columns:
+        df["footnote_tags"] = [[] for _ in range(len(df))]
+    if "case_2_outcome" not in df.columns:
+        df["case_2_outcome"] = None
+
+    # Insider prices on the same split basis as the adjusted OHLC (as tag_and_annotate)
+    df = adjust_trade_prices(df)
+    if enrich:
+        df = enrich_trades_with_price_deltas(df)
+    df, _ = tag_trades(df, _STATE["snapshots"], market_cap=trade_market_cap(df, _STATE["snapshots"]))
+    df = _behavioral_tags(df)
+
+    manifest = _STATE["manifest"]
+    X = build_feature_matrix(df, manifest["tags"])
+    for name, column in (("xgb_case1", "case1_pred_XGB"), ("xgb_case2", "case2_pred_XGB")):
+        model = _STATE["models"][name]
+        if name in _STATE["boosters"]:
+            df[column] = _STATE["boosters"][name].inplace_predict(align_features(X, manifest, model))
+        else:
+            df[column] = predict_scores(model, X, manifest)
+    return df
+
+def score_trade(trade: dict, enrich: bool = True) -> dict:
+    """Scores a single trade; returns its tags and probabilities."""
+    row = score_trades([trade], enrich=enrich).iloc[0]
+    return {
+        "ticker": row["ticker"],
+        "tags": list(row["tags"]),
+        "case1_pred_XGB": float(row["case1_pred_XGB"]),
+        "case2_pred_XGB": float(row["case2_pred_XGB"]),
+    }
+
+def benchmark_latency(trades: list[dict], n: int = 200, enrich: bool = True) -> dict:
+    """
+    Measures single-trade scoring latency on a warm service (cycling through `trades`),
+    plus the per-trade cost of scoring all `trades` as one batch.
+    Returns p50 / p99 / mean in milliseconds.
+    """
+    if not _STATE:
+        warm_up()
+    score_trade(trades[0], enrich=enrich)  # first call pays lazy imports
+
+    timings = []
+    for i in range(n):
+        start = time.perf_counter()
+        score_trade(trades[i % len(trades)], enrich=enrich)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings = np.array(timings)
+    start = time.perf_counter()
+    score_trades(trades, enrich=enrich)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "n": n,
+        "enrich": enrich,
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p99_ms": round(float(np.percentile(timings, 99)), 2),
+        "mean_ms": round(float(timings.mean()), 2),
+        "batch_size": len(trades),
+        "batch_per_trade_ms": round(batch_ms / len(trades), 2),
+    }
+
+class _ScoringHandler(BaseHTTPRequestHandler):
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"status": "ok", "version": _STATE.get("version")})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            trades = payload if isinstance(payload, list) else [payload]
+            scored = score_trades(trades)
+            cols = ["ticker", "insider_name", "transaction_date", "tags", "case1_pred_XGB", "case2_pred_XGB"]
+            self._reply(200, scored[cols].to_dict(orient="records"))
+        except Exception as e:
+            self._reply(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(host: str = "127.0.0.1", port: int = 8765):
+    """Local HTTP endpoint: POST /score with a trade (or list of trades), GET /health."""
+    warm_up()
+    server = ThreadingHTTPServer((host, port), _ScoringHandler)
+    print(f"🌐 Scoring service listening on http://{host}:{port}/score")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process scoring service for new insider trades")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    bench_parser = sub.add_parser("benchmark")
+    bench_parser.add_argument("--n", type=int, default=200)
+    bench_parser.add_argument("--no-enrich", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        warm_up()
+        sample = load_latest_tagged_trades()
+        cols = ["ticker", "insider_name", "relationship", "transaction_date", "price", "shares", "value"]
+        trades = sample[cols].tail(50).to_dict(orient="records")
+        print(benchmark_latency(trades, n=args.n, enrich=not args.no_enrich))
@@ -0,0 +1,260 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from config.settings import WORKERS
+from core.engine.backtest import TAG_WEIGHTS, COMBO_BOOSTS, BUCKETS, OUTCOME_TAGS_C2, map_case_2_outcome
+from core.engine.tag_registry import TAG_REGISTRY, TAG_IDS, read_tag_bits, bits_to_indicator, has_all, has_tag
+from core.io.atomic import write_csv, write_json
+from core.io.file_manager import FINVIZ_DATA_DIR, ensure_finviz_dir, load_latest_tagged_trades
+
+# Worker-process copy of the sweep data (set once per process by _init_worker)
+_DATA = None
+
+def load_sweep_data(filename: str = "finviz_tagged.csv") -> dict:
+    """
+    Loads tagged trades once and keeps only what scoring needs:
+    - X: (n, n_tags) float32 indicator matrix over the full tag registry
+    - bits: (n, N_WORDS) tag bitmasks (for combo AND-masks)
+    - case1_win / case2_win: 1.0 win, 0.0 loss/neutral, NaN unlabeled
+    - dates: transaction dates (for the train/test split)
+    """
+    df = load_latest_tagged_trades(filename)
+    bits = read_tag_bits(df)
+
+    c1_labeled = (
+        has_tag(bits, "🟢 SUCCESSFUL TRADE C1")
+        | has_tag(bits, "⚪ NEUTRAL TRADE C1")
+        | has_tag(bits, "🔴 UNSUCCESSFUL TRADE C1")
+    )
+    case1_win = np.where(c1_labeled, has_tag(bits, "🟢 SUCCESSFUL TRADE C1"), np.nan)
+
+    case2 = map_case_2_outcome(df["case_2_outcome"].where(df["case_2_outcome"].isin(OUTCOME_TAGS_C2)))
+    case2_win = np.where(case2.notna(), case2.eq("🟢 SUCCESSFUL TRADE"), np.nan)
+
+    data = {
+        "X": bits_to_indicator(bits).astype(np.float32),
+        "bits": bits,
+        "case1_win": case1_win.astype(np.float64),
+        "case2_win": case2_win.astype(np.float64),
+        "dates": pd.to_datetime(df["transaction_date"]).to_numpy(dtype="datetime64[D]"),
+    }
+    print(f"📦 Sweep data: {len(df)} trades × {data['X'].shape[1]} tags")
+    return data
+
+def base_config() -> dict:
+    """The hand-tuned constants from backtest.py as a sweep config."""
+    return {"tag_weights": dict(TAG_WEIGHTS), "combo_boosts": dict(COMBO_BOOSTS), "buckets": dict(BUCKETS)}
+
+def generate_candidates(n: int, seed: int = 42, jitter: int = 2, bucket_shift: int = 2, base: dict | None = None) -> list[dict]:
+    """
+    Generates `n` candidate configs around `base` (defaults to the current constants):
+    each tag weight moves by a random integer in [-jitter, +jitter] (floored at 0)
+    and bucket lower bounds shift by a random integer in [-bucket_shift, +bucket_shift].
+    The first candidate is always the base config itself.
+    """
+    base = base or base_config()
+    rng = np.random.default_rng(seed)
+    tags = list(base["tag_weights"])
+    weights = np.array([base["tag_weights"][t] for t in tags])
+
+    ordered = sorted(base["buckets"].items(), key=lambda item: item[1][0])
+    lows = np.array([low for _, (low, _) in ordered])
+
+    candidates = [base]
+    for _ in range(n - 1):
+        new_weights = np.clip(weights + rng.integers(-jitter, jitter + 1, len(weights)), 0, None)
+        new_lows = np.maximum.accumulate(np.clip(lows + rng.integers(-bucket_shift, bucket_shift + 1, len(lows)), 0, None))
+        new_lows[0] = lows[0]
+        candidates.append({
+            "tag_weights": dict(zip(tags, new_weights.tolist())),
+            "combo_boosts": dict(base["combo_boosts"]),
+            "buckets": _buckets_from_lows(new_lows),
+        })
+    return candidates
+
+def _buckets_from_lows(lows: np.ndarray) -> dict:
+    """Builds a BUCKETS-style dict from sorted integer lower bounds."""
+    buckets = {}
+    for i, low in enumerate(lows):
+        high = lows[i + 1] - 1 if i + 1 < len(lows) else float("inf")
+        if high < low:
+            continue
+        label = f"B{i} ({low}+)" if high == float("inf") else f"B{i} ({low} - {high})"
+        buckets[label] = (int(low), high)
+    return buckets
+
+def _weight_matrix(configs: list[dict]) -> np.ndarray:
+    """Stacks the tag weights of every config into a (n_tags, n_configs) matrix."""
+    W = np.zeros((len(TAG_REGISTRY), len(configs)), dtype=np.float32)
+    for k, config in enumerate(configs):
+        for tag, weight in config["tag_weights"].items():
+            W[TAG_IDS[tag], k] = weight
+    return W
+
+def score_configs(data: dict, configs: list[dict]) -> np.ndarray:
+    """Scores all trades under every config at once: (n_trades, n_configs)."""
+    scores = data["X"] @ _weight_matrix(configs)
+
+    combo_masks = {}
+    for k, config in enumerate(configs):
+        for combo, bonus in config["combo_boosts"].items():
+            if combo not in combo_masks:
+                combo_masks[combo] = has_all(data["bits"], combo)
+            scores[:, k] += combo_masks[combo] * bonus
+    return scores
+
+def _bucket_winrates(bucket_idx: np.ndarray, win: np.ndarray, mask: np.ndarray, n_buckets: int) -> tuple[np.ndarray, np.ndarray]:
+    """Per-bucket (count, winrate) of the labeled trades selected by mask."""
+    labeled = mask & ~np.isnan(win)
+    counts = np.bincount(bucket_idx[labeled], minlength=n_buckets)
+    wins = np.bincount(bucket_idx[labeled], weights=win[labeled], minlength=n_buckets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return counts, wins / counts
+
+def evaluate_configs(data: dict, configs: list[dict], train_mask: np.ndarray, offset: int = 0) -> list[dict]:
+    """
+    Scores and buckets every trade for each config and reports per-bucket
+    Case 1 / Case 2 win rates on the train and test splits.
+    """
+    scores = score_configs(data, configs)
+    rows = []
+
+    for k, config in enumerate(configs):
+        ordered = sorted(config["buckets"].items(), key=lambda item: item[1][0])
+        lows = np.array([low for _, (low, _) in ordered], dtype=np.float64)
+        highs = np.array([high for _, (_, high) in ordered], dtype=np.float64)
+
+        idx = np.digitize(scores[:, k], lows) - 1
+        inside = (idx >= 0) & (scores[:, k] <= highs[np.clip(idx, 0, None)])
+        idx = np.where(inside, idx, len(ordered))  # last slot = Uncategorized
+
+        for split, mask in (("train", train_mask), ("test", ~train_mask)):
+            c1_n, c1_wr = _bucket_winrates(idx, data["case1_win"], mask, len(ordered) + 1)
+            c2_n, c2_wr = _bucket_winrates(idx, data["case2_win"], mask, len(ordered) + 1)
+            for b, (name, _) in enumerate(ordered):
+                rows.append({
+                    "config_id": offset + k, "split": split, "bucket": name, "bucket_rank": b,
+                    "case1_n": int(c1_n[b]), "case1_winrate": c1_wr[b],
+                    "case2_n": int(c2_n[b]), "case2_winrate": c2_wr[b],
+                })
+    return rows
+
+def _init_worker(data: dict, train_mask: np.ndarray):
+    global _DATA
+    _DATA = (data, train_mask)
+
+def _evaluate_chunk(args):
+    offset, configs = args
+    data, train_mask = _DATA
+    return evaluate_configs(data, configs, train_mask, offset=offset)
+
+def run_sweep(
+    configs: list[dict],
+    data: dict | None = None,
+    split_date: str | None = None,
+    workers: int | None = None,
+    chunk_size: int = 250,
+) -> pd.DataFrame:
+    """
+    Evaluates candidate configs in parallel across processes.
+
+    Parameters
+    ----------
+    configs : list[dict]
+        Candidates with tag_weights / combo_boosts / buckets (see generate_candidates).
+    data : dict, optional
+        Output of load_sweep_data(); loaded from disk when omitted.
+    split_date : str, optional
+        Trades before this date are train, the rest test (default: 70th percentile date).
+    workers : int, optional
+        Number of worker processes (default: os.cpu_count()).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (config_id, split, bucket) with counts and win rates.
+    """
+    data = data or load_sweep_data()
+
+    if split_date is None:
+        split = np.sort(data["dates"])[int(len(data["dates"]) * 0.7)]
+    else:
+        split = np.datetime64(split_date, "D")
+    train_mask = data["dates"] < split
+    print(f"📅 Train/test split at {split}: {train_mask.sum()} train, {(~train_mask).sum()} test trades")
+
+    chunks = [(i, configs[i:i + chunk_size]) for i in range(0, len(configs), chunk_size)]
+    workers = workers or WORKERS or os.cpu_count() or 1
+    print(f"🧪 Evaluating {len(configs)} configs in {len(chunks)} chunks on {workers} workers...")
+
+    rows = []
+    if workers == 1:
+        for offset, chunk in chunks:
+            rows += evaluate_configs(data, chunk, train_mask, offset=offset)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data, train_mask)) as pool:
+            for result in pool.map(_evaluate_chunk, chunks):
+                rows += result
+
+    return pd.DataFrame(rows)
+
+def rank_configs(results: pd.DataFrame, top_buckets: int = 2, min_trades: int = 20, case: str = "case1") -> pd.DataFrame:
+    """
+    Ranks configs by the win rate of their `top_buckets` highest buckets on the
+    train split (ignoring configs with fewer than `min_trades` labeled trades there),
+    and reports the same metric on the test split next to it.
+    """
+    ranks = results.groupby("config_id")["bucket_rank"].transform("max")
+    top = results[results["bucket_rank"] > ranks - top_buckets].copy()
+    top["wins"] = top[f"{case}_winrate"].fillna(0) * top[f"{case}_n"]
+
+    summary = top.groupby(["config_id", "split"])[[f"{case}_n", "wins"]].sum().unstack("split")
+    out = pd.DataFrame({
+        "train_n": summary[(f"{case}_n", "train")],
+        "train_winrate": summary[("wins", "train")] / summary[(f"{case}_n", "train")],
+        "test_n": summary[(f"{case}_n", "test")],
+        "test_winrate": summary[("wins", "test")] / summary[(f"{case}_n", "test")],
+    })
+    out = out[out["train_n"] >= min_trades]
+    return out.sort_values("train_winrate", ascending=False)
+
+def save_sweep_results(results: pd.DataFrame, configs: list[dict], ranking: pd.DataFrame, prefix: str = "sweep") -> None:
+    """Saves the per-bucket results, the ranking and the best config to FINVIZ_DATA_DIR."""
+    ensure_finviz_dir()
+    write_csv(results, os.path.join(FINVIZ_DATA_DIR, f"{prefix}_results.csv"), index=False)
+    write_csv(ranking, os.path.join(FINVIZ_DATA_DIR, f"{prefix}_ranking.csv"))
+
+    if not ranking.empty:
+        best = configs[int(ranking.index[0])]
+        best_path = os.path.join(FINVIZ_DATA_DIR, f"{prefix}_best_config.json")
+        write_json({
+            "tag_weights": best["tag_weights"],
+            "combo_boosts": [[list(k), v] for k, v in best["combo_boosts"].items()],
+            "buckets": best["buckets"],
+        }, best_path, ensure_ascii=False, indent=2, default=str)
+        print(f"🏆 Best config saved to {best_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conviction score weight sweep")
+    parser.add_argument("--n", type=int, default=1000, help="Number of candidate configs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--jitter", type=int, default=2, help="Max +/- change per tag weight")
+    parser.add_argument("--split-date", default=None, help="YYYY-MM-DD train/test boundary")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--case", choices=["case1", "case2"], default="case1")
+    args = parser.parse_args()
+
+    candidates = generate_candidates(args.n, seed=args.seed, jitter=args.jitter)
+    results = run_sweep(candidates, split_date=args.split_date, workers=args.workers)
+    ranking = rank_configs(results, case=args.case)
+
+    print(f"\n🏆 Top 10 configs ({args.case}, top buckets):")
+    print(ranking.head(10).round(3))
+    if 0 in ranking.index:
+        print("\n📌 Current constants (config 0):")
+        print(ranking.loc[[0]].round(3))
+
+    save_sweep_results(results, candidates, ranking)
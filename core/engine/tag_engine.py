@@ -0,0 +1,293 @@
+import numpy as np
+import pandas as pd
+
+from core.engine.classifier import classify_insider_role, classify_sector_tag
+
+# --- Tag groups, in the same order tag_trade() emits them ---
+ROLE_TAGS = [
+    "👑 CEO", "💼 CFO", "⚙️ COO", "💰 CRO", "📈 CIO", "🧠 CBO", "🪑 Chairman",
+    "🎖️ President", "🧍 EVP", "📊 Portfolio Manager", "🔟 10% Owner", "📋 Director",
+    "🕵️ Other",
+]
+
+SIZE_TAGS = ["🔥 VERY LARGE TRADE", "💰 LARGE TRADE", "🟢 SMALL TRADE", "❓ UNKNOWN SIZE"]
+
+CAP_TAGS = ["🐣 MICRO CAP", "🌱 SMALL CAP", "🌿 MID CAP", "🌳 LARGE CAP", "🏔️ MEGA CAP"]
+
+SECTOR_TAGS = [
+    "📡 Tech", "🏥 Healthcare", "🏦 Financial", "🛍️ Consumer Cyclical", "🥫 Consumer Defensive",
+    "⚡ Energy", "🔌 Utilities", "🏗️ Industrial", "🏘️ Real Estate", "⚙️ Materials", "📞 Communication",
+]
+
+WINDOW_LABELS = ["7d", "14d", "30d"]
+
+TIMING_TAGS = (
+    ["📉 DIP BUY", "🚀 BUYING INTO STRENGTH",
+     "🧨 CAUGHT THE KNIFE [7d]", "🧨 CAUGHT THE KNIFE [14d]",
+     "📈 ABOVE CLOSE", "📉 BELOW CLOSE"]
+    + [f"🚀 SPIKE +{pct}% [{label}]" for label in WINDOW_LABELS for pct in (20, 10, 5)]
+    + [f"📉 DIP -{pct}% [{label}]" for label in WINDOW_LABELS for pct in (20, 10, 5)]
+)
+
+EARNINGS_TAGS = ["📅 NEAR EARNINGS"]
+
+METRIC_TAGS = [
+    "📈 ABOVE SMA20", "📉 BELOW SMA20", "⚡️ SMA SUPPORT RECLAIMED", "🔻 SMA LOST",
+    "🔻 OVERSOLD (RSI < 30)", "🚀 OVERBOUGHT (RSI > 70)", "🟡 NEUTRAL (RSI)",
+    "💪 STRONG TREND", "📉 DIP SETUP", "⚠️ INSUFFICIENT DATA FOR MA/RSI",
+]
+
+OUTCOME_C1_TAGS = ["🟢 SUCCESSFUL TRADE C1", "⚪ NEUTRAL TRADE C1", "🔴 UNSUCCESSFUL TRADE C1"]
+
+# Thresholds mirrored from classify_timing_tags()
+DIP_THRESHOLD = 0.05
+STRENGTH_THRESHOLD = 0.05
+
+def _col(df: pd.DataFrame, name: str) -> pd.Series:
+    """Returns a numeric column, or an all-NaN column if it does not exist."""
+    if name not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype="float64")
+    return pd.to_numeric(df[name], errors="coerce").astype("float64")
+
+def _nonzero(s: pd.Series) -> pd.Series:
+    """
+    Vectorized equivalent of Python truthiness on a float column
+    (NaN is truthy, 0 is falsy), as used by the row-wise classifiers.
+    """
+    return s.ne(0)
+
+def _snapshot_column(df: pd.DataFrame, snapshots: dict, field: str) -> pd.Series:
+    """Maps a snapshot field onto each trade row by ticker."""
+    values = {t: snapshots.get(t, {}).get(field) for t in df["ticker"].unique()}
+    return df["ticker"].map(values)
+
+def compute_ownership(df: pd.DataFrame, market_cap: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Vectorized calculate_ownership_pct().
+    Returns (ownership_pct, unknown_mask) where unknown_mask marks rows the
+    row-wise version would return None for (zero value or missing market cap).
+    """
+    value = _col(df, "value")
+    cap = pd.to_numeric(market_cap, errors="coerce").astype("float64")
+
+    unknown = value.eq(0) | cap.isna() | cap.eq(0)
+    ownership = (value / cap.where(~unknown)).round(6)
+    return ownership.where(~unknown), unknown
+
+def _role_columns(df: pd.DataFrame) -> dict:
+    relationships = df["relationship"]
+    roles = {r: classify_insider_role(str(r).strip().lower()) for r in relationships.unique()}
+    role = relationships.map(roles)
+    return {tag: role.eq(tag).to_numpy() for tag in ROLE_TAGS}
+
+def _size_columns(ownership: pd.Series, unknown: pd.Series) -> dict:
+    very_large = ownership >= 0.005
+    large = ~very_large & (ownership >= 0.001)
+    small = ~very_large & ~large & (ownership >= 0.0001)
+    return {
+        "🔥 VERY LARGE TRADE": very_large.to_numpy(),
+        "💰 LARGE TRADE": large.to_numpy(),
+        "🟢 SMALL TRADE": small.to_numpy(),
+        "❓ UNKNOWN SIZE": unknown.to_numpy(),
+    }
+
+def _cap_columns(market_cap: pd.Series) -> tuple[dict, np.ndarray]:
+    cap = pd.to_numeric(market_cap, errors="coerce").astype("float64")
+    bins = np.array([300_000_000, 2_000_000_000, 10_000_000_000, 200_000_000_000])
+    idx = np.digitize(cap.fillna(0).to_numpy(), bins)
+    known = cap.notna().to_numpy()
+    columns = {tag: known & (idx == i) for i, tag in enumerate(CAP_TAGS)}
+    return columns, ~known
+
+def _sector_columns(sector: pd.Series) -> dict:
+    tags = {s: classify_sector_tag(s) for s in sector.dropna().unique()}
+    sector_tag = sector.map(tags).fillna("")
+    dynamic = sorted(t for t in set(tags.values()) if t and t not in SECTOR_TAGS)
+    return {tag: sector_tag.eq(tag).to_numpy() for tag in SECTOR_TAGS + dynamic}
+
+def _timing_columns(df: pd.DataFrame) -> dict:
+    price = _col(df, "price")
+    open_ = _col(df, "market_open_at_trade")
+    close = _col(df, "market_close_at_trade")
+    low = _col(df, "low_at_trade")
+    high = _col(df, "high_at_trade")
+    low_7 = _col(df, "low_minus_7d")
+    low_15 = _col(df, "low_minus_15d")
+
+    cols = {}
+
+    # DIP BUY
+    guard = _nonzero(price) & _nonzero(low) & _nonzero(low_7)
+    near_recent_low = (price - low_7) / price * 100 <= DIP_THRESHOLD
+    near_day_low = (price - low) / price * 100 <= DIP_THRESHOLD
+    cols["📉 DIP BUY"] = guard & near_recent_low & (close < open_) & near_day_low
+
+    # BUYING INTO STRENGTH
+    guard = _nonzero(price) & _nonzero(low_15) & _nonzero(close) & _nonzero(open_)
+    strength_pct = (price - low_15) / low_15 * 100
+    near_day_high = (high - price) / price * 100 <= DIP_THRESHOLD
+    cols["🚀 BUYING INTO STRENGTH"] = (
+        guard & (strength_pct >= STRENGTH_THRESHOLD) & (close > open_) & near_day_high
+    )
+
+    # CAUGHT THE KNIFE
+    knife_7 = _nonzero(price) & _nonzero(low_7) & (price < low_7)
+    knife_14 = ~knife_7 & _nonzero(price) & _nonzero(low_15) & (price < low_15)
+    cols["🧨 CAUGHT THE KNIFE [7d]"] = knife_7
+    cols["🧨 CAUGHT THE KNIFE [14d]"] = knife_14
+
+    # ABOVE / BELOW CLOSE
+    valid_close = _nonzero(price) & (close > 0)
+    diff_pct = (price - close) / close * 100
+    cols["📈 ABOVE CLOSE"] = valid_close & (diff_pct >= 1)
+    cols["📉 BELOW CLOSE"] = valid_close & (diff_pct <= -1)
+
+    # SPIKE / DIP windows [tolerant thresholds]
+    for label in WINDOW_LABELS:
+        gain = _col(df, f"max_gain_{label}")
+        hit = pd.Series(False, index=df.index)
+        for pct in (20, 10, 5):
+            level = gain >= pct * (1 - STRENGTH_THRESHOLD)
+            cols[f"🚀 SPIKE +{pct}% [{label}]"] = level & ~hit
+            hit = hit | level
+
+    for label in WINDOW_LABELS:
+        drop = _col(df, f"max_drawdown_{label}")
+        hit = pd.Series(False, index=df.index)
+        for pct in (20, 10, 5):
+            level = drop <= -pct * (1 - DIP_THRESHOLD)
+            cols[f"📉 DIP -{pct}% [{label}]"] = level & ~hit
+            hit = hit | level
+
+    return {tag: cols[tag].to_numpy() for tag in TIMING_TAGS}
+
+def _earnings_columns(df: pd.DataFrame, earnings_date: pd.Series, window: int = 14) -> dict:
+    earnings = pd.to_datetime(earnings_date, errors="coerce").dt.normalize()
+    txn_date = pd.to_datetime(df["transaction_date"]).dt.normalize()
+    delta = (earnings - txn_date).dt.days
+    return {"📅 NEAR EARNINGS": ((delta > 0) & (delta <= window)).to_numpy()}
+
+def _metric_columns(df: pd.DataFrame) -> dict:
+    price = _col(df, "price")
+    sma_20 = _col(df, "sma_20_at_trade")
+    rsi_14 = _col(df, "rsi_14_at_trade")
+    sma_20_prev = _col(df, "sma_20_prev")
+    price_prev = _col(df, "price_prev")
+
+    has_sma = sma_20.notna() & _nonzero(price)
+    has_prev = has_sma & sma_20_prev.notna() & price_prev.notna()
+    has_rsi = rsi_14.notna()
+
+    above = has_sma & (price > sma_20)
+    below = has_sma & (price < sma_20)
+    reclaimed = has_prev & (price_prev < sma_20_prev) & (price > sma_20)
+    lost = has_prev & ~reclaimed & (price_prev > sma_20_prev) & (price < sma_20)
+
+    oversold = has_rsi & (rsi_14 < 30)
+    overbought = has_rsi & (rsi_14 > 70)
+    neutral = has_rsi & ~oversold & ~overbought
+
+    confluence = has_sma & has_rsi
+    strong = confluence & (price > sma_20) & (rsi_14 > 60)
+    dip_setup = confluence & ~strong & (price < sma_20) & (rsi_14 < 40)
+
+    cols = {
+        "📈 ABOVE SMA20": above,
+        "📉 BELOW SMA20": below,
+        "⚡️ SMA SUPPORT RECLAIMED": reclaimed,
+        "🔻 SMA LOST": lost,
+        "🔻 OVERSOLD (RSI < 30)": oversold,
+        "🚀 OVERBOUGHT (RSI > 70)": overbought,
+        "🟡 NEUTRAL (RSI)": neutral,
+        "💪 STRONG TREND": strong,
+        "📉 DIP SETUP": dip_setup,
+        "⚠️ INSUFFICIENT DATA FOR MA/RSI": sma_20.isna() | rsi_14.isna(),
+    }
+    return {tag: cols[tag].to_numpy() for tag in METRIC_TAGS}
+
+def _outcome_c1_columns(df: pd.DataFrame) -> dict:
+    entry_price = _col(df, "price")
+    valid_entry = entry_price.notna() & entry_price.ne(0)
+
+    def normalize(val: pd.Series) -> pd.Series:
+        # Decimal-looking values (e.g. 0.10) are converted to percentages
+        val = val.where(valid_entry)
+        return val.where(val.abs() >= 1, val * 100)
+
+    spiked = pd.Series(False, index=df.index)
+    for label in WINDOW_LABELS:
+        spiked = spiked | (normalize(_col(df, f"max_gain_{label}")) >= 10)
+
+    final_gain = normalize(_col(df, "final_gain_30d"))
+    resolved = ~spiked & final_gain.notna()
+    neutral = resolved & (final_gain >= 3) & (final_gain < 10)
+
+    return {
+        "🟢 SUCCESSFUL TRADE C1": spiked.to_numpy(),
+        "⚪ NEUTRAL TRADE C1": neutral.to_numpy(),
+        "🔴 UNSUCCESSFUL TRADE C1": (resolved & ~neutral).to_numpy(),
+    }
+
+def compute_tag_matrix(df: pd.DataFrame, snapshots: dict, market_cap: pd.Series | None = None) -> pd.DataFrame:
+    """
+    Columnar version of tag_trade(): returns one boolean column per tag,
+    aligned with df's index, with columns in the order tag_trade() emits them.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Enriched trades (output of enrich_trades_with_price_deltas).
+    snapshots : dict
+        Snapshot cache keyed by ticker.
+    market_cap : pd.Series, optional
+        Per-row market cap; defaults to the snapshot market cap of each ticker.
+    """
+    if market_cap is None:
+        market_cap = _snapshot_column(df, snapshots, "market_cap")
+
+    ownership, size_unknown = compute_ownership(df, market_cap)
+    cap_cols, cap_unknown = _cap_columns(market_cap)
+
+    columns = {}
+    columns.update(_role_columns(df))
+    columns.update(_size_columns(ownership, size_unknown))
+    # classify_company_cap() reuses the "❓ UNKNOWN SIZE" label for missing caps
+    columns["❓ UNKNOWN SIZE"] = columns["❓ UNKNOWN SIZE"] | cap_unknown
+    columns.update(cap_cols)
+    columns.update(_sector_columns(_snapshot_column(df, snapshots, "sector")))
+    columns.update(_timing_columns(df))
+    columns.update(_earnings_columns(df, _snapshot_column(df, snapshots, "earnings_date")))
+    columns.update(_metric_columns(df))
+    columns.update(_outcome_c1_columns(df))
+
+    return pd.DataFrame(columns, index=df.index, dtype=bool)
+
+def render_tag_lists(matrix: pd.DataFrame) -> pd.Series:
+    """
+    Renders the legacy `tags` list column from a boolean tag matrix.
+    Tags keep the matrix column order; a tag shows up at most once per row.
+    """
+    names = np.array(matrix.columns, dtype=object)
+    values = matrix.to_numpy(dtype=bool)
+    return pd.Series([names[row].tolist() for row in values], index=matrix.index, dtype=object)
+
+def tag_trades(df: pd.DataFrame, snapshots: dict, market_cap: pd.Series | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Adds `ownership_pct` and the legacy `tags` list column to df using the
+    columnar tag engine. Returns (df, tag_matrix) so callers can keep working
+    on the boolean matrix directly.
+    """
+    if market_cap is None:
+        market_cap = _snapshot_column(df, snapshots, "market_cap")
+
+    ownership, _ = compute_ownership(df, market_cap)
+    missing_cap = df.loc[pd.to_numeric(market_cap, errors="coerce").fillna(0).eq(0), "ticker"].unique()
+    if len(missing_cap):
+        print(f"⚠️ Market cap is missing for {len(missing_cap)} tickers: {', '.join(map(str, missing_cap[:10]))}")
+
+    matrix = compute_tag_matrix(df, snapshots, market_cap=market_cap)
+
+    df = df.copy()
+    df["ownership_pct"] = ownership
+    df["tags"] = render_tag_lists(matrix)
+    return df, matrix
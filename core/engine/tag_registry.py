@@ -0,0 +1,216 @@
+import ast
+import numpy as np
+import pandas as pd
+
+# === Tag registry ===
+# Each tag's integer id is its position in this list. Ids are persisted in the
+# tag bitmask columns, so this list is APPEND-ONLY: never reorder or remove.
+TAG_REGISTRY = [
+    # Insider Role (0 - 12)
+    "👑 CEO", "💼 CFO", "⚙️ COO", "💰 CRO", "📈 CIO", "🧠 CBO", "🪑 Chairman",
+    "🎖️ President", "🧍 EVP", "📊 Portfolio Manager", "🔟 10% Owner", "📋 Director",
+    "🕵️ Other",
+    # Trade Size (13 - 16)
+    "🔥 VERY LARGE TRADE", "💰 LARGE TRADE", "🟢 SMALL TRADE", "❓ UNKNOWN SIZE",
+    # Company Size (17 - 21)
+    "🐣 MICRO CAP", "🌱 SMALL CAP", "🌿 MID CAP", "🌳 LARGE CAP", "🏔️ MEGA CAP",
+    # Sector (22 - 33)
+    "📡 Tech", "🏥 Healthcare", "🏦 Financial", "🛍️ Consumer Cyclical", "🥫 Consumer Defensive",
+    "⚡ Energy", "🔌 Utilities", "🏗️ Industrial", "🏘️ Real Estate", "⚙️ Materials",
+    "📞 Communication", "🧰 Other",
+    # Timing (34 - 57)
+    "📉 DIP BUY", "🚀 BUYING INTO STRENGTH",
+    "🧨 CAUGHT THE KNIFE [7d]", "🧨 CAUGHT THE KNIFE [14d]",
+    "📈 ABOVE CLOSE", "📉 BELOW CLOSE",
+    "🚀 SPIKE +20% [7d]", "🚀 SPIKE +10% [7d]", "🚀 SPIKE +5% [7d]",
+    "🚀 SPIKE +20% [14d]", "🚀 SPIKE +10% [14d]", "🚀 SPIKE +5% [14d]",
+    "🚀 SPIKE +20% [30d]", "🚀 SPIKE +10% [30d]", "🚀 SPIKE +5% [30d]",
+    "📉 DIP -20% [7d]", "📉 DIP -10% [7d]", "📉 DIP -5% [7d]",
+    "📉 DIP -20% [14d]", "📉 DIP -10% [14d]", "📉 DIP -5% [14d]",
+    "📉 DIP -20% [30d]", "📉 DIP -10% [30d]", "📉 DIP -5% [30d]",
+    # Earnings (58)
+    "📅 NEAR EARNINGS",
+    # Indicators (59 - 68)
+    "📈 ABOVE SMA20", "📉 BELOW SMA20", "⚡️ SMA SUPPORT RECLAIMED", "🔻 SMA LOST",
+    "🔻 OVERSOLD (RSI < 30)", "🚀 OVERBOUGHT (RSI > 70)", "🟡 NEUTRAL (RSI)",
+    "💪 STRONG TREND", "📉 DIP SETUP", "⚠️ INSUFFICIENT DATA FOR MA/RSI",
+    # Outcome Case 1 (69 - 71)
+    "🟢 SUCCESSFUL TRADE C1", "⚪ NEUTRAL TRADE C1", "🔴 UNSUCCESSFUL TRADE C1",
+    # Behavioral (72 - 74)
+    "🔁 CLUSTER BUY", "🧩 MULTIPLE BUYS", "🧠 SMART INSIDER",
+    # Footnotes (75 - 79)
+    "Automatic/Scheduled", "Compensation/Accounting", "Ownership Disclaimer/Indirect",
+    "Conviction Buy", "❌ Error",
+    # Unmapped sectors (80), not a model feature
+    "🧰 Unmapped Sector",
+]
+
+TAG_IDS = {tag: i for i, tag in enumerate(TAG_REGISTRY)}
+
+# Dynamic tags folded into a registered one when encoded: classify_sector_tag()
+# emits "🧰 <sector>" for sectors it does not map (e.g. "🧰 None"). They get
+# their own tag rather than "🧰 Other", which is a model feature (FEATURE_TAGS).
+TAG_FALLBACKS = {"🧰 ": "🧰 Unmapped Sector"}
+
+def registry_id(tag) -> int | None:
+    """Registry id of a tag (or of its fallback), None if it has neither."""
+    tag = str(tag).strip()
+    if tag in TAG_IDS:
+        return TAG_IDS[tag]
+    for prefix, fallback in TAG_FALLBACKS.items():
+        if tag.startswith(prefix):
+            return TAG_IDS[fallback]
+    return None
+
+WORD_BITS = 64
+N_WORDS = (len(TAG_REGISTRY) + WORD_BITS - 1) // WORD_BITS
+
+# Tag list columns persisted as bitmasks
+TAG_LIST_COLUMNS = ("tags", "footnote_tags")
+
+def bit_columns(column: str = "tags") -> list[str]:
+    """Names of the uint64 columns storing the bitmask of a tag list column."""
+    return [f"{column}_bits_{w}" for w in range(N_WORDS)]
+
+def _parse_tag_list(val) -> list[str]:
+    """Accepts a list or a legacy stringified list; anything else is empty."""
+    if isinstance(val, (list, tuple, set, np.ndarray)):
+        return list(val)
+    if isinstance(val, str):
+        try:
+            parsed = ast.literal_eval(val)
+            return list(parsed) if isinstance(parsed, (list, tuple, set)) else []
+        except Exception:
+            return []
+    return []
+
+def tag_mask(tags) -> np.ndarray:
+    """Returns the (N_WORDS,) uint64 mask with the bits of the given tags set."""
+    mask = np.zeros(N_WORDS, dtype=np.uint64)
+    for tag in tags:
+        tag_id = TAG_IDS[tag]
+        mask[tag_id // WORD_BITS] |= np.uint64(1) << np.uint64(tag_id % WORD_BITS)
+    return mask
+
+def encode_tag_lists(tag_lists) -> np.ndarray:
+    """
+    Encodes an iterable of tag lists into an (n, N_WORDS) uint64 bitmask array.
+    Tags with a fallback (TAG_FALLBACKS) are stored as it; other tags missing
+    from the registry are skipped with a warning.
+    """
+    tag_lists = [_parse_tag_list(tags) for tags in tag_lists]
+    bits = np.zeros((len(tag_lists), N_WORDS), dtype=np.uint64)
+
+    rows, ids, unknown = [], [], set()
+    for i, tags in enumerate(tag_lists):
+        for tag in tags:
+            tag_id = registry_id(tag)
+            if tag_id is None:
+                unknown.add(tag)
+                continue
+            rows.append(i)
+            ids.append(tag_id)
+
+    if unknown:
+        print(f"⚠️ Skipped {len(unknown)} tags not in the registry: {sorted(map(str, unknown))[:5]}")
+
+    if rows:
+        ids = np.asarray(ids, dtype=np.uint64)
+        values = np.uint64(1) << (ids % np.uint64(WORD_BITS))
+        np.bitwise_or.at(bits, (np.asarray(rows), (ids // np.uint64(WORD_BITS)).astype(np.intp)), values)
+    return bits
+
+def encode_tag_matrix(matrix: pd.DataFrame) -> np.ndarray:
+    """
+    Encodes a boolean tag matrix (one column per tag, e.g. from the tag engine)
+    into an (n, N_WORDS) uint64 bitmask array without going through lists.
+    """
+    bits = np.zeros((len(matrix), N_WORDS), dtype=np.uint64)
+    unknown = [tag for tag in matrix.columns if registry_id(tag) is None]
+    if unknown:
+        print(f"⚠️ Skipped {len(unknown)} tags not in the registry: {unknown[:5]}")
+
+    for tag in matrix.columns:
+        if tag in unknown:
+            continue
+        tag_id = registry_id(tag)
+        bits[:, tag_id // WORD_BITS] |= (
+            matrix[tag].to_numpy(dtype=np.uint64) << np.uint64(tag_id % WORD_BITS)
+        )
+    return bits
+
+def bits_to_indicator(bits: np.ndarray, tags: list[str] | None = None) -> np.ndarray:
+    """
+    Expands an (n, N_WORDS) bitmask array into an (n, k) uint8 indicator matrix,
+    one column per tag in `tags` (defaults to the full registry order).
+    """
+    tags = TAG_REGISTRY if tags is None else tags
+    ids = np.array([TAG_IDS[t] for t in tags], dtype=np.int64)
+    words = bits[:, ids // WORD_BITS]
+    shifts = (ids % WORD_BITS).astype(np.uint64)
+    return ((words >> shifts) & np.uint64(1)).astype(np.uint8)
+
+def decode_tag_bits(bits: np.ndarray) -> list[list[str]]:
+    """Decodes an (n, N_WORDS) bitmask array back into tag lists (registry order)."""
+    names = np.array(TAG_REGISTRY, dtype=object)
+    indicator = bits_to_indicator(bits).astype(bool)
+    return [names[row].tolist() for row in indicator]
+
+def has_tag(bits: np.ndarray, tag: str) -> np.ndarray:
+    """Boolean array: rows whose bitmask contains `tag`."""
+    tag_id = TAG_IDS[tag]
+    word = bits[:, tag_id // WORD_BITS]
+    return ((word >> np.uint64(tag_id % WORD_BITS)) & np.uint64(1)).astype(bool)
+
+def has_all(bits: np.ndarray, tags) -> np.ndarray:
+    """Boolean array: rows whose bitmask contains every tag in `tags`."""
+    mask = tag_mask(tags)
+    return ((bits & mask) == mask).all(axis=1)
+
+def has_any(bits: np.ndarray, tags) -> np.ndarray:
+    """Boolean array: rows whose bitmask contains at least one tag in `tags`."""
+    mask = tag_mask(tags)
+    return ((bits & mask) != 0).any(axis=1)
+
+def read_tag_bits(df: pd.DataFrame, column: str = "tags") -> np.ndarray | None:
+    """
+    Returns the (n, N_WORDS) bitmask array for a tag column, from its bit
+    columns if present (they win over the list column), else by encoding the
+    list column. None if neither exists.
+    """
+    cols = bit_columns(column)
+    if all(c in df.columns for c in cols) and all(pd.api.types.is_integer_dtype(df[c]) for c in cols):
+        return np.column_stack([df[c].to_numpy().astype(np.uint64) for c in cols])
+    if column in df.columns:
+        return encode_tag_lists(df[column])
+    return None
+
+def pack_tag_columns(df: pd.DataFrame, columns=TAG_LIST_COLUMNS) -> pd.DataFrame:
+    """
+    Replaces tag list columns with their uint64 bitmask columns before saving.
+    """
+    df = df.copy()
+    for column in columns:
+        if column not in df.columns:
+            continue
+        bits = encode_tag_lists(df[column])
+        for w, col in enumerate(bit_columns(column)):
+            df[col] = bits[:, w]
+        df = df.drop(columns=column)
+    return df
+
+def unpack_tag_columns(df: pd.DataFrame, columns=TAG_LIST_COLUMNS) -> pd.DataFrame:
+    """
+    Restores tag list columns after loading: decodes bitmask columns when present,
+    otherwise parses legacy stringified lists. Bit columns are kept as uint64.
+    """
+    for column in columns:
+        cols = bit_columns(column)
+        bits = read_tag_bits(df, column) if all(c in df.columns for c in cols) else None
+        if bits is not None:
+            for w, col in enumerate(cols):
+                df[col] = bits[:, w]
+            df[column] = decode_tag_bits(bits)
+        elif column in df.columns:
+            df[column] = df[column].apply(_parse_tag_list)
+    return df
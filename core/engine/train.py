@@ -1,17 +1,46 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # headless: plots are written to files, never shown
 import matplotlib.pyplot as plt
 import seaborn as sns
-import re
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, roc_auc_score, roc_curve, auc
+from sklearn.metrics import classification_report, roc_auc_score, roc_curve
 from xgboost import XGBClassifier
-import joblib
+from joblib import Parallel, delayed
+from datetime import datetime
+import argparse
 import os
 
-def plot_lift_curve(model, X_test, y_test, path):
+from core.io.atomic import write_json
+from core.engine.features import FEATURES_DIR, load_feature_set, load_manifest
+from core.engine.model_registry import MODELS_DIR, register_models, file_hash
+
+PLOTS_DIR = os.path.join(MODELS_DIR, "plots")
+REPORT_FILE = os.path.join(MODELS_DIR, "training_report.json")
+
+TRAIN_SETS = ["train_case1", "train_case2"]
+
+def _save_figure(out_path: str):
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    plt.savefig(out_path, dpi=120)
+    plt.close()
+
+def plot_roc_curve(y_test, y_proba, auc_score, path, out_path):
+    """Saves the ROC curve of a fitted model to `out_path`."""
+    fpr, tpr, _ = roc_curve(y_test, y_proba)
+    plt.figure()
+    plt.plot(fpr, tpr, label=f"ROC curve (AUC = {auc_score:.3f})")
+    plt.plot([0, 1], [0, 1], "k--")
+    plt.xlabel("False Positive Rate")
+    plt.ylabel("True Positive Rate")
+    plt.title(f"ROC Curve – {path}")
+    plt.legend(loc="lower right")
+    _save_figure(out_path)
+
+def plot_lift_curve(model, X_test, y_test, path, out_path):
     """
     Plot cumulative gains / lift curve to show winrate by top % of trades.
     """
@@ -31,7 +60,19 @@ def plot_lift_curve(model, X_test, y_test, path):
     plt.ylabel("Cumulative Winrate")
     plt.title(f"Lift Curve – {path}")
     plt.legend()
-    plt.show()
+    _save_figure(out_path)
+
+def plot_importances(importances: pd.Series, title, xlabel, palette, out_path, zero_line=False):
+    """Saves a horizontal bar plot of feature importances / coefficients."""
+    importances = importances.rename(lambda s: s.encode("ascii", "ignore").decode().strip())
+    plt.figure(figsize=(8, 10))
+    sns.barplot(x=importances.values, y=importances.index, palette=palette, legend=False)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    if zero_line:
+        plt.axvline(0, color="black", linestyle="--")
+    plt.tight_layout()
+    _save_figure(out_path)
 
 def top_decile_analysis(model, X_test, y_test, path, percentile=0.1):
     """
@@ -55,180 +96,80 @@ def top_decile_analysis(model, X_test, y_test, path, percentile=0.1):
 
     return top_winrate, baseline_winrate
 
-def sanitize_column(col: str) -> str:
-    # Replace problematic characters with underscores
-    return re.sub(r'[\[\]<>]', '_', col)
-
-def train_logreg(path: str, target_col: str):
-    print(f"\n🔎 Training Logistic Regression on {path} ...")
-    
-    # Load dataset
-    df = pd.read_csv(path)
-    X = df.drop(columns=[target_col])
-    y = df[target_col]
+def build_logreg():
+    return LogisticRegression(max_iter=500, solver="liblinear")
 
-    # Debug: show class distribution
-    print("🔎 Class distribution:", y.value_counts().to_dict())
-
-    # Split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.3, random_state=42, stratify=y
-    )
-
-    # Logistic Regression
-    model = LogisticRegression(max_iter=500, solver="liblinear")
-    model.fit(X_train, y_train)
-
-    # Eval
-    y_pred = model.predict(X_test)
-    print(classification_report(y_test, y_pred, digits=3))
-
-    # Probabilities for ROC-AUC
-    y_proba = model.predict_proba(X_test)[:, 1]
-    auc_score = roc_auc_score(y_test, y_proba)
-    print(f"🎯 ROC-AUC: {auc_score:.3f}")
-
-    # ROC Curve
-    fpr, tpr, _ = roc_curve(y_test, y_proba)
-    plt.figure()
-    plt.plot(fpr, tpr, label=f"ROC curve (AUC = {auc_score:.3f})")
-    plt.plot([0, 1], [0, 1], "k--")
-    plt.xlabel("False Positive Rate")
-    plt.ylabel("True Positive Rate")
-    plt.title(f"ROC Curve – {path}")
-    plt.legend(loc="lower right")
-    plt.show()
-
-    # Top-decile analysis (10%)
-    top_decile_analysis(model, X_test, y_test, path, percentile=0.1)
-
-    # You can also test top 20% or 30%
-    top_decile_analysis(model, X_test, y_test, path, percentile=0.2)
-
-    plot_lift_curve(model, X_test, y_test, path)
-
-    cv_scores = cross_val_score(model, X, y, cv=5, scoring="accuracy")
-    print(f"📊 Cross-val Accuracy: {cv_scores.mean():.3f} ± {cv_scores.std():.3f}")
-
-    # Feature importance
-    coefs = pd.Series(model.coef_[0], index=X.columns).sort_values(ascending=False)
-    coefs = coefs.rename(lambda s: s.encode("ascii", "ignore").decode().strip())
-
-    # 🔎 Print top 10 positive/negative signals
-    print("\n📈 Top 10 bullish tags:")
-    print(coefs.head(10))
-    print("\n📉 Top 10 bearish tags:")
-    print(coefs.tail(10))
-
-    # Plot
-    plt.figure(figsize=(8, 10))
-    sns.barplot(x=coefs.values, y=coefs.index, palette="coolwarm", legend=False)
-    plt.title(f"Feature Importance (Logistic Regression) – {path}")
-    plt.xlabel("Coefficient (log-odds impact)")
-    plt.axvline(0, color="black", linestyle="--")
-    plt.tight_layout()
-    plt.show()
-
-    return model
-
-def train_random_forest(path: str, target_col: str):
-    print(f"\n🌲 Training Random Forest on {path} ...")
-
-    df = pd.read_csv(path)
-    X = df.drop(columns=[target_col])
-    y = df[target_col]
-
-    print("🔎 Class distribution:", y.value_counts().to_dict())
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.3, random_state=42, stratify=y
-    )
-
-    # Random Forest
-    model = RandomForestClassifier(
+def build_random_forest():
+    return RandomForestClassifier(
         n_estimators=300,
         max_depth=6,
         random_state=42,
         class_weight="balanced"  # handle imbalances better
     )
-    model.fit(X_train, y_train)
-
-    # Eval
-    y_pred = model.predict(X_test)
-    print(classification_report(y_test, y_pred, digits=3))
-
-    # Probabilities for ROC-AUC
-    y_proba = model.predict_proba(X_test)[:, 1]
-    auc_score = roc_auc_score(y_test, y_proba)
-    print(f"🎯 ROC-AUC: {auc_score:.3f}")
-
-    # ROC Curve
-    fpr, tpr, _ = roc_curve(y_test, y_proba)
-    plt.figure()
-    plt.plot(fpr, tpr, label=f"ROC curve (AUC = {auc_score:.3f})")
-    plt.plot([0, 1], [0, 1], "k--")
-    plt.xlabel("False Positive Rate")
-    plt.ylabel("True Positive Rate")
-    plt.title(f"ROC Curve – {path}")
-    plt.legend(loc="lower right")
-    plt.show()
-
-    # Top-decile analysis (10%)
-    top_decile_analysis(model, X_test, y_test, path, percentile=0.1)
 
-    # You can also test top 20% or 30%
-    top_decile_analysis(model, X_test, y_test, path, percentile=0.2)
-
-    plot_lift_curve(model, X_test, y_test, path)
-
-    cv_scores = cross_val_score(model, X, y, cv=5, scoring="accuracy")
-    print(f"📊 Cross-val Accuracy: {cv_scores.mean():.3f} ± {cv_scores.std():.3f}")
+def build_xgboost():
+    return XGBClassifier(
+        n_estimators=300,
+        max_depth=5,
+        learning_rate=0.05,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        eval_metric="logloss",
+        random_state=42,
+    )
 
-    # Feature importances
-    importances = pd.Series(model.feature_importances_, index=X.columns).sort_values(ascending=False)
-    importances = importances.rename(lambda s: s.encode("ascii", "ignore").decode().strip())
+# Unfitted model factories by short name (same names as models/<name>_case*.pkl)
+MODEL_BUILDERS = {
+    "logreg": build_logreg,
+    "rf": build_random_forest,
+    "xgb": build_xgboost,
+}
+
+# Display settings per model: (label, emoji, importance label, palette)
+MODEL_DISPLAY = {
+    "logreg": ("Logistic Regression", "🔎", "Coefficient (log-odds impact)", "coolwarm"),
+    "rf": ("Random Forest", "🌲", "Importance (Gini)", "viridis"),
+    "xgb": ("XGBoost", "⚡", "Importance (Gain)", "mako"),
+}
+
+def load_training_data(name: str):
+    """
+    Loads a sparse training feature set (see prepare_train.py).
+    Returns (X, y, feature_names) with X as CSR and y as a pd.Series.
+    """
+    data = load_feature_set(name)
+    y = pd.Series(data["y"].astype(int), name="target")
+    return data["X"], y, data["manifest"]["tags"]
 
-    print("\n🌟 Top 10 important tags (Random Forest):")
-    print(importances.head(10))
+def model_importances(kind: str, model, feature_names) -> pd.Series:
+    """Coefficients (logreg) or feature importances (trees), sorted descending."""
+    values = model.coef_[0] if kind == "logreg" else model.feature_importances_
+    return pd.Series(values, index=feature_names).sort_values(ascending=False)
 
-    plt.figure(figsize=(8, 10))
-    sns.barplot(x=importances.values, y=importances.index, palette="viridis", legend=False)
-    plt.title(f"Feature Importance (Random Forest) – {path}")
-    plt.xlabel("Importance (Gini)")
-    plt.tight_layout()
-    plt.show()
-
-    return model
+def train_model(kind: str, path: str, plots_dir: str | None = PLOTS_DIR, n_jobs: int | None = None):
+    """
+    Trains one model kind ("logreg", "rf", "xgb") on a feature set, unattended.
+    - Plots (ROC, lift, importances) are written to `plots_dir` (None = no plots)
+    - `n_jobs` overrides the model's own thread count (1 inside parallel runs)
 
-def train_xgboost(path: str, target_col: str):
-    print(f"\n⚡ Training XGBoost on {path} ...")
+    Returns (model, metrics) where metrics is JSON-serializable.
+    """
+    label, emoji, importance_label, palette = MODEL_DISPLAY[kind]
+    print(f"\n{emoji} Training {label} on {path} ...")
 
-    df = pd.read_csv(path)
-    X = df.drop(columns=[target_col])
-    y = df[target_col]
+    X, y, feature_names = load_training_data(path)
 
+    # Debug: show class distribution
     print("🔎 Class distribution:", y.value_counts().to_dict())
 
+    # Split
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.3, random_state=42, stratify=y
     )
 
-    # anitize after split
-    X_train = X_train.rename(columns=sanitize_column)
-    X_test = X_test.rename(columns=sanitize_column)
-    X = X.rename(columns=sanitize_column)  
-
-    # XGBoost model
-    model = XGBClassifier(
-        n_estimators=300,
-        max_depth=5,
-        learning_rate=0.05,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        eval_metric="logloss",
-        random_state=42,
-        use_label_encoder=False
-    )
+    model = MODEL_BUILDERS[kind]()
+    if n_jobs is not None and kind != "logreg":  # liblinear is single-threaded
+        model.set_params(n_jobs=n_jobs)
     model.fit(X_train, y_train)
 
     # Eval
@@ -240,64 +181,125 @@ def train_xgboost(path: str, target_col: str):
     auc_score = roc_auc_score(y_test, y_proba)
     print(f"🎯 ROC-AUC: {auc_score:.3f}")
 
-    # ROC Curve
-    fpr, tpr, _ = roc_curve(y_test, y_proba)
-    plt.figure()
-    plt.plot(fpr, tpr, label=f"ROC curve (AUC = {auc_score:.3f})")
-    plt.plot([0, 1], [0, 1], "k--")
-    plt.xlabel("False Positive Rate")
-    plt.ylabel("True Positive Rate")
-    plt.title(f"ROC Curve – {path}")
-    plt.legend(loc="lower right")
-    plt.show()
-
-    # Top-decile analysis (10%)
-    top_decile_analysis(model, X_test, y_test, path, percentile=0.1)
-
-    # You can also test top 20% or 30%
-    top_decile_analysis(model, X_test, y_test, path, percentile=0.2)
-
-    plot_lift_curve(model, X_test, y_test, path)
+    # Top-decile analysis (10%) and top 20%
+    top10, baseline = top_decile_analysis(model, X_test, y_test, path, percentile=0.1)
+    top20, _ = top_decile_analysis(model, X_test, y_test, path, percentile=0.2)
 
     cv_scores = cross_val_score(model, X, y, cv=5, scoring="accuracy")
     print(f"📊 Cross-val Accuracy: {cv_scores.mean():.3f} ± {cv_scores.std():.3f}")
 
     # Feature importance
-    importances = pd.Series(model.feature_importances_, index=X.columns).sort_values(ascending=False)
-    importances = importances.rename(lambda s: s.encode("ascii", "ignore").decode().strip())
+    importances = model_importances(kind, model, feature_names)
+    if kind == "logreg":
+        # Signed coefficients: strongest signals on both ends
+        print("\n📈 Top 10 bullish tags:")
+        print(importances.head(10))
+        print("\n📉 Top 10 bearish tags:")
+        print(importances.tail(10))
+    else:
+        print(f"\n🌟 Top 10 important tags ({label}):")
+        print(importances.head(10))
+
+    if plots_dir:
+        prefix = os.path.join(plots_dir, f"{kind}_{path}")
+        plot_roc_curve(y_test, y_proba, auc_score, path, f"{prefix}_roc.png")
+        plot_lift_curve(model, X_test, y_test, path, f"{prefix}_lift.png")
+        plot_importances(
+            importances, f"Feature Importance ({label}) – {path}", importance_label,
+            palette, f"{prefix}_importance.png", zero_line=(kind == "logreg"),
+        )
+
+    metrics = {
+        "model": kind,
+        "dataset": path,
+        "n_rows": int(len(y)),
+        "class_distribution": {str(k): int(v) for k, v in y.value_counts().items()},
+        "roc_auc": float(auc_score),
+        "top10_winrate": float(top10),
+        "top20_winrate": float(top20),
+        "baseline_winrate": float(baseline),
+        "cv_accuracy_mean": float(cv_scores.mean()),
+        "cv_accuracy_std": float(cv_scores.std()),
+        "classification_report": classification_report(y_test, y_pred, output_dict=True),
+        "top_features": {k: float(v) for k, v in importances.head(10).items()},
+    }
+    if kind == "logreg":
+        metrics["bottom_features"] = {k: float(v) for k, v in importances.tail(10).items()}
+    return model, metrics
+
+def train_logreg(path: str):
+    return train_model("logreg", path)[0]
+
+def train_random_forest(path: str):
+    return train_model("rf", path)[0]
+
+def train_xgboost(path: str):
+    return train_model("xgb", path)[0]
+
+def train_all(
+    datasets: list[str] = TRAIN_SETS,
+    models: list[str] | None = None,
+    n_jobs: int = -1,
+    plots_dir: str | None = PLOTS_DIR,
+    report_file: str = REPORT_FILE,
+    promote: bool = True,
+) -> dict:
+    """
+    Trains every model/dataset combination concurrently (joblib processes),
+    registers them as a new model registry version (see model_registry.py)
+    and writes a JSON report.
+    Each model runs single-threaded when combinations run in parallel.
+    """
+    models = models or list(MODEL_BUILDERS)
+    combos = [(kind, path) for path in datasets for kind in models]
+    inner_jobs = None if n_jobs == 1 else 1
+
+    print(f"🏋️ Training {len(combos)} models (n_jobs={n_jobs}) ...")
+    start = datetime.now()
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(train_model)(kind, path, plots_dir, inner_jobs) for kind, path in combos
+    )
+
+    trained, all_metrics = {}, {}
+    for (kind, path), (model, metrics) in zip(combos, results):
+        name = f"{kind}_{path.replace('train_', '')}"
+        trained[name] = model
+        all_metrics[name] = metrics
+
+    version = register_models(
+        trained,
+        load_manifest(),
+        data_hashes={path: file_hash(os.path.join(FEATURES_DIR, f"{path}.npz")) for path in datasets},
+        metrics={name: {k: m[k] for k in ("roc_auc", "top10_winrate", "cv_accuracy_mean")} for name, m in all_metrics.items()},
+        promote=promote,
+    )
 
-    print("\n⚡ Top 10 important tags (XGBoost):")
-    print(importances.head(10))
+    report = {
+        "trained_at": start.isoformat(timespec="seconds"),
+        "duration_sec": round((datetime.now() - start).total_seconds(), 2),
+        "n_jobs": n_jobs,
+        "version": version,
+        "models": all_metrics,
+    }
 
-    plt.figure(figsize=(8, 10))
-    sns.barplot(x=importances.values, y=importances.index, palette="mako", legend=False)
-    plt.title(f"Feature Importance (XGBoost) – {path}")
-    plt.xlabel("Importance (Gain)")
-    plt.tight_layout()
-    plt.show()
+    write_json(report, report_file, ensure_ascii=False, indent=2)
 
-    return model
+    print(f"✅ {len(combos)} models registered as {version} – report: {report_file}")
+    return report
 
 if __name__ == "__main__":
-    os.makedirs("models", exist_ok=True)
-    # Logistic Regression
-    model_case1 = train_logreg("train_case1.csv", "outcome_case1_binary")
-    model_case2 = train_logreg("train_case2.csv", "outcome_case2_binary")
-
-    # Random Forest
-    rf_case1 = train_random_forest("train_case1.csv", "outcome_case1_binary")
-    rf_case2 = train_random_forest("train_case2.csv", "outcome_case2_binary")
-
-    # XGBoost
-    xgb_case1 = train_xgboost("train_case1.csv", "outcome_case1_binary")
-    xgb_case2 = train_xgboost("train_case2.csv", "outcome_case2_binary")
-
-    # === Save all models ===
-    joblib.dump(model_case1, "models/logreg_case1.pkl")
-    joblib.dump(model_case2, "models/logreg_case2.pkl")
-    joblib.dump(rf_case1, "models/rf_case1.pkl")
-    joblib.dump(rf_case2, "models/rf_case2.pkl")
-    joblib.dump(xgb_case1, "models/xgb_case1.pkl")
-    joblib.dump(xgb_case2, "models/xgb_case2.pkl")
-
-    print("✅ All models saved to /models/")
+    parser = argparse.ArgumentParser(description="Headless training of all tag models")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel model/case combinations (-1 = all cores)")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_BUILDERS), default=None)
+    parser.add_argument("--datasets", nargs="+", default=TRAIN_SETS)
+    parser.add_argument("--no-plots", action="store_true", help="Skip writing plot files")
+    parser.add_argument("--no-promote", action="store_true", help="Register without making it the current version")
+    args = parser.parse_args()
+
+    train_all(
+        datasets=args.datasets,
+        models=args.models,
+        n_jobs=args.n_jobs,
+        plots_dir=None if args.no_plots else PLOTS_DIR,
+        promote=not args.no_promote,
+    )
@@ -0,0 +1,243 @@
+import os
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import roc_auc_score
+
+from config.settings import WORKERS
+from core.io.atomic import write_csv, write_json, write_npz
+from core.engine.features import load_feature_set
+from core.engine.train import MODEL_BUILDERS
+from core.io.file_manager import FINVIZ_DATA_DIR
+
+WALK_FORWARD_DIR = os.path.join(FINVIZ_DATA_DIR, "walk_forward")
+
+# --- Default window settings (calendar days) ---
+LABEL_HORIZON_DAYS = 30  # outcomes are measured up to 30d after the trade
+TRAIN_DAYS = 60
+TEST_DAYS = 7
+STEP_DAYS = 7
+GAP_DAYS = LABEL_HORIZON_DAYS  # purge: no training label may reach into the test window
+MIN_TRAIN_ROWS = 50
+MIN_TEST_ROWS = 10
+
+def make_folds(
+    dates: pd.DatetimeIndex,
+    train_days: int = TRAIN_DAYS,
+    test_days: int = TEST_DAYS,
+    step_days: int = STEP_DAYS,
+    gap_days: int = GAP_DAYS,
+    expanding: bool = False,
+    min_train: int = MIN_TRAIN_ROWS,
+    min_test: int = MIN_TEST_ROWS,
+) -> list[dict]:
+    """
+    Slices rows into rolling (or expanding) train/test windows by transaction date.
+    Folds with too few rows on either side are skipped.
+
+    Returns a list of dicts with fold id, window bounds and row index arrays.
+    """
+    if gap_days < LABEL_HORIZON_DAYS:
+        print(f"⚠️ Gap of {gap_days}d is shorter than the {LABEL_HORIZON_DAYS}d label horizon: training labels overlap the test window")
+
+    days = np.asarray(dates, dtype="datetime64[D]")
+    first, last = days.min(), days.max()
+
+    folds = []
+    test_start = first + np.timedelta64(train_days + gap_days, "D")
+    while test_start <= last:
+        test_end = test_start + np.timedelta64(test_days, "D")
+        train_end = test_start - np.timedelta64(gap_days, "D")
+        train_start = first if expanding else train_end - np.timedelta64(train_days, "D")
+
+        train_idx = np.flatnonzero((days >= train_start) & (days < train_end))
+        test_idx = np.flatnonzero((days >= test_start) & (days < test_end))
+
+        if len(train_idx) >= min_train and len(test_idx) >= min_test:
+            folds.append({
+                "fold": len(folds),
+                "train_start": str(train_start), "train_end": str(train_end),
+                "test_start": str(test_start), "test_end": str(test_end),
+                "train_idx": train_idx, "test_idx": test_idx,
+            })
+        test_start += np.timedelta64(step_days, "D")
+
+    return folds
+
+def _fingerprint(*arrays) -> str:
+    h = hashlib.sha1()
+    for a in arrays:
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()[:12]
+
+def cache_fold(name: str, fold: dict, X: sparse.csr_matrix, y: np.ndarray, manifest_hash: str) -> str:
+    """
+    Writes the train/test matrices of a fold to `<name>_fold<k>_<fingerprint>.npz`
+    (skipped if already cached) so worker processes load them from disk.
+    """
+    os.makedirs(WALK_FORWARD_DIR, exist_ok=True)
+    X_train, X_test = X[fold["train_idx"]], X[fold["test_idx"]]
+    y_train, y_test = y[fold["train_idx"]], y[fold["test_idx"]]
+
+    key = _fingerprint(
+        np.frombuffer(manifest_hash.encode(), dtype=np.uint8),
+        X_train.indptr, X_train.indices, y_train,
+        X_test.indptr, X_test.indices, y_test,
+    )
+    path = os.path.join(WALK_FORWARD_DIR, f"{name}_fold{fold['fold']}_{key}.npz")
+    if not os.path.exists(path):
+        write_npz(
+            path,
+            train_data=X_train.data, train_indices=X_train.indices, train_indptr=X_train.indptr,
+            test_data=X_test.data, test_indices=X_test.indices, test_indptr=X_test.indptr,
+            n_features=np.array(X.shape[1]), y_train=y_train, y_test=y_test,
+        )
+    return path
+
+def load_fold(path: str) -> tuple:
+    """Loads (X_train, y_train, X_test, y_test) from a cached fold file."""
+    with np.load(path) as npz:
+        n_features = int(npz["n_features"])
+        X_train = sparse.csr_matrix(
+            (npz["train_data"], npz["train_indices"], npz["train_indptr"]),
+            shape=(len(npz["train_indptr"]) - 1, n_features),
+        )
+        X_test = sparse.csr_matrix(
+            (npz["test_data"], npz["test_indices"], npz["test_indptr"]),
+            shape=(len(npz["test_indptr"]) - 1, n_features),
+        )
+        return X_train, npz["y_train"].astype(int), X_test, npz["y_test"].astype(int)
+
+def fold_metrics(y_test: np.ndarray, y_proba: np.ndarray, percentile: float = 0.1) -> dict:
+    """
+    Out-of-sample metrics of one fold:
+    - auc: ROC-AUC (NaN if the test window has a single class)
+    - top_winrate: winrate of the top `percentile` trades ranked by probability
+    - baseline_winrate / lift: winrate of all test trades and top / baseline
+    """
+    baseline = float(y_test.mean())
+    cutoff = max(int(len(y_proba) * percentile), 1)
+    top_idx = np.argsort(y_proba)[::-1][:cutoff]
+    top_winrate = float(y_test[top_idx].mean())
+
+    auc = float(roc_auc_score(y_test, y_proba)) if len(np.unique(y_test)) > 1 else float("nan")
+    lift = top_winrate / baseline if baseline > 0 else float("nan")
+
+    return {
+        "auc": auc,
+        "top_winrate": top_winrate,
+        "baseline_winrate": baseline,
+        "lift": lift,
+    }
+
+def model_params_key(model: str) -> str:
+    """Fingerprint of a model's hyperparameters, so editing a build_* function invalidates its cached results."""
+    params = MODEL_BUILDERS[model]().get_params()
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:8]
+
+def _result_path(fold_path: str, model: str, params_key: str, percentile: float) -> str:
+    return fold_path.replace(".npz", f"_{model}_{params_key}_p{percentile:g}.json")
+
+def _run_fold(task: tuple) -> dict:
+    """Worker: trains one model on one cached fold; reuses the cached result if present."""
+    fold_path, model_name, params_key, percentile = task
+    result_path = _result_path(fold_path, model_name, params_key, percentile)
+    if os.path.exists(result_path):
+        with open(result_path, "r", encoding="utf-8") as f:
+            return {**json.load(f), "cached": True}
+
+    X_train, y_train, X_test, y_test = load_fold(fold_path)
+    result = {"model": model_name, "n_train": len(y_train), "n_test": len(y_test)}
+
+    if len(np.unique(y_train)) < 2:
+        result.update({"auc": float("nan"), "top_winrate": float("nan"),
+                       "baseline_winrate": float(y_test.mean()), "lift": float("nan")})
+    else:
+        model = MODEL_BUILDERS[model_name]()
+        model.fit(X_train, y_train)
+        y_proba = model.predict_proba(X_test)[:, 1]
+        result.update(fold_metrics(y_test, y_proba, percentile))
+
+    write_json(result, result_path, indent=2)
+    return {**result, "cached": False}
+
+def run_walk_forward(
+    name: str = "train_case1",
+    models: list[str] | None = None,
+    workers: int | None = None,
+    percentile: float = 0.1,
+    **window_kwargs,
+) -> pd.DataFrame:
+    """
+    Walk-forward evaluation of the train.py models on a saved feature set.
+    Every (fold, model) pair is trained in its own process; fold matrices
+    and fold results are cached, so unchanged folds are not retrained.
+
+    Returns one row per fold and model with window bounds and metrics.
+    """
+    models = models or list(MODEL_BUILDERS)
+    data = load_feature_set(name)
+    if data["dates"] is None:
+        raise ValueError(f"❌ Feature set {name} has no dates; re-run prepare_train.py")
+
+    X, y = data["X"], data["y"].astype(int)
+    folds = make_folds(data["dates"], **window_kwargs)
+    if not folds:
+        print("⚠️ No fold has enough rows for the given window settings.")
+        return pd.DataFrame()
+
+    print(f"🧭 Walk-forward on {name}: {len(folds)} folds × {len(models)} models")
+    fold_paths = [cache_fold(name, fold, X, y, data["manifest"]["hash"]) for fold in folds]
+
+    params_keys = {model: model_params_key(model) for model in models}
+    tasks = [(path, model, params_keys[model], percentile) for path in fold_paths for model in models]
+    with ProcessPoolExecutor(max_workers=workers or WORKERS or None) as executor:
+        results = list(executor.map(_run_fold, tasks))
+
+    rows = []
+    for (path, _, _, _), result in zip(tasks, results):
+        fold = folds[fold_paths.index(path)]
+        rows.append({
+            "fold": fold["fold"],
+            "train_start": fold["train_start"], "train_end": fold["train_end"],
+            "test_start": fold["test_start"], "test_end": fold["test_end"],
+            **result,
+        })
+
+    report = pd.DataFrame(rows)
+    print(f"♻️ {int(report['cached'].sum())}/{len(report)} fold results reused from cache")
+    return report
+
+def summarize_walk_forward(report: pd.DataFrame) -> pd.DataFrame:
+    """Mean out-of-sample metrics per model across folds."""
+    return report.groupby("model")[["auc", "top_winrate", "baseline_winrate", "lift", "n_test"]].mean()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of the tag models")
+    parser.add_argument("--name", default="train_case1", help="Feature set (train_case1 / train_case2)")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_BUILDERS), default=None)
+    parser.add_argument("--train-days", type=int, default=TRAIN_DAYS)
+    parser.add_argument("--test-days", type=int, default=TEST_DAYS)
+    parser.add_argument("--step-days", type=int, default=STEP_DAYS)
+    parser.add_argument("--gap-days", type=int, default=GAP_DAYS)
+    parser.add_argument("--expanding", action="store_true", help="Expanding instead of rolling train window")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    report = run_walk_forward(
+        args.name, args.models, args.workers,
+        train_days=args.train_days, test_days=args.test_days,
+        step_days=args.step_days, gap_days=args.gap_days, expanding=args.expanding,
+    )
+    if not report.empty:
+        print(report.drop(columns=["cached"]).to_string(index=False))
+        print("\n📊 Mean out-of-sample metrics:")
+        print(summarize_walk_forward(report).round(3))
+
+        out_path = os.path.join(WALK_FORWARD_DIR, f"{args.name}_report.csv")
+        write_csv(report, out_path, index=False)
+        print(f"✅ Walk-forward report saved to {out_path}")
@@ -3,7 +3,26 @@ from bs4 import BeautifulSoup
 import pandas as pd
 from datetime import datetime
 
-def finviz_scraper():
+def finviz_scraper() -> pd.DataFrame:
+    """
+    Scrapes the Finviz insider trading page for recent BUY trades.
+
+    Args:
+        None
+
+    Returns:
+        pd.DataFrame: DataFrame of trades with the following columns:
+            - ticker (str): Stock ticker symbol.
+            - insider_name (str): Name of the insider making the trade.
+            - relationship (str): Insider’s role/relationship to the company.
+            - transaction_date (datetime.date): Date of the transaction.
+            - transaction_type (str): Type of trade (Buy/Sell).
+            - price (float): Trade price per share (if available).
+            - shares (int): Number of shares traded.
+            - value (str): Reported value of the transaction.
+            - shares_total (str): Total insider shareholding after the trade.
+            - sec_form4 (str): URL to the SEC Form 4 filing.
+    """
     url = "https://finviz.com/insidertrading.ashx?tc=1" #1tc=1 filters only buys
     headers = {
         "User-Agent": "Mozilla/5.0"
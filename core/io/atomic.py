@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Every store is written to a temp file next to it, fsynced and renamed over the
+# original, so readers and crashed runs never see a half-written file. Read-modify-write
+# updates additionally hold an advisory lock on `<path>.lock`.
+LOCK_SUFFIX = ".lock"
+LOCK_POLL_SECONDS = 0.05
+
+# (lock path, thread) -> depth: locks are re-entrant within a thread
+_HELD_LOCKS = {}
+
+# Process umask (read once: os.umask can only be queried by setting it)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# === Atomic writes ===
+
+def _file_mode(path: str) -> int:
+    # mkstemp creates 0600 files and os.replace keeps that: use the mode an in-place
+    # write would leave (the existing file's, else 0666 minus the umask)
+    if os.path.exists(path):
+        return os.stat(path).st_mode & 0o777
+    return 0o666 & ~_UMASK
+
+def _fsync_dir(directory: str):
+    # Makes the rename itself durable (not supported on Windows)
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_path(path: str):
+    """
+    Yields a temp path in the target's directory (same extension, so writers
+    that infer the format from it behave the same). When the block succeeds the
+    file is fsynced and renamed over `path`; on error it is removed.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp" + os.path.splitext(path)[1]
+    )
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, _file_mode(path))
+        yield tmp_path
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(directory)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_csv(df, path: str, **kwargs):
+    with atomic_path(path) as tmp_path:
+        df.to_csv(tmp_path, **kwargs)
+
+def write_json(obj, path: str, **kwargs):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, **kwargs)
+
+def write_text(text: str, path: str):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+def write_npz(path: str, compressed: bool = True, **arrays):
+    with atomic_path(path) as tmp_path:
+        (np.savez_compressed if compressed else np.savez)(tmp_path, **arrays)
+
+def append_lines(lines: list[str], path: str):
+    """Appends whole lines and fsyncs them (call under file_lock when several writers share the file)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+# === Locks ===
+
+def _try_lock(fd: int):
+    if os.name == "nt":
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+def _unlock(fd: int):
+    if os.name == "nt":
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+@contextmanager
+def file_lock(path: str, timeout: float | None = None):
+    """
+    Exclusive advisory lock on `path` (held on `<path>.lock`), across processes
+    and threads. Waits up to `timeout` seconds (forever if None), then raises TimeoutError.
+    """
+    lock_path = os.path.abspath(path + LOCK_SUFFIX)
+    key = (lock_path, threading.get_ident())
+    if key in _HELD_LOCKS:
+        _HELD_LOCKS[key] += 1
+        try:
+            yield
+        finally:
+            _HELD_LOCKS[key] -= 1
+        return
+
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            _try_lock(fd)
+            break
+        except OSError:
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                raise TimeoutError(f"❌ {path} is locked by another run")
+            time.sleep(LOCK_POLL_SECONDS)
+
+    _HELD_LOCKS[key] = 1
+    try:
+        yield
+    finally:
+        _HELD_LOCKS[key] -= 1
+        if not _HELD_LOCKS[key]:
+            del _HELD_LOCKS[key]
+            _unlock(fd)
+            os.close(fd)
@@ -1,11 +1,14 @@
 import os
 import json
 import pandas as pd
-from ta.trend import SMAIndicator
-from ta.momentum import RSIIndicator
+from datetime import datetime, timedelta
 
-CACHE_DIR = "data/finviz/cache"
-OHLC_CACHE_DIR = "data/finviz/cache/ohlc"
+from config.settings import CACHE_ROOT
+from core.io.atomic import write_csv, write_text, append_lines, file_lock
+from core.utils.metrics import incr, timer
+
+CACHE_DIR = CACHE_ROOT
+OHLC_CACHE_DIR = os.path.join(CACHE_DIR, "ohlc")
 
 def ensure_cache_dir():
     if not os.path.exists(CACHE_DIR):
@@ -15,75 +18,190 @@ def ensure_ohlc_dir():
     if not os.path.exists(OHLC_CACHE_DIR):
         os.makedirs(OHLC_CACHE_DIR)
 
-def load_snapshot_cache():
+# === Snapshot store ===
+# snapshot.json holds the compacted snapshots, snapshot.journal.jsonl the partial
+# updates since (one line per ticker update). Every field carries its own
+# timestamp in `_updated` so it can expire on its own TTL.
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, "snapshot.json")
+SNAPSHOT_JOURNAL = os.path.join(CACHE_DIR, "snapshot.journal.jsonl")
+COMPACT_AFTER = 500  # journal lines
+
+# Staleness tiers: how long each snapshot field stays fresh
+SNAPSHOT_TTLS = {
+    "earnings_date": timedelta(days=3),
+    "market_cap": timedelta(days=7),
+    "sector": timedelta(days=180),
+    "industry": timedelta(days=180),
+}
+
+def _dump_compact(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=str)
+
+def load_snapshot_cache() -> dict:
+    """Snapshots by ticker: the compacted file with the journal replayed on top."""
     ensure_cache_dir()
-
-    cache_path = os.path.join(CACHE_DIR, "snapshot.json")
-
-    if os.path.exists(cache_path):
-        with open(cache_path, "r") as f:
-            return json.load(f)
-    return {}
+    incr("cache.snapshot.load")
+    cache = {}
+    if os.path.exists(SNAPSHOT_FILE):
+        with open(SNAPSHOT_FILE, "r") as f:
+            cache = json.load(f)
+
+    if os.path.exists(SNAPSHOT_JOURNAL):
+        with open(SNAPSHOT_JOURNAL, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print("⚠️ Skipping a torn snapshot journal line")
+                    continue
+                record = cache.setdefault(entry["ticker"], {})
+                record.update(entry["fields"])
+                record.setdefault("_updated", {}).update({k: entry["updated"] for k in entry["fields"]})
+    return cache
 
 def save_snapshot_cache(cache: dict):
+    """Writes all snapshots as one compact file and clears the journal."""
     ensure_cache_dir()
-
-    cache_path = os.path.join(CACHE_DIR, "snapshot.json")
-
-    with open(cache_path, "w") as f:
-        json.dump(cache, f, indent=2, default=str)
-    print(f"📦 Snapshot cache saved to {cache_path} ({len(cache)} tickers)")
+    with file_lock(SNAPSHOT_FILE):
+        write_text(_dump_compact(cache), SNAPSHOT_FILE)
+        if os.path.exists(SNAPSHOT_JOURNAL):
+            os.remove(SNAPSHOT_JOURNAL)
+    print(f"📦 Snapshot cache saved to {SNAPSHOT_FILE} ({len(cache)} tickers)")
+
+def update_snapshots(updates: dict, now: datetime | None = None) -> int:
+    """
+    Partial update: appends {ticker: {field: value}} to the journal, stamping each
+    field, without rewriting the other tickers. Compacts once the journal is long.
+    Returns the number of tickers written.
+    """
+    ensure_cache_dir()
+    updated = (now or datetime.now()).isoformat(timespec="seconds")
+    lines = [_dump_compact({"ticker": ticker, "fields": fields, "updated": updated}) + "\n" for ticker, fields in updates.items()]
+    # One lock for appends and compaction: no update is lost between replay and truncation
+    with file_lock(SNAPSHOT_FILE):
+        append_lines(lines, SNAPSHOT_JOURNAL)
+        with open(SNAPSHOT_JOURNAL, "r") as f:
+            journal_lines = sum(1 for _ in f)
+
+        if journal_lines >= COMPACT_AFTER:
+            save_snapshot_cache(load_snapshot_cache())
+    return len(updates)
+
+def stale_fields(record: dict, now: datetime | None = None, ttls: dict = SNAPSHOT_TTLS) -> list[str]:
+    """
+    Fields of a snapshot that are missing or past their TTL.
+    Fields without an `_updated` stamp (legacy snapshots) count as stale, and so
+    does an earnings date that has already passed.
+    """
+    now = now or datetime.now()
+    stamps = record.get("_updated", {})
+    stale = []
+    for field, ttl in ttls.items():
+        stamp = stamps.get(field)
+        if field not in record or stamp is None or now - datetime.fromisoformat(stamp) > ttl:
+            stale.append(field)
+        elif field == "earnings_date" and record[field] and str(record[field]) < now.date().isoformat():
+            stale.append(field)
+    return stale
+
+def find_stale_snapshots(cache: dict, tickers, now: datetime | None = None, ttls: dict = SNAPSHOT_TTLS) -> dict:
+    """{ticker: stale fields} for the tickers that are missing or need a refresh."""
+    stale = {}
+    for ticker in tickers:
+        fields = stale_fields(cache.get(ticker, {}), now, ttls)
+        if fields:
+            stale[ticker] = fields
+    return stale
+
+def refresh_snapshots(tickers, fetch, cache: dict | None = None, ttls: dict = SNAPSHOT_TTLS):
+    """
+    Batch-refreshes the tickers whose snapshots are missing or stale.
+
+    Parameters:
+        tickers: tickers the caller needs
+        fetch: batch fetcher, (tickers, fields=...) -> {ticker: snapshot fields}
+            (e.g. core.yahoo_client.get_bulk_snapshots)
+        cache: loaded snapshots (loaded here if None); updated in place
+
+    Returns:
+        The (updated) snapshot cache.
+    """
+    cache = load_snapshot_cache() if cache is None else cache
+    stale = find_stale_snapshots(cache, tickers, ttls=ttls)
+    if not stale:
+        return cache
+
+    print(f"🔄 Refreshing {len(stale)} stale snapshots")
+    fetched = fetch(list(stale), fields=sorted({f for fields in stale.values() for f in fields}))
+    # Only the stale fields are written; fresh ones keep their timestamps
+    updates = {t: {k: v for k, v in fields.items() if k in stale[t]} for t, fields in fetched.items()}
+    updates = {t: fields for t, fields in updates.items() if fields}
+    update_snapshots(updates)
+    now = datetime.now().isoformat(timespec="seconds")
+    for ticker, fields in updates.items():
+        record = cache.setdefault(ticker, {})
+        record.update(fields)
+        record.setdefault("_updated", {}).update({k: now for k in fields})
+    return cache
 
 def get_ohlc_cache_path(ticker: str) -> str:
     ensure_ohlc_dir()
     return os.path.join(OHLC_CACHE_DIR, f"{ticker.upper()}.csv")
 
-from ta.trend import SMAIndicator
-from ta.momentum import RSIIndicator
+# Raw daily bars as fetched (fetched_on = day Yahoo returned them, i.e. their split basis).
+# Indicators live in the indicator store, split-adjusted views in corporate_actions.py.
+OHLC_COLUMNS = ["date", "open", "high", "low", "close", "volume", "fetched_on"]
+
+# Parsed bars memoized by file mtime, shared by every entry point in the process
+_OHLC_CACHE = {}
+
+def backfill_fetched_on(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Legacy bars (cached before `fetched_on` was recorded) were fetched already
+    split-adjusted as of their fetch day, which is on or after the last legacy bar,
+    so that date stands in for it. The next save persists the backfilled value.
+    """
+    if "fetched_on" not in df.columns:
+        df = df.assign(fetched_on=pd.NaT)
+    fetched = pd.to_datetime(df["fetched_on"]).dt.date
+    legacy = fetched.isna()
+    if legacy.any():
+        fetched = fetched.where(~legacy, max(df.loc[legacy, "date"]))
+    return df.assign(fetched_on=fetched)
 
 def load_ohlc_cache(ticker: str) -> pd.DataFrame:
     path = get_ohlc_cache_path(ticker)
 
     if os.path.exists(path):
-        df = pd.read_csv(path, parse_dates=["date"])
-        df["date"] = df["date"].dt.date
-
-        if not df.empty:
-            df = df.sort_values("date")
-
-            # Add missing indicators
-            updated = False
-
-            if "sma_20" not in df.columns:
-                df["sma_20"] = SMAIndicator(close=df["close"], window=20).sma_indicator()
-                updated = True
-            if "rsi_14" not in df.columns:
-                df["rsi_14"] = RSIIndicator(close=df["close"], window=14).rsi()
-                updated = True
+        mtime = os.path.getmtime(path)
+        cached = _OHLC_CACHE.get(path)
+        if cached and cached[0] == mtime:
+            incr("cache.ohlc.hit")
+            return cached[1].copy()
 
-            # Add shifted values
-            if "price_prev" not in df.columns:
-                df["price_prev"] = df["close"].shift(1)
-                updated = True
-            if "sma_20_prev" not in df.columns:
-                df["sma_20_prev"] = df["sma_20"].shift(1)
-                updated = True
+        incr("cache.ohlc.miss")
+        with timer("cache.ohlc.load"):
+            df = pd.read_csv(path, parse_dates=["date"])
+            df["date"] = df["date"].dt.date
+            df = df[[col for col in OHLC_COLUMNS if col in df.columns]]
 
-            if updated:
-                save_ohlc_cache(ticker, df)
+            if not df.empty:
+                df = backfill_fetched_on(df.sort_values("date"))
 
-        return df
+        _OHLC_CACHE[path] = (mtime, df)
+        return df.copy()
 
     # If file doesn't exist, return empty with proper structure
-    return pd.DataFrame(columns=[
-        "date", "open", "high", "low", "close", "volume",
-        "price", "sma_20", "rsi_14", "price_prev", "sma_20_prev"
-    ])
+    return pd.DataFrame(columns=OHLC_COLUMNS)
 
 
 def save_ohlc_cache(ticker: str, df: pd.DataFrame):
     path = get_ohlc_cache_path(ticker)
+    df = df[[col for col in OHLC_COLUMNS if col in df.columns]]
     df = df.drop_duplicates(subset="date")
     df = df.sort_values("date")
-    df.to_csv(path, index=False)
+    write_csv(df, path, index=False)
+    _OHLC_CACHE.pop(path, None)
     print(f"📦 OHLC cache saved: {ticker} ({len(df)} days)")
\ No newline at end of file
@@ -0,0 +1,224 @@
+import os
+import time
+import random
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+
+from config.settings import DATA_ROOT
+from core.io.atomic import write_csv, file_lock
+from core.io.cache import CACHE_DIR, get_ohlc_cache_path, load_ohlc_cache, backfill_fetched_on
+
+CORPORATE_ACTIONS_FILE = os.path.join(CACHE_DIR, "corporate_actions.csv")
+ACTION_COLUMNS = ["ticker", "date", "action", "value"]
+FIXTURE_ACTIONS_FILE = os.path.join(DATA_ROOT, "fixtures", "corporate_actions.csv")
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+# Corporate actions table (memoized by file mtime) and adjusted OHLC views
+_ACTIONS_CACHE = {}
+_ADJUSTED_CACHE = {}
+
+# === Storage ===
+
+def load_corporate_actions(path: str = CORPORATE_ACTIONS_FILE) -> pd.DataFrame:
+    """
+    All known corporate actions: one row per (ticker, date, action).
+    - action "split": value = new shares per old share (4.0 for a 4:1 split, 0.1 for a 1:10 reverse split)
+    - action "dividend": value = cash amount per share
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=ACTION_COLUMNS)
+
+    mtime = os.path.getmtime(path)
+    cached = _ACTIONS_CACHE.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    actions = pd.read_csv(path, parse_dates=["date"])
+    actions["date"] = actions["date"].dt.date
+    _ACTIONS_CACHE[path] = (mtime, actions)
+    return actions
+
+def save_corporate_actions(actions: pd.DataFrame, path: str = CORPORATE_ACTIONS_FILE):
+    actions = actions.drop_duplicates(subset=["ticker", "date", "action"], keep="last")
+    actions = actions.sort_values(["ticker", "date"])
+    write_csv(actions[ACTION_COLUMNS], path, index=False)
+    print(f"📦 Corporate actions saved: {len(actions)} rows")
+
+def record_corporate_actions(new_actions: pd.DataFrame, path: str = CORPORATE_ACTIONS_FILE) -> int:
+    """Merges new actions into the table. Returns how many were not known yet."""
+    if new_actions.empty:
+        return 0
+    with file_lock(path):
+        actions = load_corporate_actions(path)
+        known = set(zip(actions["ticker"], actions["date"], actions["action"]))
+        fresh = [key not in known for key in zip(new_actions["ticker"], new_actions["date"], new_actions["action"])]
+        if any(fresh):
+            save_corporate_actions(pd.concat([actions, new_actions[ACTION_COLUMNS]], ignore_index=True), path)
+    return int(sum(fresh))
+
+def get_ticker_actions(ticker: str, action: str, path: str = CORPORATE_ACTIONS_FILE) -> pd.DataFrame:
+    actions = load_corporate_actions(path)
+    rows = actions[(actions["ticker"] == ticker.upper()) & (actions["action"] == action)]
+    return rows.sort_values("date")
+
+def actions_signature(ticker: str, path: str = CORPORATE_ACTIONS_FILE) -> str:
+    """Short fingerprint of a ticker's actions (changes whenever one is added or revised)."""
+    actions = load_corporate_actions(path)
+    rows = actions[actions["ticker"] == ticker.upper()].sort_values(["date", "action"])
+    return ";".join(f"{d}:{a}:{v:g}" for d, a, v in zip(rows["date"], rows["action"], rows["value"]))
+
+# === Providers ===
+
+def actions_from_history(ticker: str, history: pd.DataFrame) -> pd.DataFrame:
+    """Extracts split / dividend rows from a yahooquery history frame (0 = no event)."""
+    frames = []
+    for column, action in (("splits", "split"), ("dividends", "dividend")):
+        if column in history.columns:
+            events = history[history[column].fillna(0) != 0]
+            frames.append(pd.DataFrame({
+                "ticker": ticker.upper(),
+                "date": pd.to_datetime(events["date"]).dt.date.to_numpy(),
+                "action": action,
+                "value": events[column].astype(float).to_numpy(),
+            }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ACTION_COLUMNS)
+
+def fetch_yahoo_actions(tickers: list[str], start_date, end_date) -> pd.DataFrame:
+    """Splits and dividends from Yahoo Finance history, in batches."""
+    from yahooquery import Ticker
+
+    batch_size = 40
+    frames = []
+    for i in range(0, len(tickers), batch_size):
+        batch = tickers[i:i + batch_size]
+        try:
+            hist = Ticker(batch).history(start=str(start_date), end=str(end_date + timedelta(days=1)), interval="1d")
+            if isinstance(hist, pd.DataFrame) and not hist.empty:
+                hist = hist.reset_index()
+                for ticker in batch:
+                    frames.append(actions_from_history(ticker, hist[hist["symbol"] == ticker]))
+        except Exception as e:
+            print(f"❌ Error fetching corporate actions for batch: {e}")
+        time.sleep(random.uniform(0.8, 2.5))
+
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ACTION_COLUMNS)
+
+def fixture_actions(tickers: list[str], start_date, end_date, path: str = FIXTURE_ACTIONS_FILE) -> pd.DataFrame:
+    """Local provider: actions from a CSV with the same columns (offline runs and checks)."""
+    actions = pd.read_csv(path, parse_dates=["date"])
+    actions["date"] = actions["date"].dt.date
+    wanted = {t.upper() for t in tickers}
+    mask = actions["ticker"].isin(wanted) & (actions["date"] >= start_date) & (actions["date"] <= end_date)
+    return actions.loc[mask, ACTION_COLUMNS].reset_index(drop=True)
+
+ACTION_PROVIDERS = {
+    "yahoo": fetch_yahoo_actions,
+    "fixture": fixture_actions,
+}
+
+def refresh_corporate_actions(tickers: list[str], start_date, end_date=None, provider: str = "yahoo") -> int:
+    """Fetches actions for `tickers` from a provider and records them. Returns the number of new actions."""
+    end_date = end_date or date.today()
+    new_actions = ACTION_PROVIDERS[provider](list(tickers), start_date, end_date)
+    added = record_corporate_actions(new_actions)
+    print(f"🏢 Corporate actions: {added} new ({provider})")
+    return added
+
+# === Adjustment ===
+
+def split_factors(ticker: str, cutoffs: np.ndarray) -> np.ndarray:
+    """
+    Product of the split ratios with an ex-date after each cutoff date
+    (the factor that brings a price quoted on that basis to today's share count).
+    """
+    splits = get_ticker_actions(ticker, "split")
+    if splits.empty:
+        return np.ones(len(cutoffs))
+    split_dates = pd.to_datetime(splits["date"]).to_numpy(dtype="datetime64[D]")
+    # suffix[k] = product of ratios k..end
+    suffix = np.append(np.cumprod(splits["value"].to_numpy(dtype=np.float64)[::-1])[::-1], 1.0)
+    return suffix[np.searchsorted(split_dates, cutoffs, side="right")]
+
+def adjust_ohlc(ticker: str, ohlc: pd.DataFrame, dividends: bool = False) -> pd.DataFrame:
+    """
+    Brings cached bars to the current share basis (vectorized).
+    A bar is already adjusted for splits up to the day it was fetched (`fetched_on`;
+    legacy bars without it use the last legacy bar date, see backfill_fetched_on),
+    so only splits after max(date, fetched_on) apply.
+    With dividends=True prices are also back-adjusted for cash dividends (total return basis).
+    """
+    if ohlc.empty:
+        return ohlc
+
+    ohlc = backfill_fetched_on(ohlc)
+    dates = pd.to_datetime(ohlc["date"]).to_numpy(dtype="datetime64[D]")
+    fetched = pd.to_datetime(ohlc["fetched_on"]).to_numpy(dtype="datetime64[D]")
+    cutoffs = np.maximum(dates, fetched)
+
+    factors = split_factors(ticker, cutoffs)
+    if (factors != 1).any():
+        ohlc[PRICE_COLUMNS] = ohlc[PRICE_COLUMNS].to_numpy(dtype=np.float64) / factors[:, None]
+        ohlc["volume"] = ohlc["volume"].to_numpy(dtype=np.float64) * factors
+
+    if dividends:
+        divs = get_ticker_actions(ticker, "dividend")
+        if not divs.empty:
+            div_dates = pd.to_datetime(divs["date"]).to_numpy(dtype="datetime64[D]")
+            prev = np.searchsorted(dates, div_dates, side="left") - 1  # last bar before the ex-date
+            valid = prev >= 0
+            closes = ohlc["close"].to_numpy(dtype=np.float64)
+            multipliers = np.ones(len(div_dates))
+            multipliers[valid] = 1 - divs["value"].to_numpy(dtype=np.float64)[valid] / closes[prev[valid]]
+            suffix = np.append(np.cumprod(multipliers[::-1])[::-1], 1.0)
+            div_factors = suffix[np.searchsorted(div_dates, dates, side="right")]
+            ohlc[PRICE_COLUMNS] = ohlc[PRICE_COLUMNS].to_numpy(dtype=np.float64) * div_factors[:, None]
+    return ohlc
+
+def load_adjusted_ohlc(ticker: str, dividends: bool = False) -> pd.DataFrame:
+    """
+    Split-adjusted OHLC of a ticker, computed at read time and memoized until
+    the OHLC cache or the corporate actions table changes.
+    """
+    path = get_ohlc_cache_path(ticker)
+    ohlc_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    actions_mtime = os.path.getmtime(CORPORATE_ACTIONS_FILE) if os.path.exists(CORPORATE_ACTIONS_FILE) else None
+    key = (ticker, dividends)
+
+    cached = _ADJUSTED_CACHE.get(key)
+    if cached and cached[:2] == (ohlc_mtime, actions_mtime):
+        return cached[2]
+
+    adjusted = adjust_ohlc(ticker, load_ohlc_cache(ticker), dividends=dividends)
+    _ADJUSTED_CACHE[key] = (ohlc_mtime, actions_mtime, adjusted)
+    return adjusted
+
+def clear_adjusted_cache():
+    _ADJUSTED_CACHE.clear()
+
+def adjust_trade_prices(df: pd.DataFrame, price_col: str = "price", date_col: str = "transaction_date") -> pd.DataFrame:
+    """
+    Puts insider prices (as filed, i.e. on the share basis of the trade date)
+    on the same basis as the adjusted OHLC: divided by every later split ratio,
+    shares multiplied. The filed price is kept in `price_raw`.
+    """
+    df = df.copy()
+    if "price_raw" not in df.columns:
+        df["price_raw"] = df[price_col]
+
+    dates = pd.to_datetime(df[date_col]).to_numpy(dtype="datetime64[D]")
+    factors = np.ones(len(df))
+    tickers = df["ticker"].to_numpy()
+    for ticker in pd.unique(tickers):
+        rows = np.flatnonzero(tickers == ticker)
+        factors[rows] = split_factors(ticker, dates[rows])
+
+    adjusted = factors != 1
+    if adjusted.any():
+        raw = pd.to_numeric(df["price_raw"], errors="coerce").to_numpy(dtype=np.float64)
+        df[price_col] = np.where(adjusted, raw / factors, df[price_col])
+        if "shares" in df.columns:
+            df["shares"] = np.where(adjusted, pd.to_numeric(df["shares"], errors="coerce") * factors, df["shares"])
+        print(f"🔧 Split-adjusted {int(adjusted.sum())} insider prices")
+    return df
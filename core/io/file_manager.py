@@ -1,11 +1,28 @@
 import os
 import pandas as pd
-import ast
 from datetime import datetime
 
-RAW_DATA_DIR = "data/raw"
-DAILY_DATA_DIR = "data/daily_feed"
-FINVIZ_DATA_DIR = "data/finviz"
+from config.settings import DATA_ROOT
+from core.engine.tag_registry import pack_tag_columns, unpack_tag_columns
+from core.io.atomic import write_csv, file_lock
+
+RAW_DATA_DIR = os.path.join(DATA_ROOT, "raw")
+DAILY_DATA_DIR = os.path.join(DATA_ROOT, "daily_feed")
+FINVIZ_DATA_DIR = os.path.join(DATA_ROOT, "finviz")
+
+# One trade (after same-day grouping) across every finviz table
+TRADE_KEY = ["ticker", "insider_name", "transaction_date", "transaction_type"]
+
+def trade_keys(df: pd.DataFrame, key: list[str] = TRADE_KEY) -> pd.Series:
+    """One string key per row ("TICKER|insider|YYYY-MM-DD|type"), robust to padding and date formats."""
+    parts = []
+    for col in key:
+        values = df[col].astype(str).str.strip()
+        if col == "transaction_date":
+            dates = pd.to_datetime(values, errors="coerce")
+            values = dates.dt.strftime("%Y-%m-%d").where(dates.notna(), values)
+        parts.append(values)
+    return pd.Series(["|".join(p) for p in zip(*parts)], index=df.index, dtype=object)
 
 def ensure_raw_data_dir():
     if not os.path.exists(RAW_DATA_DIR):
@@ -30,20 +47,21 @@ def save_trades_to_csv(ticker: str, trades: list[dict]):
     new_df = pd.DataFrame(trades)
     new_df["filing_date"] = pd.to_datetime(new_df["filing_date"])
 
-    if os.path.exists(file_path):
-        existing_df = pd.read_csv(file_path, parse_dates=["filing_date"])
-        combined = pd.concat([existing_df, new_df], ignore_index=True)
-        combined.drop_duplicates(
-            subset=["insider_name", "title", "filing_date", "shares", "price", "code"],
-            keep="last",
-            inplace=True
-        )
-        combined["filing_date"] = pd.to_datetime(combined["filing_date"])
-        combined.sort_values(by="filing_date", ascending=False, inplace=True)
-        combined.to_csv(file_path, index=False)
-    else:
-        new_df.sort_values(by="filing_date", ascending=False, inplace=True)
-        new_df.to_csv(file_path, index=False)
+    with file_lock(file_path):
+        if os.path.exists(file_path):
+            existing_df = pd.read_csv(file_path, parse_dates=["filing_date"])
+            combined = pd.concat([existing_df, new_df], ignore_index=True)
+            combined.drop_duplicates(
+                subset=["insider_name", "title", "filing_date", "shares", "price", "code"],
+                keep="last",
+                inplace=True
+            )
+            combined["filing_date"] = pd.to_datetime(combined["filing_date"])
+            combined.sort_values(by="filing_date", ascending=False, inplace=True)
+            write_csv(combined, file_path, index=False)
+        else:
+            new_df.sort_values(by="filing_date", ascending=False, inplace=True)
+            write_csv(new_df, file_path, index=False)
 
 def save_daily_trades_to_csv(trades: list[dict], date: datetime):
     """
@@ -56,20 +74,21 @@ def save_daily_trades_to_csv(trades: list[dict], date: datetime):
 
     new_df = pd.DataFrame(trades)
 
-    if os.path.exists(file_path):
-        existing_df = pd.read_csv(file_path)
-        combined = pd.concat([existing_df, new_df], ignore_index=True)
-        combined.drop_duplicates(
-            subset=["insider_name", "title", "filing_date", "shares", "price", "code", "filing_url"],
-            keep="last",
-            inplace=True
-        )
-        combined["filing_date"] = pd.to_datetime(combined["filing_date"])
-        combined.sort_values(by="filing_date", ascending=False, inplace=True)
-        combined.to_csv(file_path, index=False)
-    else:
-        new_df.sort_values(by="filing_date", ascending=False, inplace=True)
-        new_df.to_csv(file_path, index=False)
+    with file_lock(file_path):
+        if os.path.exists(file_path):
+            existing_df = pd.read_csv(file_path)
+            combined = pd.concat([existing_df, new_df], ignore_index=True)
+            combined.drop_duplicates(
+                subset=["insider_name", "title", "filing_date", "shares", "price", "code", "filing_url"],
+                keep="last",
+                inplace=True
+            )
+            combined["filing_date"] = pd.to_datetime(combined["filing_date"])
+            combined.sort_values(by="filing_date", ascending=False, inplace=True)
+            write_csv(combined, file_path, index=False)
+        else:
+            new_df.sort_values(by="filing_date", ascending=False, inplace=True)
+            write_csv(new_df, file_path, index=False)
 
     print(f"✅ Saved {len(trades)} new trades to {file_path}")
 
@@ -97,33 +116,41 @@ def get_latest_filing_date(ticker: str) -> datetime | None:
 
     return df["filing_date"].max()
 
-def save_finviz_trades_to_csv(new_trades: pd.DataFrame):
+def save_finviz_trades_to_csv(new_trades: pd.DataFrame, intraday: bool = False):
+    """
+    Saves a Finviz scan to its daily file and merges it into the master file.
+    With intraday=True the daily file name carries the scan time, so every
+    scan of the day is kept instead of the last one overwriting the others.
+    """
     ensure_finviz_dir()
 
     today_str = datetime.today().strftime("%Y-%m-%d")
+    if intraday:
+        today_str += datetime.now().strftime("_%H-%M-%S")
     daily_file = os.path.join(FINVIZ_DATA_DIR, f"{today_str}_finviz.csv")
     master_file = os.path.join(FINVIZ_DATA_DIR, "finviz_all_trades.csv")
 
     # Save today's file
-    new_trades.to_csv(daily_file, index=False)
+    write_csv(new_trades, daily_file, index=False)
 
-    # Merge with existing master file
-    if os.path.exists(master_file):
-        existing = pd.read_csv(master_file, parse_dates=["transaction_date"])
-        combined = pd.concat([existing, new_trades], ignore_index=True)
-    else:
-        combined = new_trades.copy()
+    with file_lock(master_file):
+        # Merge with existing master file
+        if os.path.exists(master_file):
+            existing = pd.read_csv(master_file, parse_dates=["transaction_date"])
+            combined = pd.concat([existing, new_trades], ignore_index=True)
+        else:
+            combined = new_trades.copy()
 
-    combined.drop_duplicates(
-        subset=["ticker", "insider_name", "relationship", "transaction_date", "transaction_type", "price", "shares", "sec_form4"],
-        inplace=True
-    )
+        combined.drop_duplicates(
+            subset=["ticker", "insider_name", "relationship", "transaction_date", "transaction_type", "price", "shares", "sec_form4"],
+            inplace=True
+        )
 
-    # Sort by date descending
-    combined.sort_values(by="transaction_date", ascending=False, inplace=True)
+        # Sort by date descending
+        combined.sort_values(by="transaction_date", ascending=False, inplace=True)
 
-    # Save updated master file
-    combined.to_csv(master_file, index=False)
+        # Save updated master file
+        write_csv(combined, master_file, index=False)
 
 def load_latest_tagged_trades(filename: str = "finviz_tagged.csv") -> pd.DataFrame:
     """
@@ -134,7 +161,7 @@ def load_latest_tagged_trades(filename: str = "finviz_tagged.csv") -> pd.DataFra
     if not os.path.exists(path):
         raise FileNotFoundError(f"❌ Tagged trades file not found: {path}")
     
-    df = pd.read_csv(path)
+    df = unpack_tag_columns(pd.read_csv(path))
 
     print(f"📥 Loaded {len(df)} tagged trades from {filename}")
     return df
@@ -148,7 +175,7 @@ def load_scored_with_tags_trades(filename: str = "scores_with_tags.csv") -> pd.D
     if not os.path.exists(path):
         raise FileNotFoundError(f"❌ Scores file not found: {path}")
     
-    df = pd.read_csv(path)
+    df = unpack_tag_columns(pd.read_csv(path))
 
     print(f"📥 Loaded {len(df)} scored trades from {filename}")
     return df
@@ -162,7 +189,7 @@ def load_scored_trades(filename: str = "scores.csv") -> pd.DataFrame:
     if not os.path.exists(path):
         raise FileNotFoundError(f"❌ Scores file not found: {path}")
     
-    df = pd.read_csv(path)
+    df = unpack_tag_columns(pd.read_csv(path))
 
     print(f"📥 Loaded {len(df)} scored trades from {filename}")
     return df
@@ -180,6 +207,12 @@ def load_finviz_all_trades(filename: str = "finviz_all_trades.csv") -> pd.DataFr
     print(f"📥 Loaded {len(df)} trades from {filename}")
     return df
 
+def save_tagged_trades(df: pd.DataFrame, path: str):
+    """
+    Saves tagged trades with tag lists stored as compact uint64 bitmask columns.
+    """
+    write_csv(pack_tag_columns(df), path, index=False)
+
 def save_scores(df: pd.DataFrame, filename: str):
     """
     Saves all trades into a .csv file
@@ -188,5 +221,19 @@ def save_scores(df: pd.DataFrame, filename: str):
 
     scores_file = os.path.join(FINVIZ_DATA_DIR, filename)
 
-    df.to_csv(scores_file, index=False)
-    print(f"✅ Saved scored file to {scores_file}")
\ No newline at end of file
+    save_tagged_trades(df, scores_file)
+    print(f"✅ Saved scored file to {scores_file}")
+
+def load_dropped_trades(filename: str = "finviz_dropped.csv") -> pd.DataFrame:
+    """
+    Loads the trades the prefilter and edge-case filters dropped (key columns + value),
+    so incremental tagging does not re-process them every run.
+    """
+    path = os.path.join(FINVIZ_DATA_DIR, filename)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=TRADE_KEY + ["value"])
+    return pd.read_csv(path)
+
+def save_dropped_trades(df: pd.DataFrame, filename: str = "finviz_dropped.csv"):
+    ensure_finviz_dir()
+    write_csv(df[TRADE_KEY + ["value"]], os.path.join(FINVIZ_DATA_DIR, filename), index=False)
@@ -0,0 +1,262 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from core.io.atomic import write_csv, write_json, append_lines, file_lock
+from core.io.cache import CACHE_DIR, OHLC_CACHE_DIR, get_ohlc_cache_path
+from core.io.corporate_actions import load_adjusted_ohlc, actions_signature
+from core.engine.indicators import INDICATOR_COLUMNS, INDICATOR_VERSION, compute_indicators, indicator_state, append_bars
+
+INDICATOR_CACHE_DIR = os.path.join(CACHE_DIR, "indicators")
+
+# In-process indicator tables: ticker -> ((OHLC mtime, actions signature), table)
+_TABLE_CACHE = {}
+
+def ensure_indicator_dir():
+    if not os.path.exists(INDICATOR_CACHE_DIR):
+        os.makedirs(INDICATOR_CACHE_DIR)
+
+def get_indicator_cache_path(ticker: str) -> str:
+    ensure_indicator_dir()
+    return os.path.join(INDICATOR_CACHE_DIR, f"{ticker.upper()}.csv")
+
+def _ohlc_mtime(ticker: str) -> float | None:
+    path = get_ohlc_cache_path(ticker)
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def _source_key(ticker: str) -> tuple:
+    # Tables are computed on split-adjusted bars: new splits invalidate them too
+    return _ohlc_mtime(ticker), actions_signature(ticker)
+
+def _empty_table() -> pd.DataFrame:
+    table = pd.DataFrame({"date": np.array([], dtype="datetime64[D]"), "close": np.array([], dtype=np.float64)})
+    for col in INDICATOR_COLUMNS:
+        table[col] = np.array([], dtype=np.float64)
+    return table
+
+def get_indicator_state_path(ticker: str) -> str:
+    ensure_indicator_dir()
+    return os.path.join(INDICATOR_CACHE_DIR, f"{ticker.upper()}.state.json")
+
+def _read_indicator_table(ticker: str) -> pd.DataFrame | None:
+    path = get_indicator_cache_path(ticker)
+    if not os.path.exists(path):
+        return None
+    table = pd.read_csv(path)
+    if not set(INDICATOR_COLUMNS).issubset(table.columns):
+        return None
+    table["date"] = pd.to_datetime(table["date"]).to_numpy(dtype="datetime64[D]")
+    # An append repeated after a crash leaves the same dates twice: the last copy wins
+    return table.drop_duplicates(subset="date", keep="last").reset_index(drop=True)
+
+def load_indicator_state(ticker: str) -> dict | None:
+    path = get_indicator_state_path(ticker)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_indicator_state(ticker: str, state: dict, last_date):
+    # The state is only valid for a table ending at `last_date`, on the current split basis
+    write_json({
+        "last_date": str(last_date),
+        "actions": actions_signature(ticker),
+        "version": INDICATOR_VERSION,
+        "indicators": state,
+    }, get_indicator_state_path(ticker))
+
+def save_indicator_table(ticker: str, table: pd.DataFrame, state: dict):
+    write_csv(table, get_indicator_cache_path(ticker), index=False)
+    save_indicator_state(ticker, state, table["date"].iloc[-1])
+
+def append_indicator_rows(ticker: str, rows: pd.DataFrame, state: dict):
+    """
+    Appends new rows to the stored table (no rewrite of the existing history).
+    The state goes first: after a crash in between, the table ends before the
+    state's last_date and is rebuilt (see _matches_state) instead of re-appended.
+    """
+    path = get_indicator_cache_path(ticker)
+    with file_lock(path):
+        save_indicator_state(ticker, state, rows["date"].iloc[-1])
+        append_lines([rows.to_csv(header=False, index=False, lineterminator="\n")], path)
+
+def _matches_state(table: pd.DataFrame | None, stored: dict | None) -> bool:
+    """True when a stored table ends exactly where its rolling state does."""
+    return (
+        table is not None and not table.empty and stored is not None
+        and stored["last_date"] == str(table["date"].iloc[-1])
+    )
+
+def build_indicator_table(ticker: str, ohlc: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Computes all indicators for a ticker's whole OHLC series and stores the table and rolling state."""
+    ohlc = load_adjusted_ohlc(ticker) if ohlc is None else ohlc
+    if ohlc.empty:
+        return _empty_table()
+    table = compute_indicators(ohlc)
+    save_indicator_table(ticker, table, indicator_state(ohlc))
+    return table
+
+def get_indicator_table(ticker: str) -> pd.DataFrame:
+    """
+    Indicator table of a ticker (date, close, one column per indicator), sorted by date.
+    Rebuilt only when the OHLC cache file is newer than the stored table, the
+    ticker's corporate actions changed or the indicator definitions did; kept in memory afterwards.
+    """
+    key = _source_key(ticker)
+    if key[0] is None:
+        return _empty_table()
+
+    cached = _TABLE_CACHE.get(ticker)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    path = get_indicator_cache_path(ticker)
+    stored = load_indicator_state(ticker)
+    table = None
+    if (
+        os.path.exists(path) and os.path.getmtime(path) >= key[0]
+        and stored and stored.get("actions") == key[1] and stored.get("version") == INDICATOR_VERSION
+    ):
+        table = _read_indicator_table(ticker)
+    if not _matches_state(table, stored):
+        table = build_indicator_table(ticker)
+
+    _TABLE_CACHE[ticker] = (key, table)
+    return table
+
+def _is_prefix(table: pd.DataFrame, ohlc: pd.DataFrame) -> bool:
+    """True when the OHLC bars up to the table's last date are exactly the bars the table was built from."""
+    dates = pd.to_datetime(ohlc["date"]).to_numpy(dtype="datetime64[D]")
+    known = dates <= table["date"].iloc[-1]
+    return (
+        known.sum() == len(table)
+        and (dates[known] == table["date"].to_numpy()).all()
+        and np.allclose(ohlc["close"].to_numpy(dtype=np.float64)[known], table["close"].to_numpy(), equal_nan=True)
+    )
+
+def update_indicator_table(ticker: str, verify: bool = False) -> pd.DataFrame:
+    """
+    Brings the indicator table up to date with the OHLC cache after new bars arrive.
+    - bars appended after the table's last date: O(1) per bar from the rolling state
+    - anything else (backfilled history, revised closes, no table/state yet): full recompute
+
+    With verify=True the result is checked against a full recompute (which wins on mismatch).
+    """
+    ohlc = load_adjusted_ohlc(ticker)
+    if ohlc.empty:
+        return _empty_table()
+
+    stored = load_indicator_state(ticker)
+    cached = _TABLE_CACHE.get(ticker)
+    table = cached[1] if cached else None
+    if stored and (table is None or table.empty or stored["last_date"] != str(table["date"].iloc[-1])):
+        table = _read_indicator_table(ticker)
+
+    if (
+        not _matches_state(table, stored)
+        or stored.get("actions") != actions_signature(ticker)
+        or stored.get("version") != INDICATOR_VERSION
+        or not _is_prefix(table, ohlc)
+    ):
+        table = build_indicator_table(ticker, ohlc)
+    else:
+        new_bars = ohlc[pd.to_datetime(ohlc["date"]) > pd.Timestamp(table["date"].iloc[-1])]
+        if not new_bars.empty:
+            state = stored["indicators"]
+            n_old = len(table)
+            table = append_bars(table, state, new_bars)
+            append_indicator_rows(ticker, table.iloc[n_old:], state)
+            print(f"📈 Indicators updated: {ticker} (+{len(new_bars)} bars)")
+
+    if verify:
+        diffs = verify_indicator_table(ticker, table)
+        if diffs:
+            print(f"⚠️ Incremental indicators drifted for {ticker}: {diffs} – recomputing")
+            table = build_indicator_table(ticker, ohlc)
+
+    _TABLE_CACHE[ticker] = (_source_key(ticker), table)
+    return table
+
+def verify_indicator_table(ticker: str, table: pd.DataFrame | None = None, rtol: float = 1e-9, atol: float = 1e-9) -> dict:
+    """
+    Compares a (incrementally updated) indicator table with a full recompute.
+    Returns {column: max abs difference} for the columns that do not match.
+    """
+    table = get_indicator_table(ticker) if table is None else table
+    full = compute_indicators(load_adjusted_ohlc(ticker))
+    if len(full) != len(table):
+        return {"rows": abs(len(full) - len(table))}
+
+    diffs = {}
+    for col in INDICATOR_COLUMNS:
+        a, b = table[col].to_numpy(dtype=np.float64), full[col].to_numpy(dtype=np.float64)
+        if not np.allclose(a, b, rtol=rtol, atol=atol, equal_nan=True):
+            diffs[col] = float(np.nanmax(np.abs(a - b)))
+    return diffs
+
+def clear_indicator_cache():
+    _TABLE_CACHE.clear()
+
+def lookup(table: pd.DataFrame, dates, columns: list[str]) -> pd.DataFrame:
+    """
+    Indicator values on exact dates (binary search on the sorted table).
+    Dates not present in the table get NaN.
+    """
+    dates = pd.to_datetime(pd.Series(np.asarray(dates))).to_numpy(dtype="datetime64[D]")
+    out = pd.DataFrame(np.nan, index=range(len(dates)), columns=columns)
+    if table.empty or len(dates) == 0:
+        return out
+
+    table_dates = table["date"].to_numpy(dtype="datetime64[D]")
+    pos = np.searchsorted(table_dates, dates)
+    pos_clipped = np.minimum(pos, len(table_dates) - 1)
+    found = (pos < len(table_dates)) & (table_dates[pos_clipped] == dates)
+
+    for col in columns:
+        values = table[col].to_numpy(dtype=np.float64)
+        out[col] = np.where(found, values[pos_clipped], np.nan)
+    return out
+
+def lookup_trade_indicators(df: pd.DataFrame, columns: list[str], date_col: str = "transaction_date", dates=None) -> pd.DataFrame:
+    """
+    Indicator values for every trade row (one table load per ticker).
+
+    Parameters:
+        df: trades with a ticker column
+        columns: indicator table columns to fetch (e.g. ["atr_14", "atr_14_pct"])
+        date_col: column with the lookup date
+        dates: explicit lookup dates aligned with df (overrides date_col)
+
+    Returns:
+        DataFrame aligned with df.index, NaN where the ticker/date is not in the OHLC cache.
+    """
+    dates = pd.to_datetime(pd.Series(np.asarray(df[date_col] if dates is None else dates)))
+    values = np.full((len(df), len(columns)), np.nan)
+    tickers = df["ticker"].to_numpy()
+    for ticker in pd.unique(tickers):
+        rows = np.flatnonzero(tickers == ticker)
+        values[rows] = lookup(get_indicator_table(ticker), dates.iloc[rows], columns).to_numpy()
+    return pd.DataFrame(values, index=df.index, columns=columns)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-ticker technical indicator store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command in ("build", "update", "verify"):
+        sub.add_parser(command).add_argument("tickers", nargs="*", help="Default: every ticker in the OHLC cache")
+    args = parser.parse_args()
+
+    tickers = args.tickers or sorted(f[:-4] for f in os.listdir(OHLC_CACHE_DIR) if f.endswith(".csv"))
+    if args.command == "build":
+        for ticker in tickers:
+            build_indicator_table(ticker)
+        print(f"✅ Indicator tables built for {len(tickers)} tickers")
+    elif args.command == "update":
+        for ticker in tickers:
+            update_indicator_table(ticker)
+    else:
+        drifted = {t: d for t in tickers if (d := verify_indicator_table(t))}
+        for ticker, diffs in drifted.items():
+            print(f"⚠️ {ticker}: {diffs}")
+        print(f"✅ {len(tickers) - len(drifted)}/{len(tickers)} indicator tables match a full recompute")
@@ -0,0 +1,96 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import date
+from pandas.tseries.holiday import USFederalHolidayCalendar
+
+from core.io.atomic import write_csv
+from core.io.file_manager import FINVIZ_DATA_DIR, TRADE_KEY, trade_keys
+
+# One row per (trade, outcome window) that is not final yet, with the day it can be resolved
+PENDING_OUTCOMES_FILE = os.path.join(FINVIZ_DATA_DIR, "pending_outcomes.csv")
+PENDING_COLUMNS = TRADE_KEY + ["window", "due_date"]
+
+# Business days after the trade until a window is final, and the columns it fills.
+# get_window_stats reads up to min + 5 bars (min 5/10/21), so windows wait 10/15/26 bars;
+# final_gain_30d and case_2_outcome settle by the 30d window.
+OUTCOME_WINDOWS = {
+    "7d": (10, ["max_gain_7d", "max_drawdown_7d"]),
+    "14d": (15, ["max_gain_14d", "max_drawdown_14d"]),
+    "30d": (26, ["max_gain_30d", "max_drawdown_30d", "final_gain_30d", "case_2_outcome"]),
+}
+OUTCOME_HORIZON = max(bars for bars, _ in OUTCOME_WINDOWS.values())
+
+GIVE_UP_DAYS = 30  # calendar days past the due date after which missing bars are not coming
+
+_HOLIDAYS = USFederalHolidayCalendar().holidays(start="1990-01-01", end="2100-12-31").to_numpy(dtype="datetime64[D]")
+
+def due_dates(trade_dates, bars: int) -> np.ndarray:
+    """Trade date + `bars` US business days (same calendar as us_bd), vectorized."""
+    dates = pd.to_datetime(pd.Series(np.asarray(trade_dates))).to_numpy(dtype="datetime64[D]")
+    return np.busday_offset(dates, bars, roll="backward", holidays=_HOLIDAYS)
+
+def pending_outcomes(tagged: pd.DataFrame, today: date | None = None) -> pd.DataFrame:
+    """
+    Queue entries for tagged trades: one per window whose columns are still missing,
+    or that was computed (`tagged_on`) before its due date's bar existed.
+    Windows still missing GIVE_UP_DAYS after their due date are dropped.
+    """
+    if tagged.empty:
+        return pd.DataFrame(columns=PENDING_COLUMNS)
+
+    today = np.datetime64(today or date.today(), "D")
+    trade_dates = pd.to_datetime(tagged["transaction_date"]).to_numpy(dtype="datetime64[D]")
+    if "tagged_on" in tagged.columns:
+        tagged_on = pd.to_datetime(tagged["tagged_on"]).to_numpy(dtype="datetime64[D]")
+    else:
+        tagged_on = np.full(len(tagged), np.datetime64("NaT"), dtype="datetime64[D]")
+
+    keys = tagged[TRADE_KEY].assign(transaction_date=pd.Series(trade_dates, index=tagged.index).dt.strftime("%Y-%m-%d"))
+    frames = []
+    for window, (bars, columns) in OUTCOME_WINDOWS.items():
+        due = due_dates(trade_dates, bars)
+        missing = tagged[columns].isna().any(axis=1).to_numpy()
+        early = ~np.isnat(tagged_on) & (tagged_on <= due)
+        expired = due + np.timedelta64(GIVE_UP_DAYS, "D") < today
+        pending = early | (missing & ~expired)
+        frames.append(keys[pending].assign(window=window, due_date=due[pending]))
+
+    queue = pd.concat(frames, ignore_index=True)
+    queue["due_date"] = pd.to_datetime(queue["due_date"]).dt.date
+    return queue[PENDING_COLUMNS]
+
+def load_pending_outcomes(path: str = PENDING_OUTCOMES_FILE) -> pd.DataFrame | None:
+    """The saved queue, or None if it was never built."""
+    if not os.path.exists(path):
+        return None
+    queue = pd.read_csv(path)
+    # (to_datetime also types the column of an empty queue, which read_csv leaves as object)
+    queue["due_date"] = pd.to_datetime(queue["due_date"]).dt.date
+    return queue
+
+def save_pending_outcomes(queue: pd.DataFrame, path: str = PENDING_OUTCOMES_FILE):
+    queue = queue.sort_values(["due_date"] + TRADE_KEY)
+    write_csv(queue[PENDING_COLUMNS], path, index=False)
+    print(f"⏳ Pending outcomes: {len(queue)} windows for {trade_keys(queue).nunique()} trades")
+
+def get_pending_outcomes(tagged: pd.DataFrame, path: str = PENDING_OUTCOMES_FILE) -> pd.DataFrame:
+    """Loads the queue, seeding it from the tagged trades on first use."""
+    queue = load_pending_outcomes(path)
+    if queue is None:
+        queue = pending_outcomes(tagged)
+        save_pending_outcomes(queue, path)
+    return queue
+
+def due_trade_keys(queue: pd.DataFrame, today: date | None = None) -> set:
+    """Keys of trades with a window due before today (the due day's bar has closed)."""
+    today = today or date.today()
+    return set(trade_keys(queue[queue["due_date"] < today]))
+
+def advance_pending_outcomes(queue: pd.DataFrame, retagged: pd.DataFrame, touched: pd.DataFrame, today: date | None = None) -> pd.DataFrame:
+    """
+    Replaces the entries of every touched trade (re-tagged, dropped or removed)
+    with what is still pending for the re-tagged rows.
+    """
+    queue = queue[~trade_keys(queue).isin(set(trade_keys(touched)))]
+    return pd.concat([queue, pending_outcomes(retagged, today)], ignore_index=True)
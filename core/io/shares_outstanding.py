@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from core.io.atomic import write_csv, file_lock
+from core.io.cache import CACHE_DIR
+from core.io.corporate_actions import load_adjusted_ohlc, split_factors
+
+# One row per observed change of a ticker's share count (as reported on `date`)
+SHARES_FILE = os.path.join(CACHE_DIR, "shares_outstanding.csv")
+SHARES_COLUMNS = ["ticker", "date", "shares", "source"]
+
+# Series memoized by file mtime
+_SHARES_CACHE = {}
+
+def load_shares_series(path: str = SHARES_FILE) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=SHARES_COLUMNS)
+
+    mtime = os.path.getmtime(path)
+    cached = _SHARES_CACHE.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    series = pd.read_csv(path, parse_dates=["date"])
+    series["date"] = series["date"].dt.date
+    _SHARES_CACHE[path] = (mtime, series)
+    return series
+
+def compact_shares_series(series: pd.DataFrame) -> pd.DataFrame:
+    """Keeps only the points where a ticker's share count changes."""
+    series = series.dropna(subset=["shares"])
+    series = series[series["shares"] > 0]
+    series = series.drop_duplicates(subset=["ticker", "date"], keep="last").sort_values(["ticker", "date"])
+    changed = series["shares"].ne(series.groupby("ticker")["shares"].shift())
+    return series.loc[changed, SHARES_COLUMNS]
+
+def save_shares_series(series: pd.DataFrame, path: str = SHARES_FILE):
+    series = compact_shares_series(series)
+    write_csv(series, path, index=False)
+    print(f"📦 Shares outstanding saved: {len(series)} points, {series['ticker'].nunique()} tickers")
+
+def _point_keys(series: pd.DataFrame) -> set:
+    return set(zip(series["ticker"], series["date"], series["shares"].astype(np.float64)))
+
+def record_shares(points: pd.DataFrame, path: str = SHARES_FILE) -> int:
+    """
+    Merges new (ticker, date, shares, source) points into the series.
+    Returns how many points the compacted series gained; points that repeat the
+    previous count (dropped by the compaction) are not new, and then nothing is rewritten.
+    """
+    if points.empty:
+        return 0
+    with file_lock(path):
+        series = load_shares_series(path)
+        merged = compact_shares_series(pd.concat([series, points[SHARES_COLUMNS]], ignore_index=True))
+        known = _point_keys(series)
+        merged_keys = _point_keys(merged)
+        new = len(merged_keys - known)
+        if merged_keys != known:
+            save_shares_series(merged, path)
+    return new
+
+# === Sources ===
+
+def fetch_yahoo_shares(tickers: list[str], batch_size: int = 50) -> pd.DataFrame:
+    """Quarterly reported share counts (balance sheet OrdinarySharesNumber) from Yahoo Finance."""
+    from yahooquery import Ticker
+
+    frames = []
+    for i in range(0, len(tickers), batch_size):
+        batch = tickers[i:i + batch_size]
+        try:
+            data = Ticker(batch).get_financial_data("OrdinarySharesNumber", frequency="q", trailing=False)
+            if isinstance(data, pd.DataFrame) and not data.empty:
+                data = data.reset_index()
+                frames.append(pd.DataFrame({
+                    "ticker": data["symbol"].str.upper(),
+                    "date": pd.to_datetime(data["asOfDate"]).dt.date,
+                    "shares": pd.to_numeric(data["OrdinarySharesNumber"], errors="coerce"),
+                    "source": "yahoo_q",
+                }))
+        except Exception as e:
+            print(f"❌ Error fetching shares outstanding for batch: {e}")
+
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SHARES_COLUMNS)
+
+def shares_from_snapshots(snapshots: dict) -> pd.DataFrame:
+    """
+    Implied share counts from timestamped snapshot market caps: market_cap / close on
+    the day the cap was fetched. Network-free; legacy snapshots without a stamp are skipped.
+    """
+    rows = []
+    for ticker, snapshot in snapshots.items():
+        stamp = snapshot.get("_updated", {}).get("market_cap")
+        cap = snapshot.get("market_cap")
+        if not stamp or not cap:
+            continue
+        day = datetime.fromisoformat(stamp).date()
+        close = _close_asof(ticker, np.array([day], dtype="datetime64[D]"))[0]
+        if np.isfinite(close) and close > 0:
+            # close is split-adjusted to today; bring the implied count back to its own date's basis
+            shares = cap / close / split_factors(ticker, np.array([day], dtype="datetime64[D]"))[0]
+            rows.append({"ticker": ticker, "date": day, "shares": round(shares), "source": "snapshot"})
+    return pd.DataFrame(rows, columns=SHARES_COLUMNS)
+
+def refresh_shares(tickers: list[str] | None = None, snapshots: dict | None = None) -> int:
+    """Records share counts from Yahoo (when tickers are given) and from stamped snapshots."""
+    frames = []
+    if tickers:
+        frames.append(fetch_yahoo_shares(list(tickers)))
+    if snapshots:
+        frames.append(shares_from_snapshots(snapshots))
+    frames = [f for f in frames if not f.empty]
+    added = record_shares(pd.concat(frames, ignore_index=True)) if frames else 0
+    print(f"🧾 Shares outstanding: {added} new points")
+    return added
+
+# === Point-in-time market cap ===
+
+def _close_asof(ticker: str, dates: np.ndarray) -> np.ndarray:
+    """Last split-adjusted close on or before each date (NaN before the first bar)."""
+    ohlc = load_adjusted_ohlc(ticker)
+    if ohlc.empty:
+        return np.full(len(dates), np.nan)
+    bar_dates = pd.to_datetime(ohlc["date"]).to_numpy(dtype="datetime64[D]")
+    closes = ohlc["close"].to_numpy(dtype=np.float64)
+    pos = np.searchsorted(bar_dates, dates, side="right") - 1
+    return np.where(pos >= 0, closes[np.maximum(pos, 0)], np.nan)
+
+def point_in_time_market_cap(df: pd.DataFrame, date_col: str = "transaction_date") -> pd.Series:
+    """
+    Market cap of each trade's company on the trade date: close × shares outstanding,
+    both on today's split basis. Shares come from the last known count on or before the
+    trade date (the first known count for trades before it). NaN without shares or OHLC.
+    """
+    cap = np.full(len(df), np.nan)
+    series = load_shares_series()
+    if df.empty or series.empty:
+        return pd.Series(cap, index=df.index)
+
+    dates = pd.to_datetime(df[date_col]).to_numpy(dtype="datetime64[D]")
+    tickers = df["ticker"].to_numpy()
+    series = series.assign(date=pd.to_datetime(series["date"]).to_numpy(dtype="datetime64[D]"))
+    by_ticker = {t: rows for t, rows in series.groupby("ticker")}
+
+    for ticker in pd.unique(tickers):
+        points = by_ticker.get(ticker)
+        if points is None:
+            continue
+        rows = np.flatnonzero(tickers == ticker)
+        point_dates = points["date"].to_numpy()
+        # reported counts → today's basis
+        shares = points["shares"].to_numpy(dtype=np.float64) * split_factors(ticker, point_dates)
+        pos = np.clip(np.searchsorted(point_dates, dates[rows], side="right") - 1, 0, None)
+        cap[rows] = _close_asof(ticker, dates[rows]) * shares[pos]
+
+    return pd.Series(cap, index=df.index)
+
+def trade_market_cap(df: pd.DataFrame, snapshots: dict, date_col: str = "transaction_date") -> pd.Series:
+    """Point-in-time market cap per trade, falling back to the current snapshot cap."""
+    current = df["ticker"].map({t: snapshots.get(t, {}).get("market_cap") for t in df["ticker"].unique()})
+    return point_in_time_market_cap(df, date_col).fillna(pd.to_numeric(current, errors="coerce"))
+
+def tickers_without_shares(tickers) -> list[str]:
+    series = load_shares_series()
+    known = set(series["ticker"])
+    return [t for t in tickers if t not in known]
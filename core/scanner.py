@@ -2,6 +2,7 @@ import json
 from datetime import datetime, timedelta
 from time import sleep
 
+from config.settings import SEC_REQUEST_DELAY
 from core.io.file_manager import get_latest_filing_date, save_trades_to_csv, save_daily_trades_to_csv, save_finviz_trades_to_csv
 from core.sec_controller import get_company_trades, get_daily_trades
 from core.finviz_scraper import finviz_scraper
@@ -24,7 +25,7 @@ def scan_all_companies_from_json(json_path: str, limit_per_feed: int = 100):
         else:
             print(f"  ➤ Last filing date: {latest_date.date()}")
 
-        sleep(1)
+        sleep(SEC_REQUEST_DELAY)
         trades = get_company_trades(ticker, since=latest_date, limit=limit_per_feed)
 
         if trades:
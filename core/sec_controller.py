@@ -4,7 +4,9 @@ import requests
 from time import sleep
 
 from config.constants import HEADERS
+from config.settings import SEC_REQUEST_DELAY
 from core.utils.utils import safe_get_text
+from core.utils.metrics import incr, timer
 
 def get_company_trades(ticker_or_cik: str, since: datetime, limit: int = 100) -> list[dict]:
     """
@@ -12,7 +14,8 @@ def get_company_trades(ticker_or_cik: str, since: datetime, limit: int = 100) ->
     """
     
     url = f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={ticker_or_cik}&type=4&owner=only&count={limit}&output=atom"
-    res = requests.get(url, headers=HEADERS)
+    with timer("sec.fetch"):
+        res = requests.get(url, headers=HEADERS)
     if res.status_code != 200:
         print(f"Failed to fetch Atom feed for {ticker_or_cik}")
         return []
@@ -37,7 +40,7 @@ def get_company_trades(ticker_or_cik: str, since: datetime, limit: int = 100) ->
                 t["filing_date"] = filing_date.strftime("%Y-%m-%d")
             trades.extend(filing_trades)
 
-            sleep(1)
+            sleep(SEC_REQUEST_DELAY)
         except Exception as e:
             print(f"Error processing entry: {e}")
             continue
@@ -50,7 +53,8 @@ def get_daily_trades(target_date: datetime, count: int = 100) -> list[dict]:
     Returns a list of trade dicts.
     """
     url = f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcurrent&type=4&owner=only&count={count}&output=atom"
-    res = requests.get(url, headers=HEADERS)
+    with timer("sec.fetch"):
+        res = requests.get(url, headers=HEADERS)
     if res.status_code != 200:
         print(f"❌ Failed to fetch global Atom feed: {res.status_code}")
         return []
@@ -77,7 +81,7 @@ def get_daily_trades(target_date: datetime, count: int = 100) -> list[dict]:
                 t["filing_url"] = index_url
 
             all_trades.extend(filing_trades)
-            sleep(1)
+            sleep(SEC_REQUEST_DELAY)
 
         except Exception as e:
             print(f"⚠️ Error parsing entry from global feed: {e}")
@@ -100,7 +104,8 @@ def _get_primary_xml(index_url: str) -> str | None:
     Given an index page URL for a Form 4 filing, return the direct link to the primary XML.
     """
     try:
-        res = requests.get(index_url, headers=HEADERS)
+        with timer("sec.fetch"):
+            res = requests.get(index_url, headers=HEADERS)
         soup = BeautifulSoup(res.text, "html.parser")
 
         tables = soup.find_all("table")
@@ -114,7 +119,7 @@ def _get_primary_xml(index_url: str) -> str | None:
                         if link_tag and link_tag.get("href"):
                             rel_url = link_tag["href"]
                             full_url = f"https://www.sec.gov{rel_url}"
-                            sleep(1)  # SEC rate limit
+                            sleep(SEC_REQUEST_DELAY)  # SEC rate limit
                             return full_url
 
     except Exception as e:
@@ -129,8 +134,11 @@ def _parse_insider_trade_xml(xml_url: str) -> list[dict]:
     Returns a list of trade dictionaries.
     """
     try:
-        res = requests.get(xml_url, headers=HEADERS)
-        soup = BeautifulSoup(res.content, "xml")
+        with timer("sec.fetch"):
+            res = requests.get(xml_url, headers=HEADERS)
+        incr("sec.filings")
+        with timer("sec.parse_xml"):
+            soup = BeautifulSoup(res.content, "xml")
 
         # Get issuer info (ticker)
         ticker_tag = soup.find("issuerTradingSymbol")
@@ -171,6 +179,7 @@ def _parse_insider_trade_xml(xml_url: str) -> list[dict]:
                 print(f"⚠️ Error parsing transaction: {e}")
                 continue
 
+        incr("sec.trades", len(trades))
         return trades
 
     except Exception as e:
@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import time
+import bisect
+import argparse
+import threading
+import functools
+import numpy as np
+from contextlib import contextmanager
+from datetime import datetime
+
+from config.settings import DATA_ROOT
+from core.io.atomic import write_json, write_text
+
+# In-process run metrics: counters, timings (seconds) and value histograms.
+# A run resets them, instruments its stages with timer()/incr()/observe() and
+# writes a JSON report (and optionally a Prometheus textfile) at the end.
+METRICS_DIR = os.path.join(DATA_ROOT, "metrics")
+LATEST_REPORT = os.path.join(METRICS_DIR, "latest.json")
+PROMETHEUS_PREFIX = "insiderbot"
+TIMING_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900]
+MAX_SAMPLES = 10_000  # per metric, for quantiles (count/sum/min/max and timing buckets stay exact)
+
+_LOCK = threading.Lock()
+_COUNTERS = {}
+_TIMINGS = {}
+_HISTOGRAMS = {}
+_STARTED = [datetime.now()]
+
+def reset_metrics():
+    with _LOCK:
+        _COUNTERS.clear()
+        _TIMINGS.clear()
+        _HISTOGRAMS.clear()
+        _STARTED[0] = datetime.now()
+
+def incr(name: str, value: float = 1):
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+def _record(store: dict, name: str, value: float, buckets: list | None = None):
+    with _LOCK:
+        entry = store.get(name)
+        if entry is None:
+            entry = store[name] = {"count": 0, "sum": 0.0, "min": value, "max": value, "samples": []}
+            if buckets is not None:
+                # per-bucket (non-cumulative) counts; the last slot is +Inf
+                entry["buckets"] = [0] * (len(buckets) + 1)
+        entry["count"] += 1
+        entry["sum"] += value
+        entry["min"] = min(entry["min"], value)
+        entry["max"] = max(entry["max"], value)
+        if buckets is not None:
+            entry["buckets"][bisect.bisect_left(buckets, value)] += 1
+        if len(entry["samples"]) < MAX_SAMPLES:
+            entry["samples"].append(value)
+
+def observe(name: str, value: float):
+    """Adds one observation (rows in a batch, tickers per fetch, ...) to a histogram."""
+    _record(_HISTOGRAMS, name, float(value))
+
+@contextmanager
+def timer(name: str):
+    """Times the block (wall clock) into the `name` timing, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(_TIMINGS, name, time.perf_counter() - start, TIMING_BUCKETS)
+
+def timed(name: str):
+    """Decorator form of timer()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _summary(entry: dict) -> dict:
+    samples = np.asarray(entry["samples"], dtype=np.float64)
+    return {
+        "count": entry["count"],
+        "sum": round(entry["sum"], 6),
+        "min": round(entry["min"], 6),
+        "max": round(entry["max"], 6),
+        "mean": round(entry["sum"] / entry["count"], 6),
+        "p50": round(float(np.percentile(samples, 50)), 6),
+        "p95": round(float(np.percentile(samples, 95)), 6),
+    }
+
+def snapshot_metrics() -> dict:
+    """Current counters and summarized timings / histograms."""
+    with _LOCK:
+        return {
+            "counters": dict(sorted(_COUNTERS.items())),
+            "timings": {name: _summary(e) for name, e in sorted(_TIMINGS.items())},
+            "histograms": {name: _summary(e) for name, e in sorted(_HISTOGRAMS.items())},
+        }
+
+def run_report(**meta) -> dict:
+    finished = datetime.now()
+    return {
+        "started_at": _STARTED[0].isoformat(timespec="seconds"),
+        "finished_at": finished.isoformat(timespec="seconds"),
+        "duration_sec": round((finished - _STARTED[0]).total_seconds(), 3),
+        **meta,
+        **snapshot_metrics(),
+    }
+
+def write_run_report(name: str = "run", prometheus_path: str | None = None, **meta) -> str:
+    """
+    Writes the JSON run report to METRICS_DIR/<name>_<timestamp>.json and latest.json,
+    plus a Prometheus textfile when `prometheus_path` is given. Returns the report path.
+    """
+    report = run_report(name=name, **meta)
+    path = os.path.join(METRICS_DIR, f"{name}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    write_json(report, path, ensure_ascii=False, indent=2)
+    write_json(report, LATEST_REPORT, ensure_ascii=False, indent=2)
+    if prometheus_path:
+        write_text(prometheus_text(), prometheus_path)
+    slowest = sorted(report["timings"].items(), key=lambda kv: kv[1]["sum"], reverse=True)[:5]
+    print(f"⏱️ Run report saved to {path}: " + ", ".join(f"{n} {t['sum']:.2f}s" for n, t in slowest))
+    return path
+
+# === Prometheus text format ===
+
+def _metric_name(name: str) -> str:
+    return f"{PROMETHEUS_PREFIX}_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def prometheus_text() -> str:
+    """Counters, timings (as histograms in seconds) and histograms (as summaries) in text exposition format."""
+    lines = []
+    with _LOCK:
+        for name, value in sorted(_COUNTERS.items()):
+            metric = _metric_name(name) + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+
+        for name, entry in sorted(_TIMINGS.items()):
+            metric = _metric_name(name) + "_seconds"
+            cumulative = np.cumsum(entry["buckets"])
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in zip(TIMING_BUCKETS, cumulative):
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {count}')
+            lines += [
+                f'{metric}_bucket{{le="+Inf"}} {entry["count"]}',
+                f"{metric}_sum {entry['sum']:.6f}",
+                f"{metric}_count {entry['count']}",
+            ]
+
+        for name, entry in sorted(_HISTOGRAMS.items()):
+            metric = _metric_name(name)
+            samples = np.asarray(entry["samples"], dtype=np.float64)
+            lines.append(f"# TYPE {metric} summary")
+            for q in (0.5, 0.95):
+                lines.append(f'{metric}{{quantile="{q:g}"}} {np.percentile(samples, q * 100):g}')
+            lines += [f"{metric}_sum {entry['sum']:g}", f"{metric}_count {entry['count']}"]
+    return "\n".join(lines) + "\n"
+
+# === Regressions ===
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 1.5, min_seconds: float = 0.5) -> list[dict]:
+    """
+    Timings whose total grew by more than `threshold`× against a baseline report
+    (ignoring those under `min_seconds` in both), slowest first.
+    """
+    regressions = []
+    for name, timing in current.get("timings", {}).items():
+        before = baseline.get("timings", {}).get(name)
+        if not before or max(before["sum"], timing["sum"]) < min_seconds:
+            continue
+        ratio = timing["sum"] / before["sum"] if before["sum"] else float("inf")
+        if ratio > threshold:
+            regressions.append({"timing": name, "baseline_sec": before["sum"], "current_sec": timing["sum"], "ratio": round(ratio, 2)})
+    return sorted(regressions, key=lambda r: r["ratio"], reverse=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare a run report against a baseline report")
+    parser.add_argument("baseline")
+    parser.add_argument("current", nargs="?", default=LATEST_REPORT)
+    parser.add_argument("--threshold", type=float, default=1.5)
+    args = parser.parse_args()
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = compare_reports(baseline, current, threshold=args.threshold)
+    if not regressions:
+        print("✅ No timing regressions")
+    for r in regressions:
+        print(f"⚠️ {r['timing']}: {r['baseline_sec']:.2f}s → {r['current_sec']:.2f}s ({r['ratio']}×)")
@@ -0,0 +1,167 @@
+import time
+import threading
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from yahooquery import Ticker
+
+from config.settings import YAHOO_MAX_WORKERS, YAHOO_REQUESTS_PER_SECOND
+from core.utils.metrics import incr, timer
+
+# Snapshot field -> Yahoo quoteSummary module it comes from
+FIELD_MODULES = {
+    "market_cap": "summaryDetail",
+    "sector": "assetProfile",
+    "industry": "assetProfile",
+    "earnings_date": "calendarEvents",
+}
+SNAPSHOT_FIELDS = list(FIELD_MODULES)
+
+BATCH_SIZE = 50
+MAX_WORKERS = YAHOO_MAX_WORKERS
+REQUESTS_PER_SECOND = YAHOO_REQUESTS_PER_SECOND  # batch requests started per second, across all workers
+RETRIES = 2
+
+def _rate_limiter(per_second: float):
+    """Returns a wait() that spaces calls at least 1 / per_second apart (thread-safe)."""
+    lock = threading.Lock()
+    next_slot = [0.0]
+
+    def wait():
+        with lock:
+            now = time.monotonic()
+            slot = max(now, next_slot[0])
+            next_slot[0] = slot + 1 / per_second
+        time.sleep(max(0.0, slot - now))
+
+    return wait
+
+def parse_earnings_date(calendar: dict, ticker: str = ""):
+    """First upcoming earnings date of a calendarEvents module (epoch, {"raw": ...} or string)."""
+    earnings_date_raw = calendar.get("earnings", {}).get("earningsDate", [])
+    if not isinstance(earnings_date_raw, list) or not earnings_date_raw:
+        return None
+
+    first_entry = earnings_date_raw[0]
+    if isinstance(first_entry, dict) and "raw" in first_entry:
+        return datetime.fromtimestamp(first_entry["raw"]).date()
+    if isinstance(first_entry, (int, float)):
+        return datetime.fromtimestamp(first_entry).date()
+    if isinstance(first_entry, str):
+        try:
+            return pd.to_datetime(first_entry.replace(":S", "")).date()
+        except Exception:
+            print(f"⚠️ Could not parse string earnings date for {ticker}: {first_entry}")
+    return None
+
+def _parse_snapshot(ticker: str, modules: dict, fields: list[str]) -> dict:
+    summary = modules.get("summaryDetail", {}) or {}
+    profile = modules.get("assetProfile", {}) or {}
+    calendar = modules.get("calendarEvents", {}) or {}
+    values = {
+        "market_cap": lambda: summary.get("marketCap"),
+        "sector": lambda: profile.get("sector"),
+        "industry": lambda: profile.get("industry"),
+        "earnings_date": lambda: parse_earnings_date(calendar, ticker),
+    }
+    return {field: values[field]() for field in fields}
+
+def _fetch_batch(batch: list[str], fields: list[str], wait) -> tuple[dict, list[str]]:
+    """One combined quoteSummary request for the batch. Returns (snapshots, failed tickers)."""
+    modules = sorted({FIELD_MODULES[f] for f in fields})
+    wait()
+    data = Ticker(batch).get_modules(modules)
+
+    snapshots, failed = {}, []
+    for ticker in batch:
+        entry = data.get(ticker) if isinstance(data, dict) else None
+        if not isinstance(entry, dict):  # yahooquery returns an error string per failed symbol
+            failed.append(ticker)
+            continue
+        try:
+            snapshots[ticker] = _parse_snapshot(ticker, entry, fields)
+        except Exception as e:
+            print(f"⚠️ Error parsing ticker {ticker}: {e}")
+            failed.append(ticker)
+    return snapshots, failed
+
+def get_bulk_snapshots(
+    tickers: list[str],
+    fields: list[str] | None = None,
+    batch_size: int = BATCH_SIZE,
+    max_workers: int = MAX_WORKERS,
+    requests_per_second: float = REQUESTS_PER_SECOND,
+    retries: int = RETRIES,
+    stats: dict | None = None,
+) -> dict:
+    """
+    Fetches snapshot metadata (market cap, sector, industry, earnings date) from Yahoo Finance.
+    - every batch is one combined request for just the modules `fields` need
+    - batches run on a bounded thread pool behind a shared rate limiter
+    - tickers that failed in their batch are retried one by one
+
+    Parameters:
+        tickers: ticker symbols
+        fields: snapshot fields to fetch (default: all of SNAPSHOT_FIELDS)
+        stats: optional dict filled with per-batch latencies and totals
+
+    Returns:
+        Snapshot fields keyed by ticker (tickers that kept failing are left out).
+    """
+    fields = fields or SNAPSHOT_FIELDS
+    tickers = list(dict.fromkeys(tickers))
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    wait = _rate_limiter(requests_per_second)
+    snapshots, failed, latencies = {}, [], []
+    start = time.perf_counter()
+
+    def _timed(batch):
+        batch_start = time.perf_counter()
+        with timer("snapshots.fetch_batch"):
+            try:
+                result = _fetch_batch(batch, fields, wait)
+            except Exception as e:
+                print(f"❌ Error fetching batch: {e}")
+                result = {}, list(batch)
+        return result, time.perf_counter() - batch_start
+
+    with timer("snapshots.fetch"):
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_timed, batch) for batch in batches]
+            for n, future in enumerate(as_completed(futures), start=1):
+                (batch_snapshots, batch_failed), latency = future.result()
+                snapshots.update(batch_snapshots)
+                failed.extend(batch_failed)
+                latencies.append(latency)
+                print(f"📦 Batch {n}/{len(batches)}: {len(batch_snapshots)} ok, {len(batch_failed)} failed in {latency:.2f}s")
+
+        # Retry failed tickers individually, with backoff
+        for attempt in range(1, retries + 1):
+            if not failed:
+                break
+            print(f"🔁 Retrying {len(failed)} tickers individually (attempt {attempt}/{retries})")
+            time.sleep(attempt)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(lambda t: _timed([t]), failed))
+            failed = []
+            for (ticker_snapshots, ticker_failed), _ in results:
+                snapshots.update(ticker_snapshots)
+                failed.extend(ticker_failed)
+
+    elapsed = time.perf_counter() - start
+    incr("snapshots.fetched", len(snapshots))
+    incr("snapshots.failed", len(failed))
+    if failed:
+        print(f"⚠️ No snapshot for {len(failed)} tickers: {', '.join(failed[:10])}")
+    print(f"✅ {len(snapshots)}/{len(tickers)} snapshots in {elapsed:.1f}s")
+
+    if stats is not None:
+        stats.update({
+            "tickers": len(tickers),
+            "fetched": len(snapshots),
+            "failed": failed,
+            "batches": len(batches),
+            "batch_latency_sec": [round(l, 3) for l in latencies],
+            "total_sec": round(elapsed, 3),
+        })
+    return snapshots
@@ -1,10 +1,11 @@
 from core.scanner import scan_all_companies_from_json, daily_run, scan_for_company, scan_from_finviz
 from core.engine.analyzer import analyze_finviz_trade
-from core.io.file_manager import load_finviz_all_trades, load_latest_tagged_trades, load_scored_trades
+from core.io.file_manager import load_finviz_all_trades, load_latest_tagged_trades, load_scored_trades, save_scores
 from core.engine.ohlc import update_ohlc
 from core.engine.summary import generate_trade_md
 from core.engine.backtest import run_backtest_pipeline
 from core.engine.embedding import update_motive_tags, incremental_update
+from core.engine.pipeline import run_pipeline
 
 import os
 
@@ -20,6 +21,7 @@ def print_main_menu():
     print("6 - Run Backtest")
     print("7 - Generate Summary File")
     print("8 - Update motive tags to scored file")
+    print("9 - Run daily pipeline (incremental)")
     print("0 - Exit")
 
 def print_company_menu():
@@ -116,9 +118,12 @@ def main():
             df = load_scored_trades()
             df_updated = incremental_update(df, "scores_with_tags.csv")
             #df_updated = update_motive_tags(df)
-            df_updated.to_csv("scores_with_tags.csv", index=False)
+            save_scores(df_updated, "scores_with_tags.csv")
             
 
+        elif choice == "9":
+            run_pipeline()
+
         elif choice == "0":
             print("👋 Exiting InsiderBot. Have a great day!")
             break
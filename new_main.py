@@ -4,6 +4,9 @@ import pandas as pd
 from src.handler.finviz_handler import finviz_daily_scan
 from src.handler.yahooquery_handler import build_snapshot_cache
 from src.preparation.data_preparation import normalize_schema
+from core.engine.grouping import group_same_day_insider_trades
+from core.engine.analyzer import resolve_due_outcomes
+from core.engine.pipeline import run_pipeline
 
 # ---------------------------------------- #
 #              DAILY PIPELINE              #
@@ -29,8 +32,8 @@ def run_daily_pipeline():
         print("No new trades today. Exiting...")
         return
     
-    # 2. Normalize new Trades
-    df_new = normalize_schema(df_new)
+    # 2. Group same-day fills and normalize new Trades
+    df_new = normalize_schema(group_same_day_insider_trades(df_new))
 
     # 3. Build Snapshot Cache
     snapshot_cache = build_snapshot_cache(df_new["ticker"].unique())
@@ -51,8 +54,15 @@ def run_weekly_pipeline():
     -> Updates OHLC
     -> Try to Update Outcome Tags Based on New OHLC Data
     -> Prepare and Save Results for Training
+
+    Only trades in the pending outcomes queue whose windows are due are
+    touched, so the cost does not grow with the history.
     """
-    pass
+    # 1. Due trades -> OHLC for their tickers -> outcomes -> advance the queue
+    resolve_due_outcomes()
+
+    # 2. Propagate the newly labeled rows downstream
+    run_pipeline(only=["score", "footnotes", "prepare", "predict"])
 
 
 # ---------------------------------------- #
@@ -1,6 +1,6 @@
 import pandas as pd
 
-from src.extraction.finviz import finviz_scraper
+from core.finviz_scraper import finviz_scraper
 from src.io.storage_manager import save_finviz_trades_to_csv
 
 def finviz_daily_scan() -> pd.DataFrame:
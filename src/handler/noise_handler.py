@@ -1,5 +1,5 @@
-from src.preparation.cleaner import pre_ohlc_noise_reduction, drop_split_merger_anomalies, drop_low_atr_trades
-from src.preparation.data_preparation import add_atr
+# Shared with the core pipeline: the analyzer's filters
+from core.engine.analyzer import prefilter_tickers, add_atr_to_trades, drop_split_merger_anomalies, drop_low_atr_trades
 
 
 def pre_ohlc_filter(df, snapshot_cache, min_market_cap=150_000_000):
@@ -15,7 +15,7 @@ def pre_ohlc_filter(df, snapshot_cache, min_market_cap=150_000_000):
         pd.DataFrame: Filtered DataFrame with only valid tickers.
     """
     tickers = df["ticker"].unique()
-    valid_tickers = pre_ohlc_noise_reduction(tickers, snapshot_cache, min_market_cap)
+    valid_tickers = prefilter_tickers(tickers, snapshot_cache, min_market_cap)
     return df[df["ticker"].isin(valid_tickers)].copy()
 
 def post_ohlc_filter(df, split_threshold=1.70, min_atr_pct=0.02):
@@ -32,7 +32,7 @@ def post_ohlc_filter(df, split_threshold=1.70, min_atr_pct=0.02):
     Returns:
         pd.DataFrame: Cleaned DataFrame after OHLC noise reduction.
     """
-    df = add_atr(df, window=14)
+    df = add_atr_to_trades(df, window=14)
     df = drop_split_merger_anomalies(df, threshold=split_threshold)
     df = drop_low_atr_trades(df, min_atr_pct=min_atr_pct)
     return df
\ No newline at end of file
@@ -1,9 +1,10 @@
-from src.io.cache_manager import load_snapshot_cache, save_snapshot_cache
-from src.extraction.yahooquery import get_bulk_snapshots
+from core.io.cache import load_snapshot_cache
+# Shared with the core pipeline: TTL-aware refresh of missing and stale snapshots
+from core.engine.analyzer import fetch_missing_snapshots
 
 def build_snapshot_cache(tickers: list[str]) -> dict:
     """
-    Ensures snapshot cache is up-to-date by fetching missing tickers.
+    Ensures snapshot cache is up-to-date by fetching missing (and stale) tickers.
 
     Args:
         tickers (list[str]): List of tickers that need snapshots.
@@ -11,14 +12,4 @@ def build_snapshot_cache(tickers: list[str]) -> dict:
     Returns:
         dict: Snapshot cache with all requested tickers.
     """
-    cache = load_snapshot_cache()
-    missing = [t for t in tickers if t not in cache]
-
-    print(f"🔍 Found {len(missing)} missing tickers.")
-    if missing:
-        print("🌐 Fetching missing snapshots from Yahoo Finance...")
-        new_data = get_bulk_snapshots(missing)
-        cache.update(new_data)
-        save_snapshot_cache(cache)
-
-    return cache
\ No newline at end of file
+    return fetch_missing_snapshots(list(tickers), load_snapshot_cache())
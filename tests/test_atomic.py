@@ -0,0 +1,29 @@
+import os
+import stat
+
+import pandas as pd
+
+from core.io import atomic
+from core.io.atomic import write_csv, write_json
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_files_get_umask_mode(tmp_path, monkeypatch):
+    # Not the 0600 of the mkstemp temp file
+    monkeypatch.setattr(atomic, "_UMASK", 0o022)
+    path = tmp_path / "store.csv"
+    write_csv(pd.DataFrame({"a": [1]}), str(path), index=False)
+    assert mode(path) == 0o644
+
+
+def test_rewrites_keep_existing_mode(tmp_path):
+    path = tmp_path / "state.json"
+    write_json({"a": 1}, str(path))
+    os.chmod(path, 0o664)
+    write_json({"a": 2}, str(path))
+    assert mode(path) == 0o664
+    assert path.read_text() == '{"a": 2}'
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
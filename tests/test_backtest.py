@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from core.engine.backtest import score_trades
+
+
+def test_score_trades_without_case_2_outcomes():
+    # A fresh batch with no resolved outcomes loads case_2_outcome as an all-NaN float column
+    df = pd.DataFrame({
+        "ticker": ["ABC", "XYZ"],
+        "tags": [["👑 CEO", "🔥 VERY LARGE TRADE"], ["📡 Tech"]],
+        "case_2_outcome": [np.nan, np.nan],
+    })
+    scored = score_trades(df)
+    assert scored["outcome_case_2"].isna().all()
+    assert scored["score"].notna().all()
+
+
+def test_score_trades_maps_case_2_outcomes():
+    df = pd.DataFrame({
+        "ticker": ["ABC", "XYZ", "QRS"],
+        "tags": [["👑 CEO"], ["👑 CEO"], ["👑 CEO"]],
+        "case_2_outcome": ["🟢 SPIKE BEFORE DROP - SUCCESSFUL TRADE ", "🔴 FINAL GAIN TOO LOW - BAD TRADE", None],
+    })
+    assert score_trades(df)["outcome_case_2"].tolist()[:2] == ["🟢 SUCCESSFUL TRADE", "🔴 UNSUCCESSFUL TRADE"]
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+pytest.importorskip("xgboost")
+
+from core.engine import compiled_trees, predict
+from core.engine.compiled_trees import (
+    check_parity, compile_model, prepare_input, predict_proba, predict_proba_lookup, save_compiled, load_compiled,
+)
+from core.engine.features import build_manifest
+from core.engine.predict import align_features, load_scorers, predict_scores
+from core.engine.train import build_random_forest, build_xgboost
+
+ATOL = 1e-5
+
+
+@pytest.fixture(scope="module")
+def fixture_set():
+    """Sparse 0/1 tag matrix (CSR, as in the feature sets) with a label driven by a few tags."""
+    rng = np.random.default_rng(11)
+    manifest = build_manifest([f"🏷️ TAG {i}" for i in range(24)])
+    dense = (rng.random((400, 24)) < 0.2).astype(np.float32)
+    y = ((dense[:, 0] + dense[:, 3] - dense[:, 7] + rng.normal(0, 0.5, 400)) > 0.3).astype(int)
+    return sparse.csr_matrix(dense), y, manifest
+
+
+def small(model):
+    return model.set_params(n_estimators=25, n_jobs=1)
+
+
+def assert_parity(model, X, manifest):
+    compiled = compile_model(model, manifest)
+    expected = model.predict_proba(align_features(X, manifest, model))[:, 1]
+    dense = prepare_input(X, manifest, compiled)
+    np.testing.assert_allclose(predict_proba(compiled, dense), expected, atol=ATOL)
+    np.testing.assert_allclose(predict_proba_lookup(compiled, dense), expected, atol=ATOL)
+    assert check_parity(model, compiled, X, manifest, atol=ATOL) <= ATOL
+    return compiled
+
+
+def test_random_forest_parity_on_csr(fixture_set):
+    X, y, manifest = fixture_set
+    assert_parity(small(build_random_forest()).fit(X, y), X, manifest)
+
+
+def test_xgboost_parity_on_csr(fixture_set):
+    # Zeros are not stored in CSR, so XGBoost treats them as missing
+    X, y, manifest = fixture_set
+    compiled = assert_parity(small(build_xgboost()).fit(X, y), X, manifest)
+    assert compiled["zero_is_missing"]
+
+
+def test_legacy_dataframe_models_parity(fixture_set):
+    # Legacy models were trained on named dense DataFrames (zeros are values)
+    X, y, manifest = fixture_set
+    frame = pd.DataFrame(X.toarray(), columns=manifest["feature_names"])
+    for model in (small(build_random_forest()), small(build_xgboost())):
+        assert_parity(model.fit(frame, y), X, manifest)
+
+
+def test_saved_compiled_model_scores_the_same(fixture_set, tmp_path):
+    X, y, manifest = fixture_set
+    model = small(build_xgboost()).fit(X, y)
+    compiled = compile_model(model, manifest)
+    path = str(tmp_path / "xgb.npz")
+    save_compiled(compiled, path)
+    dense = prepare_input(X, manifest, compiled)
+    np.testing.assert_allclose(predict_proba(load_compiled(path), dense), predict_proba(compiled, dense))
+
+
+def test_scorers_use_compiled_model_when_exported(fixture_set, tmp_path, monkeypatch):
+    X, y, manifest = fixture_set
+    model = small(build_xgboost()).fit(X, y)
+    monkeypatch.setattr(compiled_trees, "COMPILED_DIR", str(tmp_path))
+    monkeypatch.setattr(compiled_trees, "current_version", lambda: "v1")
+    monkeypatch.setattr(predict, "load_model", lambda name, version=None: model)
+
+    # Not exported yet: falls back to the model
+    assert load_scorers(["xgb_case1"])["xgb_case1"] is model
+
+    save_compiled(compile_model(model, manifest), compiled_trees.compiled_path("xgb_case1"))
+    scorer = load_scorers(["xgb_case1"])["xgb_case1"]
+    assert isinstance(scorer, dict)
+    np.testing.assert_allclose(predict_scores(scorer, X, manifest), predict_scores(model, X, manifest), atol=ATOL)
@@ -0,0 +1,68 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core.io.corporate_actions as corporate_actions
+from core.io.cache import backfill_fetched_on
+
+# 4:1 split with ex-date 2025-03-10
+FIXTURE = "ticker,date,action,value\nABC,2025-03-10,split,4.0\n"
+
+
+@pytest.fixture
+def split_fixture(tmp_path, monkeypatch):
+    path = tmp_path / "corporate_actions.csv"
+    path.write_text(FIXTURE)
+    actions = corporate_actions.fixture_actions(["ABC"], date(2025, 1, 1), date(2025, 12, 31), path=str(path))
+    monkeypatch.setattr(corporate_actions, "load_corporate_actions", lambda path=None: actions)
+    return actions
+
+
+def bars(dates, close, fetched_on=None):
+    df = pd.DataFrame({
+        "date": [date.fromisoformat(d) for d in dates],
+        "open": close, "high": close, "low": close, "close": close,
+        "volume": [1000.0] * len(dates),
+    })
+    if fetched_on is not None:
+        df["fetched_on"] = fetched_on
+    return df
+
+
+def test_fixture_provider_reads_split(split_fixture):
+    assert split_fixture.to_dict("records") == [{"ticker": "ABC", "date": date(2025, 3, 10), "action": "split", "value": 4.0}]
+
+
+def test_bars_fetched_before_split_are_adjusted(split_fixture):
+    ohlc = bars(["2025-03-06", "2025-03-07"], [100.0, 100.0], fetched_on=[date(2025, 3, 7)] * 2)
+    adjusted = corporate_actions.adjust_ohlc("ABC", ohlc)
+    np.testing.assert_allclose(adjusted["close"], [25.0, 25.0])
+    np.testing.assert_allclose(adjusted["volume"], [4000.0, 4000.0])
+
+
+def test_bars_fetched_after_split_are_left_alone(split_fixture):
+    # Yahoo already returned these on the post-split basis
+    ohlc = bars(["2025-03-06", "2025-03-11"], [25.0, 26.0], fetched_on=[date(2025, 3, 20)] * 2)
+    adjusted = corporate_actions.adjust_ohlc("ABC", ohlc)
+    np.testing.assert_allclose(adjusted["close"], [25.0, 26.0])
+
+
+def test_legacy_bars_are_not_adjusted_twice(split_fixture):
+    # Legacy file without fetched_on, fetched after the split; a later update appends new bars
+    legacy = bars(["2025-03-06", "2025-03-07", "2025-03-10", "2025-03-11"], [25.0, 25.5, 26.0, 26.5])
+    legacy = backfill_fetched_on(legacy)
+    assert set(legacy["fetched_on"]) == {date(2025, 3, 11)}
+
+    update = bars(["2025-03-12"], [27.0], fetched_on=[date(2025, 3, 12)])
+    combined = pd.concat([legacy, update], ignore_index=True).drop_duplicates(subset="date")
+    adjusted = corporate_actions.adjust_ohlc("ABC", combined)
+    np.testing.assert_allclose(adjusted["close"], [25.0, 25.5, 26.0, 26.5, 27.0])
+
+
+def test_legacy_bars_before_split_are_adjusted(split_fixture):
+    # Legacy file whose last bar predates the split: its prices are pre-split
+    legacy = bars(["2025-03-06", "2025-03-07"], [100.0, 102.0])
+    adjusted = corporate_actions.adjust_ohlc("ABC", legacy)
+    np.testing.assert_allclose(adjusted["close"], [25.0, 25.5])
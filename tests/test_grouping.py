@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.engine.grouping import group_same_day_insider_trades, group_same_day_insider_trades_reference, verify_grouping
+from src.preparation.data_preparation import REQUIRED_COLS, normalize_schema
+
+
+@pytest.fixture
+def fills():
+    """Same-day fills as scraped: strings with commas/$, parenthesised negatives, gaps."""
+    return pd.DataFrame([
+        # two fills, value filed as "(…)" on one of them
+        ["ABC", "DOE JOHN", "Director", "2025-09-01", "Buy", "$10.00", "1,000", "10,000", "5,000", "url1"],
+        ["ABC", "DOE JOHN", "CEO", "2025-09-01", "buy ", "12.00", "500", "(6,000)", "5,500", "url2"],
+        # NaN relationship on the first fill: kept as-is, not the next non-null
+        ["XYZ", "ROE JANE", np.nan, "2025-09-02", "Buy", "20", "100", "2,000", "900", "url3"],
+        ["XYZ", "ROE JANE", "Director", "2025-09-02", "Buy", "22", "100", "2,200", "1,000", "url4"],
+        # missing value: computed from price × shares
+        ["XYZ", "ROE JANE", "Director", "2025-09-03", "Buy", "25", "40", np.nan, "1,040", "url5"],
+        # unparseable shares: dropped
+        ["QQQ", "SMITH A", "CFO", "2025-09-03", "Buy", "5", "n/a", "100", "10", "url6"],
+    ], columns=["ticker", "insider_name", "relationship", "transaction_date", "transaction_type",
+                "price", "shares", "value", "shares_total", "sec_form4"])
+
+
+def test_vectorized_matches_reference(fills):
+    assert verify_grouping(fills) == {}
+    pd.testing.assert_frame_equal(
+        group_same_day_insider_trades(fills), group_same_day_insider_trades_reference(fills), check_dtype=False
+    )
+
+
+def test_grouped_values(fills):
+    grouped = group_same_day_insider_trades(fills).set_index(["ticker", "transaction_date"])
+    abc = grouped.loc[("ABC", pd.Timestamp("2025-09-01").date())]
+    assert abc["price"] == pytest.approx((10 * 1000 + 12 * 500) / 1500)
+    assert abc["shares"] == 1500
+    assert abc["value"] == 10_000 - 6_000
+    assert (abc["relationship"], abc["sec_form4"], abc["shares_total"]) == ("Director", "url1", "5,000")
+
+    xyz = grouped.loc[("XYZ", pd.Timestamp("2025-09-02").date())]
+    assert pd.isna(xyz["relationship"])
+    assert grouped.loc[("XYZ", pd.Timestamp("2025-09-03").date()), "value"] == 25 * 40
+    assert "QQQ" not in grouped.index.get_level_values("ticker")
+
+
+def test_shares_total_survives_normalize_schema(fills):
+    df = normalize_schema(group_same_day_insider_trades(fills))
+    assert list(df.columns) == REQUIRED_COLS
+    assert df["shares_total"].notna().all()
+
+
+def test_shares_total_is_optional(fills):
+    assert verify_grouping(fills.drop(columns="shares_total")) == {}
+    assert "shares_total" not in group_same_day_insider_trades(fills.drop(columns="shares_total")).columns
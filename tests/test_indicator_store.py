@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import core.io.indicator_store as store
+from core.engine.indicators import INDICATOR_COLUMNS, compute_indicators
+
+
+def make_ohlc(n):
+    close = 50 + np.sin(np.arange(n) / 5) * 5
+    return pd.DataFrame({
+        "date": pd.bdate_range("2025-01-01", periods=n).date,
+        "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": np.full(n, 1000.0),
+    })
+
+
+@pytest.fixture
+def isolated_store(tmp_path, monkeypatch):
+    """Indicator store in tmp_path, fed from an in-memory OHLC series."""
+    ohlc = {"bars": make_ohlc(60)}
+    monkeypatch.setattr(store, "INDICATOR_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(store, "load_adjusted_ohlc", lambda ticker: ohlc["bars"])
+    monkeypatch.setattr(store, "actions_signature", lambda ticker: "")
+    monkeypatch.setattr(store, "_ohlc_mtime", lambda ticker: 0.0)
+    store.clear_indicator_cache()
+    yield ohlc
+    store.clear_indicator_cache()
+
+
+def assert_matches_full(table, bars):
+    full = compute_indicators(bars)
+    assert len(table) == len(full)
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(table[col], full[col], equal_nan=True, err_msg=col)
+
+
+def test_append_updates_table_and_state(isolated_store):
+    store.build_indicator_table("ABC", make_ohlc(50))
+    table = store.update_indicator_table("ABC")
+    assert_matches_full(table, isolated_store["bars"])
+    assert store.load_indicator_state("ABC")["last_date"] == str(table["date"].iloc[-1])
+
+
+def test_crash_between_state_and_append_rebuilds(isolated_store, monkeypatch):
+    store.build_indicator_table("ABC", make_ohlc(50))
+    def crash(lines, path):
+        raise OSError("crash")
+
+    with monkeypatch.context() as m:
+        m.setattr(store, "append_lines", crash)
+        with pytest.raises(OSError):
+            store.update_indicator_table("ABC")
+
+    # The state is ahead of the table: the next update recomputes instead of appending again
+    store.clear_indicator_cache()
+    table = store.update_indicator_table("ABC")
+    assert_matches_full(table, isolated_store["bars"])
+    assert_matches_full(store._read_indicator_table("ABC"), isolated_store["bars"])
+
+
+def test_repeated_rows_are_deduplicated_on_read(isolated_store):
+    store.build_indicator_table("ABC", make_ohlc(50))
+    table = store.update_indicator_table("ABC")
+    tail = table.iloc[-3:]
+    with open(store.get_indicator_cache_path("ABC"), "a") as f:
+        f.write(tail.to_csv(header=False, index=False))
+    assert_matches_full(store._read_indicator_table("ABC"), isolated_store["bars"])
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.engine.indicators import INDICATOR_COLUMNS, sma, compute_indicators, indicator_state, append_bars
+
+
+@pytest.fixture
+def closes_with_gaps():
+    rng = np.random.default_rng(7)
+    close = 100 + rng.normal(0, 1, 80).cumsum()
+    close[30] = np.nan  # missing bar mid-series
+    close[-1] = np.nan  # partial-day close kept by update_ohlc
+    return close
+
+
+def test_sma_matches_ta_around_missing_closes(closes_with_gaps):
+    ta_trend = pytest.importorskip("ta.trend")
+    expected = ta_trend.SMAIndicator(pd.Series(closes_with_gaps), 20).sma_indicator().to_numpy()
+    np.testing.assert_allclose(sma(closes_with_gaps, 20), expected, equal_nan=True)
+
+
+def test_sma_recovers_after_missing_close_leaves_window(closes_with_gaps):
+    values = sma(closes_with_gaps, 20)
+    assert np.isnan(values[30:50]).all()
+    assert not np.isnan(values[50:-1]).any()
+
+
+def ohlc_with_gaps(n=120, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 1, n).cumsum()
+    close[rng.random(n) < 0.1] = np.nan
+    close[:2] = np.nan
+    return pd.DataFrame({
+        "date": pd.bdate_range("2025-01-01", periods=n).date,
+        "open": close, "high": close + 1, "low": close - 1, "close": close,
+        "volume": rng.integers(1, 100, n).astype(float),
+    })
+
+
+@pytest.mark.parametrize("split", [5, 25, 60, 119])
+def test_incremental_update_matches_full_recompute_with_missing_closes(split):
+    ohlc = ohlc_with_gaps()
+    full = compute_indicators(ohlc)
+    # The state goes through JSON, as it does in the indicator store
+    state = json.loads(json.dumps(indicator_state(ohlc.iloc[:split])))
+    incremental = append_bars(compute_indicators(ohlc.iloc[:split]), state, ohlc.iloc[split:])
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(incremental[col], full[col], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
@@ -0,0 +1,56 @@
+import re
+
+import pytest
+
+from core.utils import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+
+
+def bucket_counts(text, metric):
+    return {le: int(n) for le, n in re.findall(rf'{metric}_bucket{{le="([^"]+)"}} (\d+)', text)}
+
+
+def test_timing_buckets_stay_exact_past_max_samples(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_SAMPLES", 5)
+    for value in [0.001] * 10 + [2.0] * 10 + [1000.0] * 3:
+        metrics._record(metrics._TIMINGS, "cache.ohlc.load", value, metrics.TIMING_BUCKETS)
+
+    text = metrics.prometheus_text()
+    buckets = bucket_counts(text, "insiderbot_cache_ohlc_load_seconds")
+    assert buckets["0.01"] == 10
+    assert buckets["1"] == 10
+    assert buckets["5"] == 20
+    assert buckets["900"] == 20
+    assert buckets["+Inf"] == 23
+    assert "insiderbot_cache_ohlc_load_seconds_count 23" in text
+    # cumulative and never above the total count
+    assert list(buckets.values()) == sorted(buckets.values())
+
+
+def test_bucket_bounds_are_inclusive():
+    metrics._record(metrics._TIMINGS, "stage", 0.5, metrics.TIMING_BUCKETS)
+    buckets = bucket_counts(metrics.prometheus_text(), "insiderbot_stage_seconds")
+    assert buckets["0.1"] == 0
+    assert buckets["0.5"] == 1
+
+
+def test_timer_records_into_buckets():
+    with metrics.timer("stage"):
+        pass
+    assert metrics._TIMINGS["stage"]["buckets"][0] == 1
+
+
+def test_snapshot_fetch_is_timed(monkeypatch):
+    from core import yahoo_client
+
+    monkeypatch.setattr(yahoo_client, "_fetch_batch", lambda batch, fields, wait: ({t: {} for t in batch}, []))
+    yahoo_client.get_bulk_snapshots(["ABC", "XYZ", "QRS"], batch_size=2, requests_per_second=1000)
+    timings = metrics.snapshot_metrics()["timings"]
+    assert timings["snapshots.fetch"]["count"] == 1
+    assert timings["snapshots.fetch_batch"]["count"] == 2
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+import core.engine.embedding as embedding
+import core.engine.pipeline as pipeline
+
+
+def trades(rows):
+    return pd.DataFrame(rows, columns=["ticker", "insider_name", "transaction_date", "transaction_type", "score", "outcome_case_1"])
+
+
+@pytest.fixture
+def footnote_store(tmp_path, monkeypatch):
+    """scores.csv / scores_with_tags.csv kept in memory; footnote fetches recorded."""
+    files = {}
+    fetched = []
+
+    def fetch(df):
+        fetched.extend(df["ticker"])
+        return df.assign(footnote_tags=[["Conviction Buy"]] * len(df), footnote_notes="fetched")
+
+    monkeypatch.setattr(pipeline, "SCORES_WITH_TAGS_FILE", str(tmp_path / "scores_with_tags.csv"))
+    monkeypatch.setattr(pipeline, "load_scored_trades", lambda: files["scores"].copy())
+    monkeypatch.setattr(pipeline, "load_scored_with_tags_trades", lambda: files["with_tags"].copy())
+    monkeypatch.setattr(pipeline, "save_tagged_trades", lambda df, path: files.__setitem__("with_tags", df))
+    monkeypatch.setattr(embedding, "update_motive_tags", fetch)
+    (tmp_path / "scores_with_tags.csv").write_text("")
+    return files, fetched
+
+
+def test_full_mode_rebuilds_from_every_scored_row(footnote_store):
+    files, fetched = footnote_store
+    files["with_tags"] = trades([
+        ["ABC", "DOE", "2025-09-01", "Buy", 1.0, None],
+        ["OLD", "ROE", "2025-08-01", "Buy", 2.0, None],  # no longer scored
+    ]).assign(footnote_tags=[["Automatic/Scheduled"], []], footnote_notes=["kept", ""])
+    files["scores"] = trades([
+        ["ABC", "DOE", "2025-09-01", "Buy", 5.0, "🟢 SUCCESSFUL TRADE C1"],  # re-scored, outcome matured
+        ["NEW", "SMITH", "2025-09-02", "Buy", 3.0, None],
+    ])
+
+    pipeline._run_footnotes({"full": True})
+
+    out = files["with_tags"].set_index("ticker")
+    assert sorted(out.index) == ["ABC", "NEW"]
+    assert out.loc["ABC", "score"] == 5.0
+    assert out.loc["ABC", "outcome_case_1"] == "🟢 SUCCESSFUL TRADE C1"
+    assert (out.loc["ABC", "footnote_tags"], out.loc["ABC", "footnote_notes"]) == (["Automatic/Scheduled"], "kept")
+    assert fetched == ["NEW"]
@@ -0,0 +1,50 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core.io.corporate_actions as corporate_actions
+from core.engine import scoring_service
+from core.engine.features import build_manifest
+
+# 4:1 split with ex-date 2025-03-10
+FIXTURE = "ticker,date,action,value\nABC,2025-03-10,split,4.0\n"
+
+
+class FakeBooster:
+    def inplace_predict(self, X):
+        return np.zeros(X.shape[0])
+
+
+@pytest.fixture
+def warm_service(tmp_path, monkeypatch):
+    path = tmp_path / "corporate_actions.csv"
+    path.write_text(FIXTURE)
+    actions = corporate_actions.fixture_actions(["ABC"], date(2025, 1, 1), date(2025, 12, 31), path=str(path))
+    monkeypatch.setattr(corporate_actions, "load_corporate_actions", lambda path=None: actions)
+
+    # The same trade, tagged before the split (filed price kept in price_raw)
+    history = pd.DataFrame({
+        "ticker": ["ABC"], "insider_name": ["Jane Roe"], "transaction_date": ["2025-03-03"],
+        "price": [100.0], "price_raw": [100.0], "tags": [["🟢 SMALL TRADE"]], "case_2_outcome": [None],
+    })
+    by_ticker, by_insider = scoring_service._index_history(history)
+    models = {name: object() for name in scoring_service.PREDICT_MODELS}
+    monkeypatch.setattr(scoring_service, "_STATE", {
+        "version": "test", "manifest": build_manifest(), "models": models,
+        "boosters": {name: FakeBooster() for name in models}, "snapshots": {},
+        "history_by_ticker": by_ticker, "history_by_insider": by_insider,
+    })
+
+
+def test_request_prices_are_split_adjusted(warm_service):
+    trade = {
+        "ticker": "ABC", "insider_name": "Jane Roe", "relationship": "CEO",
+        "transaction_date": "2025-03-03", "price": 100.0, "value": 100_000, "shares": 1000,
+    }
+    scored = scoring_service.score_trades([trade], enrich=False)
+    assert scored.loc[0, "price"] == pytest.approx(25.0)
+    assert scored.loc[0, "price_raw"] == 100.0
+    # Known trade: not counted again next to its history copy
+    assert "🧩 MULTIPLE BUYS" not in scored.loc[0, "tags"]
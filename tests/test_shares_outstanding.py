@@ -0,0 +1,34 @@
+import os
+from datetime import date
+
+import pandas as pd
+
+from core.io.shares_outstanding import SHARES_COLUMNS, load_shares_series, record_shares
+
+
+def points(rows):
+    return pd.DataFrame(rows, columns=SHARES_COLUMNS)
+
+
+def test_repeated_counts_are_not_new_and_not_rewritten(tmp_path):
+    path = str(tmp_path / "shares_outstanding.csv")
+    assert record_shares(points([
+        ["ABC", date(2025, 6, 30), 1_000_000, "yahoo_q"],
+        ["ABC", date(2025, 9, 1), 1_000_000, "snapshot"],  # same count: compacted away
+    ]), path) == 1
+    mtime = os.path.getmtime(path)
+
+    # Snapshot-implied points repeating the last count on later days
+    for day in (2, 3, 4):
+        assert record_shares(points([["ABC", date(2025, 9, day), 1_000_000, "snapshot"]]), path) == 0
+    assert os.path.getmtime(path) == mtime
+    assert len(load_shares_series(path)) == 1
+
+
+def test_changed_and_revised_counts_are_recorded(tmp_path):
+    path = str(tmp_path / "shares_outstanding.csv")
+    record_shares(points([["ABC", date(2025, 6, 30), 1_000_000, "yahoo_q"]]), path)
+    assert record_shares(points([["ABC", date(2025, 9, 2), 1_200_000, "snapshot"]]), path) == 1
+    # Same date, revised count
+    assert record_shares(points([["ABC", date(2025, 9, 2), 1_250_000, "snapshot"]]), path) == 1
+    assert load_shares_series(path)["shares"].tolist() == [1_000_000, 1_250_000]
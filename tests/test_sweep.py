@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+
+from core.engine import sweep
+
+
+def test_load_sweep_data_without_case_2_outcomes(monkeypatch):
+    df = pd.DataFrame({
+        "ticker": ["ABC", "XYZ"],
+        "transaction_date": ["2025-01-02", "2025-01-03"],
+        "tags": [["👑 CEO"], ["📡 Tech"]],
+        "case_2_outcome": [np.nan, np.nan],
+    })
+    monkeypatch.setattr(sweep, "load_latest_tagged_trades", lambda filename: df)
+    data = sweep.load_sweep_data()
+    assert np.isnan(data["case2_win"]).all()
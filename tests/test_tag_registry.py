@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from core.engine.classifier import classify_sector_tag
+from core.engine.features import FEATURE_TAGS
+from core.engine.tag_registry import TAG_FALLBACKS, TAG_REGISTRY, encode_tag_lists, encode_tag_matrix, pack_tag_columns, unpack_tag_columns
+
+
+def test_unmapped_sector_survives_save_and_load():
+    # Snapshots can carry the sector as the string "None"
+    tag = classify_sector_tag("None")
+    assert tag == "🧰 None"
+    df = pd.DataFrame({"ticker": ["ABC", "XYZ"], "tags": [["👑 CEO", tag], ["📡 Tech"]]})
+    restored = unpack_tag_columns(pack_tag_columns(df))
+    assert restored["tags"].tolist() == [["👑 CEO", "🧰 Unmapped Sector"], ["📡 Tech"]]
+
+
+def test_dynamic_matrix_columns_fold_into_unmapped_sector():
+    matrix = pd.DataFrame({"🧰 Other": [True, False, False], "🧰 Shell Companies": [False, True, False]})
+    np.testing.assert_array_equal(
+        encode_tag_matrix(matrix), encode_tag_lists([["🧰 Other"], ["🧰 Unmapped Sector"], []])
+    )
+
+
+def test_unmapped_sector_is_not_a_model_feature():
+    # Folding unmapped sectors must not change the inputs of trained models
+    assert TAG_FALLBACKS["🧰 "] in TAG_REGISTRY
+    assert TAG_FALLBACKS["🧰 "] not in FEATURE_TAGS
+
+
+def test_tags_without_fallback_are_skipped():
+    np.testing.assert_array_equal(encode_tag_lists([["👑 CEO", "not a tag"]]), encode_tag_lists([["👑 CEO"]]))